@@ -0,0 +1,170 @@
+"""قياس إحصائيات المشرف: جداول التجميع مقابل حسابها من جدول الطلبات
+
+يملأ قاعدة بيانات مؤقتة بطلبات موزعة على --days يوماً (المشغلات تحدّث جداول
+التجميع أثناء الإدخال)، وعند كل مرحلة يقيس أوامر المشرف من جداول التجميع
+والاستعلامات المكافئة مباشرة على orders/order_items.
+
+مثال:
+    python benchmarks/analytics.py --orders 1000000 --stores 2000 --output analytics.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+# الاستعلامات المكافئة بدون جداول التجميع
+DIRECT_QUERIES = {
+    'overview': '''
+        SELECT COUNT(*), SUM(total) FROM orders
+    ''',
+    'statuses': '''
+        SELECT status, COUNT(*) FROM orders GROUP BY status
+    ''',
+    'daily': '''
+        SELECT date(created_at), COUNT(*), SUM(total) FROM orders
+        WHERE created_at > date('now', '-7 days') GROUP BY 1
+    ''',
+    'top_stores': '''
+        SELECT seller_id, COUNT(*), SUM(total) FROM orders
+        WHERE created_at > date('now', '-30 days')
+        GROUP BY seller_id ORDER BY 3 DESC LIMIT 10
+    ''',
+    'top_products': '''
+        SELECT i.product_id, SUM(i.quantity), SUM(i.quantity * i.price)
+        FROM order_items i JOIN orders o ON o.id = i.order_id
+        WHERE o.created_at > date('now', '-30 days')
+        GROUP BY i.product_id ORDER BY 3 DESC LIMIT 10
+    ''',
+}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--orders', type=int, default=1_000_000, help='أكبر عدد طلبات')
+    parser.add_argument('--stores', type=int, default=2000)
+    parser.add_argument('--products', type=int, default=20, help='منتجات لكل متجر')
+    parser.add_argument('--days', type=int, default=90, help='الفترة التي تتوزع عليها الطلبات')
+    parser.add_argument('--repeat', type=int, default=5, help='تكرار كل استعلام')
+    parser.add_argument('--output', help='ملف JSON للنتائج')
+    return parser.parse_args()
+
+def checkpoints(limit):
+    """10^4، 10^5 ... حتى limit"""
+    points = []
+    size = 10_000
+    while size < limit:
+        points.append(size)
+        size *= 10
+    points.append(limit)
+    return points
+
+def best_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+def seed(database, args):
+    """المتاجر والمنتجات: [(product_id, seller_id, price)]"""
+    from store_codes import new_store_code
+
+    with database.connection() as conn:
+        conn.executemany(
+            'INSERT INTO sellers (telegram_id, store_name, store_code, password) VALUES (?, ?, ?, ?)',
+            [(i, f'متجر {i}', new_store_code(), 'x') for i in range(args.stores)]
+        )
+        sellers = [row[0] for row in conn.execute('SELECT id FROM sellers')]
+        conn.executemany(
+            'INSERT INTO products (seller_id, name, price) VALUES (?, ?, ?)',
+            [
+                (seller_id, f'منتج {n}', random.randint(5, 500))
+                for seller_id in sellers for n in range(args.products)
+            ]
+        )
+        return conn.execute('SELECT id, seller_id, price FROM products').fetchall()
+
+def fill(database, products, start, stop, days, batch=20_000):
+    """إضافة طلبات (منتج واحد لكل طلب) حتى يصل العدد لـ stop؛ تُرجع زمن الإدخال"""
+    now = datetime.utcnow()
+    elapsed = 0.0
+    for first in range(start, stop, batch):
+        orders = []
+        items = []
+        for order_id in range(first + 1, min(first + batch, stop) + 1):
+            product_id, seller_id, price = random.choice(products)
+            quantity = random.randint(1, 3)
+            created_at = now - timedelta(seconds=random.randint(0, days * 86400))
+            status = random.choice(('pending', 'confirmed', 'delivered', 'cancelled'))
+            orders.append((
+                order_id, product_id, 'زبون', '0550000000', 'عنوان', quantity, status,
+                created_at.strftime('%Y-%m-%d %H:%M:%S'), seller_id, price * quantity
+            ))
+            items.append((order_id, product_id, quantity, price))
+        started = time.perf_counter()
+        with database.connection() as conn:
+            conn.executemany('''
+            INSERT INTO orders (id, product_id, customer_name, customer_phone, customer_address,
+                                quantity, status, created_at, seller_id, total)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', orders)
+            conn.executemany(
+                'INSERT INTO order_items (order_id, product_id, quantity, price) VALUES (?, ?, ?, ?)',
+                items
+            )
+        elapsed += time.perf_counter() - started
+    return elapsed
+
+def main():
+    args = parse_args()
+    os.environ['DB_PATH'] = os.path.join(tempfile.mkdtemp(prefix='orderbot-analytics-'), 'orders.db')
+    os.environ['METRICS_ENABLED'] = '0'
+
+    from analytics import Analytics
+    from database import Database
+
+    database = Database(os.environ['DB_PATH'])
+    analytics = Analytics(database)
+    products = seed(database, args)
+    rollup_queries = {
+        'overview': analytics.overview,
+        'daily': lambda: analytics.daily(7),
+        'top_stores': lambda: analytics.top_stores(30),
+        'top_stores_all': analytics.top_stores,
+        'top_products': lambda: analytics.top_products(30),
+    }
+
+    results = []
+    filled = 0
+    for point in checkpoints(args.orders):
+        insert_s = fill(database, products, filled, point, args.days)
+        row = {
+            'orders': point,
+            'insert_us_per_order': insert_s / (point - filled) * 1_000_000,
+            'rollup_ms': {name: best_ms(func, args.repeat) for name, func in rollup_queries.items()},
+        }
+        filled = point
+        with database.connection() as conn:
+            row['direct_ms'] = {
+                name: best_ms(lambda: conn.execute(sql).fetchall(), args.repeat)
+                for name, sql in DIRECT_QUERIES.items()
+            }
+        results.append(row)
+        print(f"{point:>10} طلب: إدخال {row['insert_us_per_order']:.1f}µs/طلب")
+        print("    التجميع: " + '، '.join(f"{k} {v:.2f}ms" for k, v in row['rollup_ms'].items()))
+        print("    مباشر:  " + '، '.join(f"{k} {v:.1f}ms" for k, v in row['direct_ms'].items()))
+
+    database.close()
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+    main()
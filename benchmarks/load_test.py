@@ -0,0 +1,433 @@
+"""اختبار حمل: محاكاة آلاف البائعين والزبائن عبر setup_bot_handlers بدون شبكة
+
+يبني Application بمعالجات البوت الحقيقية و Bot API وهمي (StubRequest) يسجّل
+الاستدعاءات، ثم يشغّل ثلاث مراحل متزامنة:
+  1. البائعون: تسجيل المتجر، تسجيل الدخول، وإضافة المنتجات
+  2. الزبائن: محادثة الطلب كاملة (الكود، البحث، السلة، الاسم، الهاتف، العنوان)
+  3. البائعون: عرض الطلبات الجديدة وتأكيدها دفعة واحدة
+
+كل مستخدم ينتظر انتهاء معالجة تحديثه قبل إرسال التالي (مثل مستخدم حقيقي).
+النتائج (تحديثات/ثانية، p50/p95/p99 لكل خطوة، ووقت قاعدة البيانات) تُكتب JSON
+للمقارنة بين النسخ.
+
+مثال:
+    python benchmarks/load_test.py --sellers 200 --buyers 2000 --output results.json
+    python benchmarks/load_test.py --compare results.json
+"""
+import argparse
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'OrderBot', 'username': 'order_bot'}
+
+# وقت قاعدة البيانات للتحديث الحالي (قائمة بعنصر واحد يتراكم فيه الوقت)
+_db_time = contextvars.ContextVar('db_time', default=None)
+
+def percentile(values, p):
+    """النسبة المئوية p من قيم مرتبة"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))
+    return values[index]
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        'count': len(values),
+        'mean_ms': sum(values) / len(values) * 1000 if values else 0.0,
+        'p50_ms': percentile(values, 50) * 1000,
+        'p95_ms': percentile(values, 95) * 1000,
+        'p99_ms': percentile(values, 99) * 1000,
+        'max_ms': values[-1] * 1000 if values else 0.0,
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sellers', type=int, default=100)
+    parser.add_argument('--products', type=int, default=3, help='منتجات لكل بائع')
+    parser.add_argument('--buyers', type=int, default=1000)
+    parser.add_argument('--cart-size', type=int, default=2, help='منتجات في سلة كل زبون')
+    parser.add_argument('--concurrency', type=int, default=None, help='UPDATE_CONCURRENCY للتطبيق')
+    parser.add_argument('--api-latency', type=float, default=0.0, help='تأخير كل استدعاء Bot API بالملي ثانية')
+    parser.add_argument('--persistence', action='store_true', help='تفعيل SQLitePersistence')
+    parser.add_argument('--db', help='ملف قاعدة البيانات (افتراضياً ملف مؤقت جديد)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='ملف JSON للنتائج')
+    parser.add_argument('--compare', help='ملف JSON سابق للمقارنة')
+    return parser.parse_args()
+
+def configure_environment(args):
+    """إعدادات تُقرأ عند استيراد وحدات البوت: قاعدة بيانات منفصلة وبدون حدود تلغرام"""
+    if args.db is None:
+        args.db = os.path.join(tempfile.mkdtemp(prefix='orderbot-bench-'), 'orders.db')
+    os.environ['DB_PATH'] = args.db
+    os.environ.setdefault('OUTBOX_GLOBAL_RATE', '1000000')
+    os.environ.setdefault('OUTBOX_CHAT_RATE', '1000000')
+    os.environ.setdefault('OUTBOX_CHAT_BURST', '1000000')
+    os.environ.setdefault('NOTIFY_WINDOW', '0.5')
+    if args.concurrency is not None:
+        os.environ['UPDATE_CONCURRENCY'] = str(args.concurrency)
+
+def build_application(args):
+    from telegram.ext import Application
+    from telegram.request import BaseRequest
+
+    from async_database import adb
+    from bot_functions import setup_bot_handlers
+    from outbox import outbox
+    from scheduler import ScheduledApplication
+
+    class StubRequest(BaseRequest):
+        """Bot API وهمي: يرد بنتائج ثابتة ويحفظ آخر لوحة أزرار لكل محادثة"""
+
+        def __init__(self, latency=0.0):
+            self.latency = latency
+            self.calls = Counter()
+            self.call_time = defaultdict(float)
+            self.keyboards = {}  # {chat_id: (message_id, [callback_data])}
+            self._message_ids = itertools.count(1)
+
+        async def initialize(self):
+            pass
+
+        async def shutdown(self):
+            pass
+
+        async def do_request(self, url, method, request_data=None, read_timeout=None,
+                             write_timeout=None, connect_timeout=None, pool_timeout=None):
+            started = time.perf_counter()
+            endpoint = url.rsplit('/', 1)[-1]
+            params = request_data.parameters if request_data else {}
+            if self.latency:
+                await asyncio.sleep(self.latency)
+
+            if endpoint == 'getMe':
+                result = BOT_USER
+            elif endpoint in ('sendMessage', 'editMessageText', 'sendDocument'):
+                chat_id = params.get('chat_id', 0)
+                message_id = params.get('message_id') or next(self._message_ids)
+                markup = params.get('reply_markup') or {}
+                if 'inline_keyboard' in markup:
+                    self.keyboards[chat_id] = (message_id, [
+                        button['callback_data'] for row in markup['inline_keyboard'] for button in row
+                        if 'callback_data' in button
+                    ])
+                result = {
+                    'message_id': message_id,
+                    'date': int(time.time()),
+                    'chat': {'id': chat_id, 'type': 'private'},
+                    'from': BOT_USER,
+                    'text': params.get('text', ''),
+                }
+            else:
+                result = True
+
+            self.calls[endpoint] += 1
+            self.call_time[endpoint] += time.perf_counter() - started
+            return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+    class BenchmarkApplication(ScheduledApplication):
+        """يقيس زمن كل تحديث حتى وصول ردوده، ووقت قاعدة البيانات داخله"""
+
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self.waiters = {}  # {update_id: (الخطوة، Future)}
+            self.samples = defaultdict(list)  # {الخطوة: [(الزمن، وقت القاعدة)]}
+
+        async def process_update(self, update):
+            step, future = self.waiters.pop(update.update_id, (None, None))
+            token = _db_time.set([0.0])
+            started = time.perf_counter()
+            try:
+                await super().process_update(update)
+                # الردود لا تُنتظر داخل المعالج؛ المستخدم يرى لوحة الأزرار بعد إرسالها
+                if update.effective_chat is not None:
+                    await outbox.flush(update.effective_chat.id)
+            finally:
+                elapsed = time.perf_counter() - started
+                db_elapsed = _db_time.get()[0]
+                _db_time.reset(token)
+                if step is not None:
+                    self.samples[step].append((elapsed, db_elapsed))
+                if future is not None and not future.done():
+                    future.set_result(None)
+
+    instrument_db(adb)
+
+    request = StubRequest(latency=args.api_latency / 1000)
+    builder = (
+        Application.builder()
+        .token('123456:BENCHMARK')
+        .application_class(BenchmarkApplication)
+        .request(request)
+        .get_updates_request(StubRequest())
+    )
+    if args.persistence:
+        from persistence import SQLitePersistence
+        builder = builder.persistence(SQLitePersistence())
+    application = builder.build()
+    setup_bot_handlers(application)
+    return application, request
+
+def instrument_db(adb):
+    """جمع وقت انتظار دوال AsyncDatabase في وقت التحديث الحالي"""
+    def timed(func):
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                acc = _db_time.get()
+                if acc is not None:
+                    acc[0] += time.perf_counter() - started
+        return wrapper
+
+    adb._submit = timed(adb._submit)
+    adb.add_order = timed(adb.add_order)
+    adb.add_cart = timed(adb.add_cart)
+
+class Simulator:
+    """إنشاء التحديثات وإرسالها للتطبيق كما يفعل تلغرام"""
+
+    def __init__(self, application, request, rng):
+        from telegram import Update
+        self.Update = Update
+        self.application = application
+        self.request = request
+        self.rng = rng
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self.sent = 0
+
+    async def _submit(self, step, data):
+        update = self.Update.de_json(data, self.application.bot)
+        future = asyncio.get_running_loop().create_future()
+        self.application.waiters[update.update_id] = (step, future)
+        await self.application.update_queue.put(update)
+        self.sent += 1
+        await future
+
+    @staticmethod
+    def _user(user_id):
+        return {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'}
+
+    async def message(self, step, user_id, text):
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': self._user(user_id),
+            'text': text,
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        await self._submit(step, {'update_id': next(self._update_ids), 'message': message})
+
+    async def tap(self, step, user_id, choose):
+        """الضغط على زر من آخر لوحة أزرار أرسلها البوت لهذه المحادثة"""
+        message_id, buttons = self.request.keyboards.get(user_id, (0, []))
+        data = choose(buttons)
+        if data is None:
+            raise RuntimeError(f"لا يوجد زر مناسب للخطوة {step}: {buttons}")
+        update_id = next(self._update_ids)
+        await self._submit(step, {
+            'update_id': update_id,
+            'callback_query': {
+                'id': str(update_id),
+                'from': self._user(user_id),
+                'chat_instance': str(user_id),
+                'data': data,
+                'message': {
+                    'message_id': message_id,
+                    'date': int(time.time()),
+                    'chat': {'id': user_id, 'type': 'private'},
+                    'from': BOT_USER,
+                    'text': '',
+                },
+            },
+        })
+
+    async def seller(self, user_id, products):
+        await self.message('start', user_id, '/start')
+        await self.message('seller.register', user_id, '🏪 تسجيل كبائع')
+        await self.message('seller.name', user_id, f'بائع {user_id}')
+        await self.message('seller.store', user_id, f'متجر {user_id}')
+        await self.message('seller.password', user_id, 'secret')
+        store_code = await store_code_for(user_id)
+        await self.message('seller.login', user_id, '🔐 تسجيل الدخول')
+        await self.message('seller.login_code', user_id, store_code)
+        for i in range(products):
+            await self.message('product.start', user_id, '➕ إضافة منتج')
+            await self.message('product.name', user_id, f'منتج {i + 1}')
+            await self.message('product.price', user_id, str(self.rng.randint(5, 500)))
+            await self.message('product.desc', user_id, 'تخطي')
+        return store_code
+
+    async def buyer(self, user_id, store_code, cart_size):
+        await self.message('start', user_id, '/start')
+        await self.message('buyer.start', user_id, '🛒 طلب كزبون')
+        await self.message('buyer.code', user_id, store_code)
+        await self.message('buyer.search', user_id, 'منتج')
+        for _ in range(cart_size):
+            await self.tap('buyer.product', user_id, lambda b: self._pick(b, 'product_'))
+            await self.tap('buyer.quantity', user_id, lambda b: self._pick(b, 'qty_'))
+        await self.tap('buyer.checkout', user_id, lambda b: 'cart_checkout' if 'cart_checkout' in b else None)
+        await self.message('buyer.name', user_id, f'زبون {user_id}')
+        await self.message('buyer.phone', user_id, f'05{user_id:08d}')
+        await self.message('buyer.address', user_id, 'الرياض - حي الملك فهد')
+
+    async def seller_review(self, user_id):
+        await self.message('orders.pending', user_id, '🛒 الطلبات الجديدة')
+        if 'status_bulk|confirmed' in self.request.keyboards.get(user_id, (0, []))[1]:
+            await self.tap('orders.confirm_all', user_id, lambda b: 'status_bulk|confirmed')
+
+    def _pick(self, buttons, prefix):
+        matching = [data for data in buttons if data.startswith(prefix)]
+        return self.rng.choice(matching) if matching else None
+
+async def store_code_for(telegram_id):
+    """كود المتجر المسجل لهذا المستخدم (استعلام خاص بالاختبار)"""
+    from database import db
+
+    def query():
+        with db.connection() as conn:
+            return conn.execute('SELECT store_code FROM sellers WHERE telegram_id = ?', (telegram_id,)).fetchone()[0]
+    return await asyncio.get_running_loop().run_in_executor(None, query)
+
+async def run_phase(simulator, name, coroutines):
+    started = time.perf_counter()
+    sent_before = simulator.sent
+    results = await asyncio.gather(*coroutines, return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    errors = [r for r in results if isinstance(r, BaseException)]
+    for error in errors[:3]:
+        print(f"  ⚠️ {name}: {error!r}")
+    updates = simulator.sent - sent_before
+    phase = {
+        'users': len(results),
+        'errors': len(errors),
+        'updates': updates,
+        'elapsed_s': elapsed,
+        'updates_per_sec': updates / elapsed if elapsed else 0.0,
+    }
+    print(f"{name}: {updates} تحديث في {elapsed:.2f}ث ({phase['updates_per_sec']:.0f}/ث)، أخطاء: {len(errors)}")
+    return [r for r in results if not isinstance(r, BaseException)], phase
+
+async def run(args):
+    configure_environment(args)
+    application, request = build_application(args)
+
+    from database import db
+    from notifier import notifier
+    from outbox import outbox
+
+    rng = random.Random(args.seed)
+    simulator = Simulator(application, request, rng)
+
+    await application.initialize()
+    await application.start()
+    started = time.perf_counter()
+    try:
+        seller_ids = [1_000_000 + i for i in range(args.sellers)]
+        codes, sellers_phase = await run_phase(
+            simulator, 'sellers', [simulator.seller(user_id, args.products) for user_id in seller_ids]
+        )
+        buyer_ids = [2_000_000 + i for i in range(args.buyers)]
+        _, buyers_phase = await run_phase(
+            simulator, 'buyers',
+            [simulator.buyer(user_id, rng.choice(codes), args.cart_size) for user_id in buyer_ids]
+        )
+        _, review_phase = await run_phase(
+            simulator, 'review', [simulator.seller_review(user_id) for user_id in seller_ids]
+        )
+        elapsed = time.perf_counter() - started
+    finally:
+        await notifier.stop()
+        await application.stop()
+        await application.shutdown()
+        await outbox.stop()
+
+    all_latencies = [elapsed for samples in application.samples.values() for elapsed, _ in samples]
+    steps = {}
+    for step, samples in sorted(application.samples.items()):
+        steps[step] = summarize([elapsed for elapsed, _ in samples])
+        db_times = summarize([db_elapsed for _, db_elapsed in samples])
+        steps[step]['db_mean_ms'] = db_times['mean_ms']
+        steps[step]['db_p95_ms'] = db_times['p95_ms']
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {
+            key: getattr(args, key)
+            for key in ('sellers', 'products', 'buyers', 'cart_size', 'api_latency', 'persistence', 'seed')
+        },
+        'update_concurrency': application.scheduler.max_concurrent,
+        'total': {
+            'updates': simulator.sent,
+            'elapsed_s': elapsed,
+            'updates_per_sec': simulator.sent / elapsed if elapsed else 0.0,
+            **{key: value for key, value in summarize(all_latencies).items() if key != 'count'},
+        },
+        'phases': {'sellers': sellers_phase, 'buyers': buyers_phase, 'review': review_phase},
+        'steps': steps,
+        'api_calls': dict(request.calls),
+        'api_time_ms': {method: seconds * 1000 for method, seconds in request.call_time.items()},
+        'scheduler': application.scheduler.stats(),
+        'db': db.stats(),
+    }
+    db.close()
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_report(results, baseline=None):
+    total = results['total']
+    print(f"\nالإجمالي: {total['updates']} تحديث، {total['updates_per_sec']:.0f}/ث، "
+          f"p50={total['p50_ms']:.2f}ms p95={total['p95_ms']:.2f}ms p99={total['p99_ms']:.2f}ms")
+    print(f"{'الخطوة':<22}{'العدد':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'DB':>9}{'Δp95':>9}")
+    for step, s in results['steps'].items():
+        delta = ''
+        if baseline and step in baseline.get('steps', {}):
+            delta = f"{s['p95_ms'] - baseline['steps'][step]['p95_ms']:+.2f}"
+        print(f"{step:<22}{s['count']:>8}{s['p50_ms']:>9.2f}{s['p95_ms']:>9.2f}"
+              f"{s['p99_ms']:>9.2f}{s['db_mean_ms']:>9.2f}{delta:>9}")
+    if baseline:
+        before = baseline['total']['updates_per_sec']
+        change = (total['updates_per_sec'] - before) / before * 100 if before else 0.0
+        print(f"\nمقارنة بـ {baseline.get('commit')}: {before:.0f}/ث → {total['updates_per_sec']:.0f}/ث ({change:+.1f}%)")
+
+def main():
+    args = parse_args()
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    results = asyncio.run(run(args))
+    print_report(results, baseline)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\nالنتائج في {args.output}")
+
+if __name__ == '__main__':
+    main()
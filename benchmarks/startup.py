@@ -0,0 +1,172 @@
+"""قياس زمن بدء التشغيل البارد: من تشغيل العملية حتى الرد على أول تحديث
+
+كل تشغيل عملية Python جديدة (كما بعد إعادة تشغيل الخادم) على قاعدة بيانات فيها
+--users جلسة محفوظة، وتُقاس المراحل:
+  import   استيراد factory
+  create   create_application (استيراد telegram، فتح القاعدة والترحيلات، المعالجات)
+  init     application.initialize (getMe وقراءة الجلسات المحفوظة)
+  first    معالجة أول تحديث (/start)
+و total من تشغيل العملية (في العملية الأم) حتى الرد الأول، فيشمل بدء المفسّر نفسه.
+
+مثال:
+    python benchmarks/startup.py --runs 10 --users 50000 --output startup.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+STARTED = time.perf_counter()
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'OrderBot', 'username': 'order_bot'}
+PHASES = ('import', 'create', 'init', 'first')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--users', type=int, default=10_000, help='جلسات محفوظة في القاعدة')
+    parser.add_argument('--storage', choices=('sqlite', 'memory'), default='sqlite')
+    parser.add_argument('--handlers', choices=('orders', 'demo'), default='orders')
+    parser.add_argument('--db', help='قاعدة بيانات موجودة (افتراضياً ملف مؤقت جديد)')
+    parser.add_argument('--output', help='ملف JSON للنتائج')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def prepare(db_path, users):
+    """قاعدة بيانات بجلسات مستخدمين ومحادثات محفوظة (كما بعد فترة تشغيل)"""
+    os.environ['DB_PATH'] = db_path
+    os.environ['METRICS_ENABLED'] = '0'
+    from database import Database
+
+    database = Database(db_path)
+    now = time.time()
+    with database.connection() as conn:
+        conn.executemany(
+            'INSERT OR REPLACE INTO persistence_user_data (user_id, data, updated_at) VALUES (?, ?, ?)',
+            [
+                (100 + i, json.dumps({'cart': {'1': 2}, 'catalog_view': {'query': None, 'offset': 0}}), now)
+                for i in range(users)
+            ]
+        )
+        conn.executemany(
+            'INSERT OR REPLACE INTO persistence_conversations (name, key, state, updated_at) VALUES (?, ?, ?, ?)',
+            [('buyer_conv', json.dumps([100 + i, 100 + i]), '10', now) for i in range(0, users, 10)]
+        )
+    database.close()
+
+def child(args):
+    """تشغيل واحد: يطبع أزمنة المراحل (ثوانٍ) كـ JSON"""
+    timings = {}
+    mark = STARTED
+
+    def lap(name):
+        nonlocal mark
+        now = time.perf_counter()
+        timings[name] = now - mark
+        mark = now
+
+    from factory import Config, create_application
+    lap('import')
+
+    from telegram import Update
+    from telegram.request import BaseRequest
+
+    class StubRequest(BaseRequest):
+        """Bot API وهمي بدون شبكة"""
+
+        async def initialize(self):
+            pass
+
+        async def shutdown(self):
+            pass
+
+        async def do_request(self, url, method, request_data=None, **kwargs):
+            endpoint = url.rsplit('/', 1)[-1]
+            params = request_data.parameters if request_data else {}
+            if endpoint == 'getMe':
+                result = BOT_USER
+            elif endpoint == 'sendMessage':
+                result = {
+                    'message_id': 1, 'date': int(time.time()), 'from': BOT_USER,
+                    'chat': {'id': params.get('chat_id', 0), 'type': 'private'}, 'text': '',
+                }
+            else:
+                result = True
+            return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+    config = Config(
+        token='123456:STARTUP', storage=args.storage, handlers=args.handlers,
+        db_path=args.db, metrics=False
+    )
+    application = create_application(config, request=StubRequest(), get_updates_request=StubRequest())
+    lap('create')
+
+    async def start():
+        await application.initialize()
+        lap('init')
+        user = {'id': 42, 'is_bot': False, 'first_name': 'زبون'}
+        update = Update.de_json({
+            'update_id': 1,
+            'message': {
+                'message_id': 1, 'date': int(time.time()), 'text': '/start',
+                'chat': {'id': 42, 'type': 'private'}, 'from': user,
+                'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}],
+            },
+        }, application.bot)
+        await application.process_update(update)
+        lap('first')
+        timings['first_reply_at'] = time.time()
+        await application.shutdown()
+
+    asyncio.run(start())
+    print(json.dumps(timings))
+
+def main():
+    args = parse_args()
+    if args.child:
+        child(args)
+        return
+
+    if args.db is None:
+        args.db = os.path.join(tempfile.mkdtemp(prefix='orderbot-startup-'), 'orders.db')
+        prepare(args.db, args.users)
+
+    command = [
+        sys.executable, os.path.abspath(__file__), '--child', '--db', args.db,
+        '--storage', args.storage, '--handlers', args.handlers,
+    ]
+    env = dict(os.environ, OUTBOX_GLOBAL_RATE='1000000', OUTBOX_CHAT_RATE='1000000')
+    runs = []
+    for _ in range(args.runs):
+        started = time.time()
+        output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+        timings = json.loads(output.strip().splitlines()[-1])
+        timings['total'] = timings.pop('first_reply_at') - started
+        runs.append(timings)
+
+    summary = {
+        phase: statistics.median(run[phase] for run in runs) * 1000
+        for phase in PHASES + ('total',)
+    }
+    print(f"{args.handlers}/{args.storage}، {args.users} جلسة، {args.runs} تشغيل (الوسيط بالملي ثانية):")
+    for phase, value in summary.items():
+        print(f"  {phase:<8} {value:8.1f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'args': {k: v for k, v in vars(args).items() if k != 'child'},
+                'median_ms': summary,
+                'runs': runs,
+            }, f, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+    main()
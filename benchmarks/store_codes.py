@@ -0,0 +1,112 @@
+"""قياس توليد أكواد المتاجر: زمن التسجيل يبقى ثابتاً مع نمو عدد المتاجر
+
+يملأ قاعدة بيانات مؤقتة بالمتاجر على مراحل، وعند كل مرحلة يقيس:
+  - Database.register_seller (توليد + INSERT + إعادة المحاولة عند التصادم)
+  - رفض الأكواد المشوهة في get_seller_by_code (بدون قاعدة البيانات)
+  - البحث عن كود صحيح غير موجود
+
+مثال:
+    python benchmarks/store_codes.py --stores 1000000 --samples 2000 --output codes.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--stores', type=int, default=1_000_000, help='أكبر عدد متاجر')
+    parser.add_argument('--samples', type=int, default=2000, help='عمليات مقاسة عند كل مرحلة')
+    parser.add_argument('--output', help='ملف JSON للنتائج')
+    return parser.parse_args()
+
+def checkpoints(limit):
+    """0، 10^3، 10^4 ... حتى limit"""
+    points = [0]
+    size = 1000
+    while size < limit:
+        points.append(size)
+        size *= 10
+    points.append(limit)
+    return points
+
+def per_op_us(func, count):
+    started = time.perf_counter()
+    for i in range(count):
+        func(i)
+    return (time.perf_counter() - started) / count * 1_000_000
+
+def fill(database, start, stop, batch=50_000):
+    """إضافة متاجر مباشرة (executemany) حتى تصل القاعدة لـ stop متجر"""
+    from store_codes import new_store_code
+
+    for first in range(start, stop, batch):
+        rows = [
+            (i, f'متجر {i}', new_store_code(), 'x')
+            for i in range(first, min(first + batch, stop))
+        ]
+        with database.connection() as conn:
+            conn.executemany(
+                'INSERT OR IGNORE INTO sellers (telegram_id, store_name, store_code, password) VALUES (?, ?, ?, ?)',
+                rows
+            )
+
+def main():
+    args = parse_args()
+    os.environ['DB_PATH'] = os.path.join(tempfile.mkdtemp(prefix='orderbot-codes-'), 'orders.db')
+    os.environ['METRICS_ENABLED'] = '0'
+
+    from database import Database
+    from store_codes import new_store_code
+
+    database = Database(os.environ['DB_PATH'])
+    malformed = ['', 'abc', 'HELLO WORLD', '12345678', 'O0O0O0O0', 'ZZZZZZZZ', 'متجر']
+    results = []
+    filled = 0
+    next_user = 10_000_000_000
+
+    for point in checkpoints(args.stores):
+        fill(database, filled, point)
+        filled = point
+
+        attempts = [0]
+        def allocate():
+            attempts[0] += 1
+            return new_store_code()
+
+        def register(i):
+            nonlocal next_user
+            next_user += 1
+            database.register_seller(next_user, 'bench', 'x', allocate=allocate)
+
+        register_us = per_op_us(register, args.samples)
+        reject_us = per_op_us(lambda i: database.get_seller_by_code(malformed[i % len(malformed)]), args.samples)
+        # كود صحيح غير موجود: يصل للقاعدة (الفهرس UNIQUE)
+        unknown = [new_store_code() for _ in range(args.samples)]
+        lookup_us = per_op_us(lambda i: database.get_seller_by_code(unknown[i]), args.samples)
+
+        with database.connection() as conn:
+            total = conn.execute('SELECT COUNT(*) FROM sellers').fetchone()[0]
+        row = {
+            'stores': total,
+            'register_us': register_us,
+            'retries': attempts[0] - args.samples,
+            'reject_malformed_us': reject_us,
+            'lookup_unknown_us': lookup_us,
+        }
+        results.append(row)
+        print(f"{total:>10} متجر: تسجيل {register_us:8.1f}µs، إعادة {row['retries']}، "
+              f"رفض مشوه {reject_us:6.2f}µs، بحث {lookup_us:6.1f}µs")
+
+    database.close()
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'samples': args.samples, 'results': results}, f, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""إحصائيات السوق كاملاً للمشرف من جداول التجميع (ROLLUP_SCHEMA في database.py)
+
+كل الاستعلامات هنا تقرأ جداول rollup_* فقط، فيبقى زمنها ثابتاً مهما زاد عدد
+الطلبات: المجاميع صفوف محددة، والفترات صف لكل ساعة أو يوم، وأفضل المتاجر والمنتجات
+من فهرس الإيرادات أو من صفوف أيام الفترة فقط.
+"""
+import os
+
+from database import db
+from metrics import DB_QUERY_SECONDS, timed
+
+# المشرفون (أرقام Telegram مفصولة بفواصل؛ بدونها لا يوجد مشرف)
+ADMIN_IDS = frozenset(
+    int(user_id) for user_id in os.getenv('ADMIN_IDS', '').split(',') if user_id.strip()
+)
+
+def is_admin(user_id):
+    return user_id in ADMIN_IDS
+
+class Analytics:
+    """قراءة جداول التجميع"""
+
+    def __init__(self, database):
+        self.db = database
+
+    @timed(DB_QUERY_SECONDS)
+    def overview(self):
+        """المجاميع العامة وحالات الطلبات وطلبات اليوم وآخر 24 ساعة"""
+        with self.db.connection() as conn:
+            totals = dict(conn.execute('SELECT key, value FROM rollup_totals').fetchall())
+            today = conn.execute(
+                "SELECT orders, revenue FROM rollup_daily WHERE day = date('now')"
+            ).fetchone() or (0, 0.0)
+            last_day = conn.execute('''
+            SELECT COALESCE(SUM(orders), 0), COALESCE(SUM(revenue), 0)
+            FROM rollup_hourly
+            WHERE hour > strftime('%Y-%m-%d %H:00', 'now', '-24 hours')
+            ''').fetchone()
+
+        statuses = {
+            key.split(':', 1)[1]: int(value)
+            for key, value in totals.items() if key.startswith('status:') and value > 0
+        }
+        return {
+            'stores': int(totals.get('stores', 0)),
+            'products': int(totals.get('products', 0)),
+            'orders': int(totals.get('orders', 0)),
+            'revenue': totals.get('revenue', 0.0),
+            'statuses': statuses,
+            'today': {'orders': today[0], 'revenue': today[1]},
+            'last_24h': {'orders': last_day[0], 'revenue': last_day[1]},
+        }
+
+    @timed(DB_QUERY_SECONDS)
+    def daily(self, days=7):
+        """[(اليوم، الطلبات، الإيرادات، الملغاة)] لآخر days يوماً (الأحدث أولاً)"""
+        with self.db.connection() as conn:
+            return conn.execute('''
+            SELECT day, orders, revenue, cancelled
+            FROM rollup_daily
+            WHERE day > date('now', ?)
+            ORDER BY day DESC
+            ''', (f'-{days} days',)).fetchall()
+
+    @timed(DB_QUERY_SECONDS)
+    def hourly(self, hours=24):
+        """[(الساعة، الطلبات، الإيرادات)] لآخر hours ساعة (الأحدث أولاً)"""
+        with self.db.connection() as conn:
+            return conn.execute('''
+            SELECT hour, orders, revenue
+            FROM rollup_hourly
+            WHERE hour > strftime('%Y-%m-%d %H:00', 'now', ?)
+            ORDER BY hour DESC
+            ''', (f'-{hours} hours',)).fetchall()
+
+    @timed(DB_QUERY_SECONDS)
+    def top_stores(self, days=None, limit=10):
+        """[(seller_id، اسم المتجر، الكود، الطلبات، الإيرادات)] الأعلى إيراداً (كل الوقت أو آخر days يوماً)"""
+        if days is None:
+            ranked = '''
+            SELECT seller_id, orders, revenue FROM rollup_store_totals
+            ORDER BY revenue DESC LIMIT ?
+            '''
+            params = (limit,)
+        else:
+            ranked = '''
+            SELECT seller_id, SUM(orders) AS orders, SUM(revenue) AS revenue
+            FROM rollup_store_daily
+            WHERE day > date('now', ?)
+            GROUP BY seller_id
+            ORDER BY revenue DESC LIMIT ?
+            '''
+            params = (f'-{days} days', limit)
+        with self.db.connection() as conn:
+            return conn.execute(f'''
+            SELECT r.seller_id, s.store_name, s.store_code, r.orders, r.revenue
+            FROM ({ranked}) r
+            LEFT JOIN sellers s ON s.id = r.seller_id
+            ORDER BY r.revenue DESC
+            ''', params).fetchall()
+
+    @timed(DB_QUERY_SECONDS)
+    def top_products(self, days=None, limit=10):
+        """[(product_id، الاسم، اسم المتجر، الكمية، الإيرادات)] الأعلى إيراداً"""
+        if days is None:
+            ranked = '''
+            SELECT product_id, quantity, revenue FROM rollup_product_totals
+            ORDER BY revenue DESC LIMIT ?
+            '''
+            params = (limit,)
+        else:
+            ranked = '''
+            SELECT product_id, SUM(quantity) AS quantity, SUM(revenue) AS revenue
+            FROM rollup_product_daily
+            WHERE day > date('now', ?)
+            GROUP BY product_id
+            ORDER BY revenue DESC LIMIT ?
+            '''
+            params = (f'-{days} days', limit)
+        with self.db.connection() as conn:
+            return conn.execute(f'''
+            SELECT r.product_id, p.name, s.store_name, r.quantity, r.revenue
+            FROM ({ranked}) r
+            LEFT JOIN products p ON p.id = r.product_id
+            LEFT JOIN sellers s ON s.id = p.seller_id
+            ORDER BY r.revenue DESC
+            ''', params).fetchall()
+
+analytics = Analytics(db)
@@ -0,0 +1,91 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from database import db
+from export import write_orders
+from product_import import parse_products
+
+# عدد خيوط القراءة
+READER_THREADS = int(os.getenv('DB_READER_THREADS', '4'))
+
+def _read(name):
+    """دالة قراءة تعمل على مجموعة خيوط القراءة"""
+    async def method(self, *args, **kwargs):
+        return await self._submit(self._readers, getattr(self.db, name), *args, **kwargs)
+    method.__name__ = name
+    return method
+
+def _write(name):
+    """دالة كتابة تعمل على خيط الكتابة الوحيد"""
+    async def method(self, *args, **kwargs):
+        return await self._submit(self._writer, getattr(self.db, name), *args, **kwargs)
+    method.__name__ = name
+    return method
+
+class AsyncDatabase:
+    """واجهة غير متزامنة لـ Database حتى لا تُوقف حلقة asyncio"""
+
+    def __init__(self, database, readers=READER_THREADS):
+        self.db = database
+        # خيط واحد للكتابة يمنع تنافس الأقفال في SQLite
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix='db-reader')
+
+    async def _submit(self, executor, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+    async def read(self, func, *args, **kwargs):
+        """تشغيل دالة قراءة أخرى (مثل Analytics) على خيوط القراءة"""
+        return await self._submit(self._readers, func, *args, **kwargs)
+
+    def close(self):
+        """إيقاف الخيوط بعد إنهاء الأعمال المعلقة"""
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+
+    # دوال البائعين
+    add_seller = _write('add_seller')
+    register_seller = _write('register_seller')
+    get_seller = _read('get_seller')
+    get_seller_by_code = _read('get_seller_by_code')
+    get_seller_by_telegram_id = _read('get_seller_by_telegram_id')
+
+    # دوال المنتجات
+    add_product = _write('add_product')
+    add_products = _write('add_products')
+    get_products_by_seller = _read('get_products_by_seller')
+    get_product = _read('get_product')
+    search_products = _read('search_products')
+    inline_products = _read('inline_products')
+
+    async def parse_products(self, fileobj, fmt):
+        """قراءة ملف المنتجات على خيط قراءة قبل إضافتها بـ add_products"""
+        return await self._submit(self._readers, parse_products, fileobj, fmt)
+
+    # دوال الطلبيات
+    async def add_order(self, *args, **kwargs):
+        """الطلب يُكتب مع دفعة الطلبات المتزامنة (group commit) دون حجز خيط"""
+        return await asyncio.wrap_future(self.db.submit_order(*args, **kwargs))
+
+    async def add_cart(self, *args, **kwargs):
+        return await asyncio.wrap_future(self.db.submit_cart(*args, **kwargs))
+
+    get_order_items = _read('get_order_items')
+    get_orders_for_seller = _read('get_orders_for_seller')
+    get_orders_page = _read('get_orders_page')
+    update_order_status = _write('update_order_status')
+    update_statuses = _write('update_statuses')
+
+    async def export_orders(self, seller_id, fmt='csv', since=None):
+        """ملف تصدير الطلبات يُكتب على خيط قراءة: (الملف، عدد الطلبات)"""
+        return await self._submit(
+            self._readers, write_orders, self.db.iter_orders_for_seller(seller_id, since=since), fmt
+        )
+
+    # دوال الإحصائيات
+    get_seller_stats = _read('get_seller_stats')
+
+adb = AsyncDatabase(db)
@@ -1,17 +1,13 @@
-import os
 import logging
 from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackContext
+from telegram.ext import CommandHandler, MessageHandler, filters, CallbackContext
+
+from store_codes import CODE_LENGTH, check_char, is_valid_store_code, new_store_code, normalize_store_code
 
-# إعداد التسجيل
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
-# التوكن - سيتم أخذه من Environment Variable
-BOT_TOKEN = os.getenv('BOT_TOKEN', '8567098482:AAG2RwierhMVAz4bMHtKiWxBvlAJExOyhN0')
+# كود المتجر في العرض التجريبي (بصيغة الأكواد الحقيقية)
+DEMO_STORE_CODE = 'DEM2345' + check_char('DEM2345')
 
 # دوال البوت
 async def start(update: Update, context: CallbackContext):
@@ -45,8 +41,7 @@ async def help_command(update: Update, context: CallbackContext):
 
 async def register(update: Update, context: CallbackContext):
     """تسجيل متجر"""
-    user_id = update.effective_user.id
-    store_code = f"STORE{user_id % 10000:04d}"
+    store_code = new_store_code()
     
     await update.message.reply_text(
         f"🏪 **تم إنشاء متجرك!**\n\n"
@@ -62,18 +57,19 @@ async def demo(update: Update, context: CallbackContext):
     """عرض تجريبي"""
     await update.message.reply_text(
         "🛒 **عرض تجريبي:**\n\n"
-        "1. **كود المتجر:** STORE1234\n"
+        f"1. **كود المتجر:** {DEMO_STORE_CODE}\n"
         "2. **المنتجات:**\n"
         "   - 📱 هاتف - 500 ريال\n"
         "   - 💻 لابتوب - 2000 ريال\n"
         "   - 🎧 سماعات - 100 ريال\n\n"
         "✍️ **للتجربة:**\n"
-        "اكتب 'STORE1234' ثم اختر منتج"
+        f"اكتب '{DEMO_STORE_CODE}' ثم اختر منتج"
     )
 
 async def handle_message(update: Update, context: CallbackContext):
     """معالجة الرسائل"""
     text = update.message.text
+    store_code = normalize_store_code(text)
     
     if "طلب تجريبي" in text:
         await update.message.reply_text(
@@ -85,9 +81,9 @@ async def handle_message(update: Update, context: CallbackContext):
             "🔙 للعودة: /start"
         )
     
-    elif text.startswith("STORE"):
+    elif len(store_code) == CODE_LENGTH and is_valid_store_code(store_code):
         await update.message.reply_text(
-            f"✅ **تم دخول المتجر:** {text}\n\n"
+            f"✅ **تم دخول المتجر:** {store_code}\n\n"
             "📋 **المنتجات:**\n"
             "1. 📱 هاتف - 500 ريال\n"
             "2. 💻 لابتوب - 2000 ريال\n"
@@ -133,33 +129,19 @@ async def handle_message(update: Update, context: CallbackContext):
             "أو اكتب 'طلب تجريبي'"
         )
 
-async def error_handler(update: Update, context: CallbackContext):
-    """معالجة الأخطاء"""
-    logger.error(f"Update {update} caused error {context.error}")
-    if update and update.effective_message:
-        await update.effective_message.reply_text(
-            "❌ حدث خطأ ما.\n"
-            "جرب /start لإعادة التشغيل."
-        )
-
-def main():
-    """الدالة الرئيسية"""
-    # إنشاء تطبيق البوت
-    application = Application.builder().token(BOT_TOKEN).build()
-    
-    # إضافة المعالجات
+def setup_demo_handlers(application):
+    """معالجات العرض التجريبي (بدون قاعدة بيانات)"""
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("register", register))
     application.add_handler(CommandHandler("demo", demo))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
-    
-    # معالجة الأخطاء
-    application.add_error_handler(error_handler)
-    
-    # بدء البوت
-    logger.info("🚀 بدء تشغيل البوت...")
-    application.run_polling(drop_pending_updates=True)
+
+def main():
+    """تشغيل العرض التجريبي (البوت الكامل: python src/factory.py)"""
+    from factory import Config, main as run_bot
+
+    run_bot(Config.from_env(handlers='demo'))
 
 if __name__ == '__main__':
     main()
@@ -1,20 +1,55 @@
 import logging
-import random
-import string
-from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove, InlineKeyboardButton, InlineKeyboardMarkup
+import os
+import tempfile
+from datetime import datetime
+from telegram import (
+    Update, ReplyKeyboardMarkup, ReplyKeyboardRemove, InlineKeyboardButton, InlineKeyboardMarkup,
+    InlineQueryResultArticle, InputFile, InputTextMessageContent
+)
 from telegram.ext import (
-    CommandHandler, MessageHandler, CallbackQueryHandler,
+    CommandHandler, MessageHandler, CallbackQueryHandler, InlineQueryHandler,
     filters, ConversationHandler, ContextTypes
 )
 
-from database import db
+from analytics import analytics, is_admin
+from async_database import adb
+from database import MAX_CART_ITEMS, MAX_ITEM_QUANTITY, STATUS_TRANSITIONS
+from export import EXPORT_FORMATS
+from product_import import IMPORT_FORMATS, MAX_IMPORT_FILE_SIZE, MAX_IMPORT_ROWS, parse_price
+from metrics import add_stats_source, instrument_handlers
+from notifier import notifier
+from outbox import PRIORITY_HIGH, outbox
 
 logger = logging.getLogger(__name__)
 
-# ========== دوال مساعدة ==========
-def generate_store_code():
-    """توليد كود متجر فريد"""
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+# عدد الطلبات في كل صفحة
+ORDERS_PAGE_SIZE = 10
+
+# عدد المنتجات في كل صفحة من الكتالوج ونتائج البحث
+CATALOG_PAGE_SIZE = 10
+MAX_SEARCH_LENGTH = 100
+
+# نتائج الوضع المضمن (@bot كود_المتجر بحث): حد Telegram 50 نتيجة لكل إجابة
+INLINE_PAGE_SIZE = 20
+# مدة احتفاظ خوادم Telegram بالإجابة (ثوانٍ)؛ النتائج نفسها لكل المستخدمين
+INLINE_CACHE_TIME = int(os.getenv('INLINE_CACHE_TIME', '60'))
+
+# أزرار الكمية عند اختيار منتج
+QUANTITY_CHOICES = (1, 2, 3, 5, 10)
+
+# أسماء حالات الطلب كما تظهر للبائع
+STATUS_LABELS = {
+    'pending': '🆕 جديد',
+    'confirmed': '✅ مؤكد',
+    'shipped': '🚚 تم الشحن',
+    'delivered': '📦 تم التسليم',
+    'cancelled': '❌ ملغي',
+}
+
+# أوامر المشرف: أفضل المتاجر والمنتجات لكل الوقت (من الفهرس مباشرة) أو لآخر أيام محددة،
+# والطلبات حسب الأيام لآخر ADMIN_DAILY_DAYS يوماً
+ADMIN_TOP_LIMIT = 10
+ADMIN_DAILY_DAYS = 14
 
 # ========== دوال البوت ==========
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -25,7 +60,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     ]
     reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
     
-    await update.message.reply_text(
+    outbox.reply(update.message,
         f"👋 أهلاً بك {update.effective_user.first_name}!\n\n"
         "أنا بوت إدارة الطلبات، يمكنني مساعدتك في:\n"
         "• تسجيل متجر جديد وإدارة منتجاتك\n"
@@ -61,14 +96,16 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     /help - عرض هذه المساعدة
     /dashboard - لوحة تحكم البائع
     /orders - عرض الطلبيات
+    /export - تصدير سجل الطلبات كملف (csv أو jsonl)
+    /import - إضافة منتجات من ملف (csv أو json)
     
     📞 للمساحة الإضافية، تواصل مع المطور.
     """
-    await update.message.reply_text(help_text)
+    outbox.reply(update.message, help_text)
 
 async def seller_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """بدء تسجيل البائع"""
-    await update.message.reply_text(
+    outbox.reply(update.message,
         "🏪 **تسجيل متجر جديد**\n\n"
         "أدخل اسمك الكامل:",
         reply_markup=ReplyKeyboardRemove()
@@ -78,33 +115,31 @@ async def seller_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def seller_register_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """حفظ اسم البائع"""
     context.user_data['seller_name'] = update.message.text
-    await update.message.reply_text("📝 أدخل اسم متجرك:")
+    outbox.reply(update.message, "📝 أدخل اسم متجرك:")
     return 2  # SELLER_REGISTER_STORE
 
 async def seller_register_store(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """حفظ اسم المتجر"""
     context.user_data['store_name'] = update.message.text
-    await update.message.reply_text("🔐 اختر كلمة مرور للمتجر:")
+    outbox.reply(update.message, "🔐 اختر كلمة مرور للمتجر:")
     return 3  # SELLER_REGISTER_PASSWORD
 
 async def seller_register_password(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """إكمال تسجيل البائع"""
     password = update.message.text
-    store_code = generate_store_code()
     
-    # حفظ البائع في قاعدة البيانات
-    success = db.add_seller(
+    # حفظ البائع في قاعدة البيانات مع كود فريد
+    store_code = await adb.register_seller(
         telegram_id=update.effective_user.id,
         store_name=context.user_data['store_name'],
-        store_code=store_code,
         password=password
     )
     
-    if success:
+    if store_code:
         keyboard = [['🔐 تسجيل الدخول']]
         reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
         
-        await update.message.reply_text(
+        outbox.reply(update.message,
             f"🎉 **تم تسجيل متجرك بنجاح!**\n\n"
             f"📋 **معلومات متجرك:**\n"
             f"• اسم المتجر: {context.user_data['store_name']}\n"
@@ -117,13 +152,27 @@ async def seller_register_password(update: Update, context: ContextTypes.DEFAULT
             parse_mode='Markdown'
         )
     else:
-        await update.message.reply_text("❌ حدث خطأ في التسجيل. حاول مرة أخرى.")
+        outbox.reply(update.message,
+            "ℹ️ لديك متجر مسجل مسبقاً.\n"
+            "استخدم '🔐 تسجيل الدخول' بكود متجرك.",
+            reply_markup=ReplyKeyboardMarkup([['🔐 تسجيل الدخول']], resize_keyboard=True)
+        )
     
     return ConversationHandler.END
 
+async def logged_in_seller(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """صف متجر البائع المسجل دخوله، أو None
+
+    كود المتجر يُعطى للزبائن و seller_id في الجلسة يتغير عند التسوق، فالمتجر يُؤخذ من
+    حساب Telegram الذي سجّله وليس من الجلسة.
+    """
+    if not context.user_data.get('logged_in') or update.effective_user is None:
+        return None
+    return await adb.get_seller_by_telegram_id(update.effective_user.id)
+
 async def seller_login_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """بدء تسجيل الدخول للبائع"""
-    await update.message.reply_text(
+    outbox.reply(update.message,
         "🔐 **تسجيل الدخول للمتجر**\n\n"
         "أدخل كود المتجر الخاص بك:",
         reply_markup=ReplyKeyboardRemove()
@@ -133,9 +182,10 @@ async def seller_login_start(update: Update, context: ContextTypes.DEFAULT_TYPE)
 async def seller_login_process(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """معالجة تسجيل الدخول"""
     store_code = update.message.text.strip()
-    seller = db.get_seller_by_code(store_code)
+    seller = await adb.get_seller_by_code(store_code)
     
-    if seller:
+    # الكود وحده لا يكفي: الزبائن يعرفونه، فالدخول لصاحب المتجر فقط
+    if seller and seller[1] == update.effective_user.id:
         context.user_data['seller_id'] = seller[0]
         context.user_data['store_name'] = seller[2]
         
@@ -146,7 +196,7 @@ async def seller_login_process(update: Update, context: ContextTypes.DEFAULT_TYP
         ]
         reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
         
-        await update.message.reply_text(
+        outbox.reply(update.message,
             f"✅ **تم تسجيل الدخول بنجاح!**\n\n"
             f"مرحباً بك في متجر: *{seller[2]}*\n"
             f"اختر من القائمة:",
@@ -155,44 +205,47 @@ async def seller_login_process(update: Update, context: ContextTypes.DEFAULT_TYP
         )
         
         context.user_data['logged_in'] = True
-        return 5  # SELLER_DASHBOARD
+        # أزرار لوحة البائع معالجات عامة، فتنتهي محادثة الدخول هنا
+        return ConversationHandler.END
     else:
-        await update.message.reply_text(
-            "❌ كود المتجر غير صحيح.\n"
-            "تأكد من الكود وأعد المحاولة."
+        outbox.reply(update.message,
+            "❌ كود المتجر غير صحيح أو لا يخص حسابك.\n"
+            "سجّل الدخول من حساب Telegram الذي سجّلت به المتجر."
         )
         return ConversationHandler.END
 
 async def seller_dashboard_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """أمر /dashboard"""
-    if not context.user_data.get('logged_in'):
-        await update.message.reply_text("❌ يجب تسجيل الدخول أولاً. استخدم '🔐 تسجيل الدخول'")
+    seller = await logged_in_seller(update, context)
+    if seller is None:
+        outbox.reply(update.message, "❌ يجب تسجيل الدخول أولاً. استخدم '🔐 تسجيل الدخول'")
         return
     
-    seller_id = context.user_data['seller_id']
-    store_name = context.user_data['store_name']
+    seller_id = seller[0]
+    store_name = seller[2]
     
     # الحصول على الإحصائيات
-    products = db.get_products_by_seller(seller_id)
-    orders = db.get_orders_for_seller(seller_id)
+    stats = await adb.get_seller_stats(seller_id)
     
     stats_text = (
         f"📊 **لوحة تحكم {store_name}**\n\n"
-        f"• عدد المنتجات: {len(products)}\n"
-        f"• عدد الطلبات: {len(orders)}\n"
-        f"• الطلبات الجديدة: {len([o for o in orders if o[6] == 'pending'])}\n\n"
+        f"• عدد المنتجات: {stats['products']}\n"
+        f"• عدد الطلبات: {stats['orders']}\n"
+        f"• الطلبات الجديدة: {stats['statuses'].get('pending', 0)}\n"
+        f"• إجمالي المبيعات: {stats['revenue']:g} ريال\n"
+        f"• آخر طلب: {stats['last_order_at'][:16] if stats['last_order_at'] else 'لا يوجد'}\n\n"
         f"استخدم الأزرار للتحكم."
     )
     
-    await update.message.reply_text(stats_text, parse_mode='Markdown')
+    outbox.reply(update.message, stats_text, parse_mode='Markdown')
 
 async def add_product_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """بدء إضافة منتج"""
-    if not context.user_data.get('logged_in'):
-        await update.message.reply_text("❌ يجب تسجيل الدخول أولاً.")
+    if await logged_in_seller(update, context) is None:
+        outbox.reply(update.message, "❌ يجب تسجيل الدخول أولاً.")
         return ConversationHandler.END
     
-    await update.message.reply_text(
+    outbox.reply(update.message,
         "🛍️ **إضافة منتج جديد**\n\n"
         "أدخل اسم المنتج:",
         reply_markup=ReplyKeyboardRemove()
@@ -202,26 +255,30 @@ async def add_product_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def add_product_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """حفظ اسم المنتج"""
     context.user_data['product_name'] = update.message.text
-    await update.message.reply_text("💰 أدخل سعر المنتج (بالريال):")
+    outbox.reply(update.message, "💰 أدخل سعر المنتج (بالريال):")
     return 7  # ADD_PRODUCT_PRICE
 
 async def add_product_price(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """حفظ سعر المنتج"""
     try:
-        price = float(update.message.text)
+        price = parse_price(update.message.text)
         context.user_data['product_price'] = price
-        await update.message.reply_text("📝 أدخل وصف للمنتج (اختياري، أو اكتب 'تخطي'):")
+        outbox.reply(update.message, "📝 أدخل وصف للمنتج (اختياري، أو اكتب 'تخطي'):")
         return 8  # ADD_PRODUCT_DESC
     except ValueError:
-        await update.message.reply_text("❌ السعر يجب أن يكون رقم. حاول مرة أخرى:")
+        outbox.reply(update.message, "❌ السعر يجب أن يكون رقم. حاول مرة أخرى:")
         return 7
 
 async def add_product_desc(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """إنهاء إضافة المنتج"""
     description = update.message.text if update.message.text != 'تخطي' else ""
+    seller = await logged_in_seller(update, context)
+    if seller is None:
+        outbox.reply(update.message, "❌ يجب تسجيل الدخول أولاً.")
+        return ConversationHandler.END
     
-    product_id = db.add_product(
-        seller_id=context.user_data['seller_id'],
+    product_id = await adb.add_product(
+        seller_id=seller[0],
         name=context.user_data['product_name'],
         price=context.user_data['product_price'],
         description=description
@@ -230,7 +287,7 @@ async def add_product_desc(update: Update, context: ContextTypes.DEFAULT_TYPE):
     keyboard = [['➕ إضافة منتج آخر', '🔙 لوحة التحكم']]
     reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
     
-    await update.message.reply_text(
+    outbox.reply(update.message,
         f"✅ **تم إضافة المنتج بنجاح!**\n\n"
         f"🛍️ المنتج: {context.user_data['product_name']}\n"
         f"💰 السعر: {context.user_data['product_price']} ريال\n"
@@ -245,151 +302,640 @@ async def add_product_desc(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     return ConversationHandler.END
 
+async def import_products_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """أمر /import - شرح صيغة ملف المنتجات"""
+    if await logged_in_seller(update, context) is None:
+        outbox.reply(update.message, "❌ يجب تسجيل الدخول أولاً.")
+        return
+    outbox.reply(update.message,
+        "📥 **استيراد المنتجات من ملف**\n\n"
+        "أرسل ملف CSV أو JSON أو JSONL (حتى "
+        f"{MAX_IMPORT_ROWS} منتج و {MAX_IMPORT_FILE_SIZE // (1024 * 1024)} ميجابايت).\n\n"
+        "CSV بأعمدة: name,price,description (أو الاسم,السعر,الوصف)\n"
+        "قلم أزرق,5,حبر جاف\n\n"
+        "JSON: [{\"name\": \"قلم أزرق\", \"price\": 5, \"description\": \"حبر جاف\"}]"
+    )
+
+async def import_products_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """إضافة منتجات البائع من ملف مرفوع دفعة واحدة"""
+    seller = await logged_in_seller(update, context)
+    if seller is None:
+        outbox.reply(update.message, "❌ يجب تسجيل الدخول أولاً.")
+        return
+
+    document = update.message.document
+    fmt = (document.file_name or '').rsplit('.', 1)[-1].lower()
+    if fmt not in IMPORT_FORMATS:
+        outbox.reply(update.message, "❌ أرسل ملف CSV أو JSON أو JSONL. للتفاصيل: /import")
+        return
+    if document.file_size and document.file_size > MAX_IMPORT_FILE_SIZE:
+        outbox.reply(update.message,
+            f"❌ الملف أكبر من {MAX_IMPORT_FILE_SIZE // (1024 * 1024)} ميجابايت."
+        )
+        return
+
+    # الملف الكبير يُحفظ على القرص بدل الذاكرة
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as upload:
+        telegram_file = await document.get_file()
+        await telegram_file.download_to_memory(upload)
+        upload.seek(0)
+        try:
+            products, report = await adb.parse_products(upload, fmt)
+        except ValueError as e:
+            outbox.reply(update.message, f"❌ الملف غير صالح: {e}")
+            return
+
+    await adb.add_products(seller[0], products)
+
+    lines = [
+        "📥 **نتيجة الاستيراد:**\n",
+        f"✅ تمت إضافة: {len(products)} منتج",
+        f"❌ مرفوض: {report['rejected']}",
+    ]
+    if report['truncated']:
+        lines.append(f"⚠️ تم التوقف عند {MAX_IMPORT_ROWS} منتج، أرسل الباقي في ملف آخر.")
+    if report['errors']:
+        lines.append("\nأول الأخطاء:")
+        lines.extend(f"• صف {number}: {reason}" for number, reason in report['errors'])
+    outbox.reply(update.message, '\n'.join(lines))
+
 async def buyer_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """بدء طلب الزبون"""
-    await update.message.reply_text(
+    outbox.reply(update.message,
         "🛒 **طلب جديد**\n\n"
         "أدخل كود المتجر الذي تريد الشراء منه:",
         reply_markup=ReplyKeyboardRemove()
     )
     return 9  # BUYER_ENTER_CODE
 
-async def buyer_enter_code(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """التحقق من كود المتجر"""
-    store_code = update.message.text.strip()
-    seller = db.get_seller_by_code(store_code)
+def cart_items(cart):
+    """السلة في user_data {"product_id": الكمية} (مفاتيح نصية لتبقى صالحة بعد JSON)"""
+    return [(int(product_id), quantity) for product_id, quantity in cart.items()]
+
+def format_cart(cart, products_by_id):
+    """أسطر السلة والإجمالي"""
+    lines = []
+    total = 0
+    for product_id, quantity in cart_items(cart):
+        product = products_by_id.get(product_id)
+        if product is None:
+            continue
+        total += product[3] * quantity
+        lines.append(f"• {product[2]} × {quantity} = {product[3] * quantity} ريال")
+    return '\n'.join(lines), total
+
+def format_catalog(store_name, page, cart, products_by_id, offset=0, has_next=False, query=None):
+    """صفحة من منتجات المتجر (أو نتائج البحث) مع محتوى السلة وأزرار الإتمام"""
+    keyboard = []
+    for product in page:
+        product_id, _, name, price, description, _ = product
+        in_cart = cart.get(str(product_id))
+        button_text = f"{name} - {price} ريال" + (f" (🛒 {in_cart})" if in_cart else "")
+        keyboard.append([InlineKeyboardButton(button_text, callback_data=f"product_{product_id}")])
+
+    # التنقل بين الصفحات
+    buttons = []
+    if offset > 0:
+        buttons.append(InlineKeyboardButton("⬅️ السابق", callback_data=f"catalog|{max(0, offset - CATALOG_PAGE_SIZE)}"))
+    if has_next:
+        buttons.append(InlineKeyboardButton("التالي ➡️", callback_data=f"catalog|{offset + CATALOG_PAGE_SIZE}"))
+    if buttons:
+        keyboard.append(buttons)
+    if query:
+        keyboard.append([InlineKeyboardButton("❌ إلغاء البحث", callback_data="catalog|all")])
+
+    sections = [f"🛍️ **متجر: {store_name}**"]
+    if query:
+        sections.append(f"🔍 نتائج البحث عن: {query}" if page else f"🔍 لا توجد نتائج لـ: {query}")
+    if cart:
+        lines, total = format_cart(cart, products_by_id)
+        sections.append(f"🛒 **سلتك:**\n{lines}\n💰 الإجمالي: {total} ريال")
+        sections.append("أضف منتجات أخرى أو أتمم الطلب:")
+        keyboard.append([
+            InlineKeyboardButton(f"✅ إتمام الطلب ({sum(cart.values())})", callback_data="cart_checkout"),
+            InlineKeyboardButton("🗑️ تفريغ السلة", callback_data="cart_clear"),
+        ])
+    elif not query:
+        sections.append("اختر المنتجات التي تريد طلبها:")
+    if offset > 0 or has_next or query:
+        sections.append("💡 اكتب اسم المنتج للبحث عنه.")
+    return '\n\n'.join(sections), InlineKeyboardMarkup(keyboard)
+
+async def render_catalog(context):
+    """الصفحة الحالية من الكتالوج حسب catalog_view في user_data: {'query', 'offset'}"""
+    seller_id = context.user_data['seller_id']
+    view = context.user_data.setdefault('catalog_view', {'query': None, 'offset': 0})
+    products = await adb.get_products_by_seller(seller_id)
+    offset = view['offset']
+
+    if view['query']:
+        page, has_next = await adb.search_products(
+            seller_id, view['query'], limit=CATALOG_PAGE_SIZE, offset=offset
+        )
+    else:
+        page = products[offset:offset + CATALOG_PAGE_SIZE]
+        has_next = len(products) > offset + CATALOG_PAGE_SIZE
+
+    return format_catalog(
+        context.user_data['store_name'], page, context.user_data.get('cart', {}),
+        {product[0]: product for product in products}, offset, has_next, view['query']
+    )
+
+async def open_store(update: Update, context: ContextTypes.DEFAULT_TYPE, store_code):
+    """دخول الزبون لمتجر بكوده وعرض الكتالوج"""
+    seller = await adb.get_seller_by_code(store_code)
     
     if seller:
         context.user_data['seller_id'] = seller[0]
         context.user_data['store_name'] = seller[2]
+        context.user_data['cart'] = {}
+        context.user_data['catalog_view'] = {'query': None, 'offset': 0}
         
         # الحصول على منتجات المتجر
-        products = db.get_products_by_seller(seller[0])
+        products = await adb.get_products_by_seller(seller[0])
         
         if products:
-            keyboard = []
-            for product in products:
-                product_id, _, name, price, description, _ = product
-                button_text = f"{name} - {price} ريال"
-                keyboard.append([InlineKeyboardButton(button_text, callback_data=f"product_{product_id}")])
-            
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.message.reply_text(
-                f"🛍️ **متجر: {seller[2]}**\n\n"
-                f"اختر المنتج الذي تريد طلبه:",
-                reply_markup=reply_markup
-            )
+            text, reply_markup = await render_catalog(context)
+            outbox.reply(update.message, text, reply_markup=reply_markup)
             return 10  # BUYER_SELECT_PRODUCT
         else:
-            await update.message.reply_text("❌ هذا المتجر ليس لديه منتجات بعد.")
+            outbox.reply(update.message, "❌ هذا المتجر ليس لديه منتجات بعد.")
             return ConversationHandler.END
     else:
-        await update.message.reply_text("❌ كود المتجر غير صحيح. تأكد من الكود وأعد المحاولة.")
+        outbox.reply(update.message, "❌ كود المتجر غير صحيح. تأكد من الكود وأعد المحاولة.")
         return ConversationHandler.END
 
+async def buyer_enter_code(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """التحقق من كود المتجر"""
+    return await open_store(update, context, update.message.text)
+
+async def buyer_start_link(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """رابط /start <كود المتجر> من نتائج الوضع المضمن"""
+    return await open_store(update, context, context.args[0])
+
+def store_link(bot_username, store_code):
+    """رابط فتح المتجر في محادثة البوت"""
+    return f"https://t.me/{bot_username}?start={store_code}"
+
+def inline_result(product, store_code, store_name, bot_username):
+    """نتيجة inline لمنتج: رسالة بتفاصيله وزر لفتح المتجر"""
+    product_id, _, name, price, description, _ = product
+    return InlineQueryResultArticle(
+        id=str(product_id),
+        title=f"{name} - {price} ريال",
+        description=description or store_name,
+        input_message_content=InputTextMessageContent(
+            f"🛍️ {name}\n"
+            f"💰 {price} ريال\n"
+            f"📝 {description if description else 'لا يوجد وصف'}\n\n"
+            f"🏪 {store_name} - كود المتجر: {store_code}"
+        ),
+        reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton("🛒 اطلب الآن", url=store_link(bot_username, store_code))]
+        ]),
+    )
+
+async def inline_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """الوضع المضمن: @bot كود_المتجر [بحث] - منتجات المتجر مع التنقل عبر next_offset"""
+    inline_query = update.inline_query
+    store_code, _, text = inline_query.query.strip().partition(' ')
+    offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+
+    seller, products, next_offset = None, [], None
+    if store_code:
+        seller, products, next_offset = await adb.inline_products(
+            store_code, text[:MAX_SEARCH_LENGTH], limit=INLINE_PAGE_SIZE, offset=offset
+        )
+
+    results = [
+        inline_result(product, seller[3], seller[2], context.bot.username)
+        for product in products
+    ]
+    await inline_query.answer(
+        results,
+        cache_time=INLINE_CACHE_TIME,
+        is_personal=False,
+        next_offset=str(next_offset) if next_offset else '',
+    )
+
 async def buyer_select_product_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """معالجة اختيار المنتج"""
+    """معالجة اختيار المنتج: عرض تفاصيله وأزرار الكمية"""
     query = update.callback_query
     await query.answer()
     
     product_id = int(query.data.split('_')[1])
-    context.user_data['product_id'] = product_id
     
     # الحصول على تفاصيل المنتج
-    products = db.get_products_by_seller(context.user_data['seller_id'])
-    selected_product = None
-    for product in products:
-        if product[0] == product_id:
-            selected_product = product
-            break
+    selected_product = await adb.get_product(context.user_data['seller_id'], product_id)
     
     if selected_product:
-        context.user_data['selected_product'] = selected_product
-        
-        await query.edit_message_text(
+        keyboard = [
+            [InlineKeyboardButton(str(n), callback_data=f"qty_{product_id}_{n}") for n in QUANTITY_CHOICES],
+            [InlineKeyboardButton("🔙 رجوع للمنتجات", callback_data="cart_back")],
+        ]
+        outbox.edit(query,
             f"🛍️ **اخترت المنتج:**\n\n"
             f"• الاسم: {selected_product[2]}\n"
             f"• السعر: {selected_product[3]} ريال\n"
             f"• الوصف: {selected_product[4] if selected_product[4] else 'لا يوجد'}\n\n"
-            f"الآن أدخل اسمك الكامل:"
+            f"كم قطعة تريد؟",
+            reply_markup=InlineKeyboardMarkup(keyboard)
         )
-        return 11  # BUYER_ENTER_NAME
+    return 10  # BUYER_SELECT_PRODUCT
+
+async def buyer_cart_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """إضافة كمية للسلة، تفريغها، أو الرجوع للمنتجات"""
+    query = update.callback_query
+    cart = context.user_data.setdefault('cart', {})
+
+    if query.data.startswith('qty_'):
+        _, product_id, quantity = query.data.split('_')
+        new_quantity = cart.get(product_id, 0) + int(quantity)
+        if product_id not in cart and len(cart) >= MAX_CART_ITEMS:
+            await query.answer(f"⚠️ الحد الأقصى {MAX_CART_ITEMS} منتجاً في الطلب.", show_alert=True)
+        elif new_quantity > MAX_ITEM_QUANTITY:
+            await query.answer(f"⚠️ الحد الأقصى للكمية {MAX_ITEM_QUANTITY}.", show_alert=True)
+        else:
+            cart[product_id] = new_quantity
+            await query.answer("✅ أضيف إلى السلة")
+    elif query.data == 'cart_clear':
+        cart.clear()
+        await query.answer("🗑️ تم تفريغ السلة")
+    else:
+        await query.answer()
+
+    text, reply_markup = await render_catalog(context)
+    outbox.edit(query, text, reply_markup=reply_markup)
+    return 10  # BUYER_SELECT_PRODUCT
+
+async def buyer_search_products(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """البحث في منتجات المتجر بنص يكتبه الزبون"""
+    query = update.message.text.strip()[:MAX_SEARCH_LENGTH]
+    context.user_data['catalog_view'] = {'query': query, 'offset': 0}
+    text, reply_markup = await render_catalog(context)
+    outbox.reply(update.message, text, reply_markup=reply_markup)
+    return 10  # BUYER_SELECT_PRODUCT
+
+async def buyer_catalog_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """التنقل بين صفحات الكتالوج أو نتائج البحث، أو إلغاء البحث"""
+    query = update.callback_query
+    await query.answer()
+
+    _, target = query.data.split('|')
+    view = context.user_data.setdefault('catalog_view', {'query': None, 'offset': 0})
+    if target == 'all':
+        view.update(query=None, offset=0)
+    else:
+        view['offset'] = max(0, int(target))
+
+    text, reply_markup = await render_catalog(context)
+    outbox.edit(query, text, reply_markup=reply_markup)
+    return 10  # BUYER_SELECT_PRODUCT
+
+async def buyer_checkout_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """إتمام اختيار المنتجات والانتقال لبيانات الزبون"""
+    query = update.callback_query
+    cart = context.user_data.get('cart')
+    if not cart:
+        await query.answer("🛒 السلة فارغة.", show_alert=True)
+        return 10  # BUYER_SELECT_PRODUCT
+
+    await query.answer()
+    products = await adb.get_products_by_seller(context.user_data['seller_id'])
+    lines, total = format_cart(cart, {product[0]: product for product in products})
+    outbox.edit(query,
+        f"🛒 **طلبك:**\n{lines}\n💰 الإجمالي: {total} ريال\n\n"
+        f"الآن أدخل اسمك الكامل:"
+    )
+    return 11  # BUYER_ENTER_NAME
 
 async def buyer_enter_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """حفظ اسم الزبون"""
     context.user_data['customer_name'] = update.message.text
-    await update.message.reply_text("📱 أدخل رقم هاتفك:")
+    outbox.reply(update.message, "📱 أدخل رقم هاتفك:")
     return 12  # BUYER_ENTER_PHONE
 
 async def buyer_enter_phone(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """حفظ رقم هاتف الزبون"""
     context.user_data['customer_phone'] = update.message.text
-    await update.message.reply_text("📍 أدخل عنوان التوصيل:")
+    outbox.reply(update.message, "📍 أدخل عنوان التوصيل:")
     return 13  # BUYER_ENTER_ADDRESS
 
 async def buyer_enter_address(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """إنهاء الطلب وإرساله"""
     address = update.message.text
+    cart = context.user_data.get('cart', {})
+    customer_name = context.user_data['customer_name']
+    customer_phone = context.user_data['customer_phone']
     
-    # حفظ الطلب في قاعدة البيانات
-    order_id = db.add_order(
-        product_id=context.user_data['product_id'],
-        customer_name=context.user_data['customer_name'],
-        customer_phone=context.user_data['customer_phone'],
-        customer_address=address
-    )
+    # حفظ الطلب وكل منتجاته في معاملة واحدة
+    try:
+        order_id = await adb.add_cart(
+            cart_items(cart),
+            customer_name=customer_name,
+            customer_phone=customer_phone,
+            customer_address=address
+        )
+    except ValueError:
+        # منتج حُذف أو سلة غير صالحة
+        outbox.reply(update.message,
+            "❌ تعذر إتمام الطلب، أعد المحاولة من البداية.",
+            reply_markup=ReplyKeyboardMarkup([['🏠 القائمة الرئيسية']], resize_keyboard=True)
+        )
+        return ConversationHandler.END
+    
+    products = await adb.get_products_by_seller(context.user_data['seller_id'])
+    lines, total = format_cart(cart, {product[0]: product for product in products})
     
-    product = context.user_data['selected_product']
+    # إشعار البائع (يُجمع مع طلبات أخرى ويُرسل في الخلفية)
+    notifier.publish({
+        'seller_id': context.user_data['seller_id'],
+        'order_id': order_id,
+        'items': lines,
+        'total': total,
+        'customer_name': customer_name,
+        'customer_phone': customer_phone,
+        'customer_address': address,
+    }, bot=context.bot)
     
     # تنظيف البيانات المؤقتة
-    for key in ['product_id', 'selected_product', 'customer_name', 'customer_phone']:
+    for key in ['cart', 'catalog_view', 'customer_name', 'customer_phone']:
         context.user_data.pop(key, None)
     
     keyboard = [['🏠 القائمة الرئيسية']]
     reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
     
-    await update.message.reply_text(
+    outbox.reply(update.message,
         f"🎉 **تم استلام طلبك بنجاح!**\n\n"
         f"📋 **تفاصيل طلبك:**\n"
         f"• رقم الطلب: #{order_id}\n"
-        f"• المنتج: {product[2]}\n"
-        f"• السعر: {product[3]} ريال\n"
-        f"• الاسم: {context.user_data['customer_name']}\n"
-        f"• الهاتف: {context.user_data['customer_phone']}\n"
+        f"{lines}\n"
+        f"• الإجمالي: {total} ريال\n"
+        f"• الاسم: {customer_name}\n"
+        f"• الهاتف: {customer_phone}\n"
         f"• العنوان: {address}\n\n"
         f"✅ سيتم التواصل معك قريباً.\n"
         f"شكراً لثقتك بنا!",
-        reply_markup=reply_markup
+        reply_markup=reply_markup,
+        priority=PRIORITY_HIGH
     )
     
     return ConversationHandler.END
 
-async def view_orders_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """أمر /orders"""
-    if not context.user_data.get('logged_in'):
-        await update.message.reply_text("❌ يجب تسجيل الدخول أولاً.")
+def format_orders_page(orders, has_older, has_newer, status=None):
+    """نص وأزرار صفحة من الطلبات"""
+    title = "🆕 **الطلبات الجديدة:**" if status == 'pending' else "📋 **الطلبيات الأخيرة:**"
+    orders_text = f"{title}\n\n"
+    keyboard = []
+    for order in orders:
+        order_id, _, customer_name, customer_phone, customer_address, quantity, order_status, created_at, items, total = order
+        orders_text += (
+            f"🆔 #{order_id} - {items}\n"
+            f"👤 {customer_name} - 📱 {customer_phone}\n"
+            f"📍 {customer_address}\n"
+            f"💰 {total} ريال - 📅 {created_at[:16]}\n"
+            f"🔸 الحالة: {STATUS_LABELS.get(order_status, order_status)}\n"
+            f"{'-'*30}\n"
+        )
+        # أزرار الانتقالات المسموحة فقط
+        actions = [
+            InlineKeyboardButton(f"{STATUS_LABELS[target]} #{order_id}", callback_data=f"status|{order_id}|{target}")
+            for target in STATUS_TRANSITIONS.get(order_status, ())
+        ]
+        if actions:
+            keyboard.append(actions)
+
+    if any(order[6] == 'pending' for order in orders):
+        keyboard.append([InlineKeyboardButton("✅ تأكيد كل الجديدة في الصفحة", callback_data="status_bulk|confirmed")])
+
+    # المؤشر (created_at, id) لأول وآخر طلب في الصفحة
+    buttons = []
+    if has_newer:
+        first = orders[0]
+        buttons.append(InlineKeyboardButton("⬅️ السابق", callback_data=f"orders|prev|{first[7]}|{first[0]}"))
+    if has_older:
+        last = orders[-1]
+        buttons.append(InlineKeyboardButton("التالي ➡️", callback_data=f"orders|next|{last[7]}|{last[0]}"))
+    if buttons:
+        keyboard.append(buttons)
+    reply_markup = InlineKeyboardMarkup(keyboard) if keyboard else None
+    return orders_text, reply_markup
+
+async def load_orders_view(seller_id, view):
+    """جلب الصفحة الموصوفة في view: {'status', 'direction', 'cursor'}"""
+    status = view.get('status')
+    cursor = tuple(view['cursor']) if view.get('cursor') else None
+    if cursor is None:
+        orders, has_older = await adb.get_orders_page(seller_id, limit=ORDERS_PAGE_SIZE, status=status)
+        has_newer = False
+    elif view['direction'] == 'next':
+        orders, has_older = await adb.get_orders_page(seller_id, limit=ORDERS_PAGE_SIZE, before=cursor, status=status)
+        has_newer = True
+    else:
+        orders, has_newer = await adb.get_orders_page(seller_id, limit=ORDERS_PAGE_SIZE, after=cursor, status=status)
+        has_older = True
+    return orders, has_older, has_newer
+
+async def view_orders_command(update: Update, context: ContextTypes.DEFAULT_TYPE, status=None):
+    """أمر /orders (أو الطلبات الجديدة فقط مع status='pending')"""
+    seller = await logged_in_seller(update, context)
+    if seller is None:
+        outbox.reply(update.message, "❌ يجب تسجيل الدخول أولاً.")
         return
     
-    seller_id = context.user_data['seller_id']
-    orders = db.get_orders_for_seller(seller_id)
+    seller_id = seller[0]
+    # الصفحة الحالية تُحفظ لإعادة عرضها بعد تغيير الحالات
+    view = context.user_data['orders_view'] = {'status': status, 'direction': None, 'cursor': None}
+    orders, has_older, has_newer = await load_orders_view(seller_id, view)
     
     if orders:
-        orders_text = "📋 **الطلبيات الأخيرة:**\n\n"
-        for order in orders[:10]:  # عرض آخر 10 طلبات فقط
-            order_id, _, customer_name, customer_phone, customer_address, quantity, status, created_at, product_name, price = order
-            orders_text += (
-                f"🆔 #{order_id} - {product_name}\n"
-                f"👤 {customer_name} - 📱 {customer_phone}\n"
-                f"📍 {customer_address}\n"
-                f"💰 {price} ريال - 📅 {created_at[:16]}\n"
-                f"🔸 الحالة: {status}\n"
-                f"{'-'*30}\n"
-            )
-        
-        await update.message.reply_text(orders_text)
+        orders_text, reply_markup = format_orders_page(orders, has_older, has_newer, status)
+        outbox.reply(update.message, orders_text, reply_markup=reply_markup)
+    elif status == 'pending':
+        outbox.reply(update.message, "📭 لا توجد طلبات جديدة.")
+    else:
+        outbox.reply(update.message, "📭 لا توجد طلبات حتى الآن.")
+
+async def export_orders_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """أمر /export [csv|jsonl] [YYYY-MM-DD] - سجل الطلبات كملف مضغوط"""
+    seller = await logged_in_seller(update, context)
+    if seller is None:
+        outbox.reply(update.message, "❌ يجب تسجيل الدخول أولاً.")
+        return
+
+    fmt, since = 'csv', None
+    for arg in context.args or []:
+        if arg.lower() in EXPORT_FORMATS:
+            fmt = arg.lower()
+        else:
+            try:
+                since = datetime.strptime(arg, '%Y-%m-%d').strftime('%Y-%m-%d')
+            except ValueError:
+                outbox.reply(update.message,
+                    "❌ الاستخدام: /export [csv|jsonl] [YYYY-MM-DD]\n"
+                    "مثال: /export jsonl 2024-01-01"
+                )
+                return
+
+    document, count = await adb.export_orders(seller[0], fmt, since)
+    with document:
+        if not count:
+            outbox.reply(update.message, "📭 لا توجد طلبات للتصدير.")
+            return
+        suffix = f"-{since}" if since else ""
+        # الرفع ليس متدفقاً: الملف المضغوط يُقرأ كاملاً للذاكرة مرة واحدة، فتعيد محاولات
+        # Outbox بعد RetryAfter رفع نفس المحتوى بدل ملف وصل لنهايته
+        upload = InputFile(await adb.read(document.read), filename=f"orders{suffix}.{fmt}.gz")
+        outbox.post(
+            update.message.chat_id, update.message.reply_document, upload,
+            caption=f"📦 {count} طلب",
+        )
+
+async def orders_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """التنقل بين صفحات الطلبات"""
+    query = update.callback_query
+    await query.answer()
+
+    seller = await logged_in_seller(update, context)
+    if seller is None:
+        outbox.edit(query, "❌ يجب تسجيل الدخول أولاً.")
+        return
+
+    _, direction, created_at, order_id = query.data.split('|')
+    status = context.user_data.get('orders_view', {}).get('status')
+    view = context.user_data['orders_view'] = {
+        'status': status, 'direction': direction, 'cursor': [created_at, int(order_id)]
+    }
+    await refresh_orders_view(query, seller[0], view)
+
+async def refresh_orders_view(query, seller_id, view):
+    """إعادة عرض الصفحة الحالية في نفس الرسالة"""
+    orders, has_older, has_newer = await load_orders_view(seller_id, view)
+    if not orders and view.get('cursor'):
+        # الصفحة فرغت (مثلاً بعد تأكيد كل الجديدة): العودة لأول صفحة
+        view.update(direction=None, cursor=None)
+        orders, has_older, has_newer = await load_orders_view(seller_id, view)
+
+    if not orders:
+        outbox.edit(query, "📭 لا توجد طلبات أخرى.")
+        return
+
+    orders_text, reply_markup = format_orders_page(orders, has_older, has_newer, view.get('status'))
+    outbox.edit(query, orders_text, reply_markup=reply_markup)
+
+async def order_status_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """تغيير حالة طلب من أزرار صفحة الطلبات"""
+    query = update.callback_query
+    seller = await logged_in_seller(update, context)
+    if seller is None:
+        await query.answer()
+        outbox.edit(query, "❌ يجب تسجيل الدخول أولاً.")
+        return
+
+    _, order_id, new_status = query.data.split('|')
+    seller_id = seller[0]
+    if await adb.update_order_status(int(order_id), new_status, seller_id=seller_id):
+        await query.answer(f"#{order_id}: {STATUS_LABELS[new_status]}")
     else:
-        await update.message.reply_text("📭 لا توجد طلبات حتى الآن.")
+        await query.answer("⚠️ لا يمكن تغيير حالة هذا الطلب.", show_alert=True)
+
+    view = context.user_data.get('orders_view') or {'status': None, 'direction': None, 'cursor': None}
+    await refresh_orders_view(query, seller_id, view)
+
+async def bulk_status_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """نقل كل طلبات الصفحة الحالية القابلة للانتقال في معاملة واحدة"""
+    query = update.callback_query
+    seller = await logged_in_seller(update, context)
+    if seller is None:
+        await query.answer()
+        outbox.edit(query, "❌ يجب تسجيل الدخول أولاً.")
+        return
+
+    _, new_status = query.data.split('|')
+    seller_id = seller[0]
+    view = context.user_data.get('orders_view') or {'status': None, 'direction': None, 'cursor': None}
+
+    orders, _, _ = await load_orders_view(seller_id, view)
+    order_ids = [order[0] for order in orders if new_status in STATUS_TRANSITIONS.get(order[6], ())]
+    updated = await adb.update_statuses(order_ids, new_status, seller_id=seller_id) if order_ids else []
+    await query.answer(f"تم تحديث {len(updated)} طلب: {STATUS_LABELS[new_status]}")
+
+    await refresh_orders_view(query, seller_id, view)
+
+async def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """أمر /admin - إحصائيات السوق كاملاً"""
+    if not is_admin(update.effective_user.id):
+        outbox.reply(update.message, "❌ غير مصرح لك بالدخول")
+        return
+
+    stats = await adb.read(analytics.overview)
+    statuses = '\n'.join(
+        f"  {STATUS_LABELS.get(status, status)}: {count}" for status, count in stats['statuses'].items()
+    )
+    outbox.reply(update.message,
+        f"👑 **لوحة المشرف**\n\n"
+        f"• عدد المتاجر: {stats['stores']}\n"
+        f"• عدد المنتجات: {stats['products']}\n"
+        f"• عدد الطلبات: {stats['orders']}\n"
+        f"• إجمالي المبيعات: {stats['revenue']:g} ريال\n\n"
+        f"📅 اليوم: {stats['today']['orders']} طلب، {stats['today']['revenue']:g} ريال\n"
+        f"🕐 آخر 24 ساعة: {stats['last_24h']['orders']} طلب، {stats['last_24h']['revenue']:g} ريال\n\n"
+        f"📋 **حالات الطلبات:**\n{statuses or '  لا توجد طلبات'}\n\n"
+        f"/allstores - أفضل المتاجر\n"
+        f"/allorders - الطلبات حسب الأيام وأفضل المنتجات"
+    )
+
+def admin_period(context):
+    """فترة الأمر بالأيام من أول معامل، أو None لكل الوقت"""
+    if context.args and context.args[0].isdigit():
+        return max(1, min(int(context.args[0]), 3650))
+    return None
+
+async def all_stores_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """أمر /allstores [أيام] - المتاجر الأعلى مبيعاً"""
+    if not is_admin(update.effective_user.id):
+        outbox.reply(update.message, "❌ غير مصرح لك بالدخول")
+        return
+
+    days = admin_period(context)
+    stores = await adb.read(analytics.top_stores, days, ADMIN_TOP_LIMIT)
+    period = f"آخر {days} يوم" if days else "كل الوقت"
+    if not stores:
+        outbox.reply(update.message, f"📭 لا توجد طلبات ({period}).")
+        return
+
+    lines = [f"🏪 **أفضل المتاجر ({period}):**\n"]
+    for rank, (_, store_name, store_code, orders, revenue) in enumerate(stores, start=1):
+        lines.append(f"{rank}. {store_name or '؟'} ({store_code or '-'}) - {orders} طلب، {revenue:g} ريال")
+    lines.append("\n💡 لآخر 7 أيام: /allstores 7")
+    outbox.reply(update.message, '\n'.join(lines))
+
+async def all_orders_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """أمر /allorders [أيام] - الطلبات حسب الأيام وأفضل المنتجات"""
+    if not is_admin(update.effective_user.id):
+        outbox.reply(update.message, "❌ غير مصرح لك بالدخول")
+        return
+
+    days = admin_period(context)
+    daily = await adb.read(analytics.daily, min(days or ADMIN_DAILY_DAYS, ADMIN_DAILY_DAYS))
+    products = await adb.read(analytics.top_products, days, ADMIN_TOP_LIMIT)
+    period = f"آخر {days} يوم" if days else "كل الوقت"
+
+    lines = ["📅 **الطلبات حسب الأيام (UTC):**"]
+    lines.extend(
+        f"• {day}: {orders} طلب، {revenue:g} ريال" + (f" (ملغي {cancelled})" if cancelled else "")
+        for day, orders, revenue, cancelled in daily
+    )
+    if not daily:
+        lines.append("لا توجد طلبات حديثة.")
+    lines.append(f"\n🛍️ **أفضل المنتجات ({period}):**")
+    lines.extend(
+        f"{rank}. {name or '؟'} - {store_name or '؟'}: {quantity} قطعة، {revenue:g} ريال"
+        for rank, (_, name, store_name, quantity, revenue) in enumerate(products, start=1)
+    )
+    if not products:
+        lines.append("لا توجد مبيعات.")
+    outbox.reply(update.message, '\n'.join(lines))
 
 async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """معالجة أزرار Inline"""
@@ -398,7 +944,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """إلغاء المحادثة"""
-    await update.message.reply_text(
+    outbox.reply(update.message,
         "تم الإلغاء.",
         reply_markup=ReplyKeyboardMarkup([['/start']], resize_keyboard=True)
     )
@@ -407,9 +953,13 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ========== إعداد المعالجات ==========
 def setup_bot_handlers(application):
     """إعداد جميع معالجات البوت"""
+    # حفظ حالة المحادثات عبر إعادة التشغيل إن كان للتطبيق persistence
+    persistent = application.persistence is not None
     
     # محادثة تسجيل البائع
     seller_conv = ConversationHandler(
+        name='seller_conv',
+        persistent=persistent,
         entry_points=[MessageHandler(filters.Regex('^(🏪 تسجيل كبائع)$'), seller_start)],
         states={
             1: [MessageHandler(filters.TEXT & ~filters.COMMAND, seller_register_name)],
@@ -421,6 +971,8 @@ def setup_bot_handlers(application):
     
     # محادثة تسجيل الدخول للبائع
     seller_login_conv = ConversationHandler(
+        name='seller_login_conv',
+        persistent=persistent,
         entry_points=[MessageHandler(filters.Regex('^🔐 تسجيل الدخول$'), seller_login_start)],
         states={
             4: [MessageHandler(filters.TEXT & ~filters.COMMAND, seller_login_process)],
@@ -430,6 +982,8 @@ def setup_bot_handlers(application):
     
     # محادثة إضافة منتج
     add_product_conv = ConversationHandler(
+        name='add_product_conv',
+        persistent=persistent,
         entry_points=[MessageHandler(filters.Regex('^➕ إضافة منتج$'), add_product_start)],
         states={
             6: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_product_name)],
@@ -441,10 +995,23 @@ def setup_bot_handlers(application):
     
     # محادثة الزبون
     buyer_conv = ConversationHandler(
-        entry_points=[MessageHandler(filters.Regex('^(🛒 طلب كزبون)$'), buyer_start)],
+        name='buyer_conv',
+        persistent=persistent,
+        entry_points=[
+            MessageHandler(filters.Regex('^(🛒 طلب كزبون)$'), buyer_start),
+            CommandHandler('start', buyer_start_link, filters.Regex(r'^/start\s+\S')),
+        ],
+        # رابط متجر آخر أثناء الطلب يبدأ طلباً جديداً
+        allow_reentry=True,
         states={
             9: [MessageHandler(filters.TEXT & ~filters.COMMAND, buyer_enter_code)],
-            10: [CallbackQueryHandler(buyer_select_product_callback)],
+            10: [
+                CallbackQueryHandler(buyer_select_product_callback, pattern='^product_'),
+                CallbackQueryHandler(buyer_cart_callback, pattern='^(qty_|cart_clear$|cart_back$)'),
+                CallbackQueryHandler(buyer_checkout_callback, pattern='^cart_checkout$'),
+                CallbackQueryHandler(buyer_catalog_page_callback, pattern=r'^catalog\|'),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, buyer_search_products),
+            ],
             11: [MessageHandler(filters.TEXT & ~filters.COMMAND, buyer_enter_name)],
             12: [MessageHandler(filters.TEXT & ~filters.COMMAND, buyer_enter_phone)],
             13: [MessageHandler(filters.TEXT & ~filters.COMMAND, buyer_enter_address)],
@@ -453,18 +1020,28 @@ def setup_bot_handlers(application):
     )
     
     # الأوامر الأساسية
-    application.add_handler(CommandHandler("start", start_command))
+    # /start مع كود متجر (رابط من الوضع المضمن) تعالجه محادثة الزبون
+    application.add_handler(CommandHandler("start", start_command, ~filters.Regex(r'^/start\s+\S')))
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("dashboard", seller_dashboard_command))
     application.add_handler(CommandHandler("orders", view_orders_command))
+    application.add_handler(CommandHandler("export", export_orders_command))
+    application.add_handler(CommandHandler("import", import_products_command))
+    application.add_handler(CommandHandler("admin", admin_command))
+    application.add_handler(CommandHandler("allstores", all_stores_command))
+    application.add_handler(CommandHandler("allorders", all_orders_command))
     
     # إضافة المحادثات
     application.add_handler(seller_conv)
     application.add_handler(seller_login_conv)
     application.add_handler(add_product_conv)
     application.add_handler(buyer_conv)
+    application.add_handler(InlineQueryHandler(inline_query_handler))
     
     # معالجة الأزرار
+    application.add_handler(CallbackQueryHandler(orders_page_callback, pattern=r'^orders\|'))
+    application.add_handler(CallbackQueryHandler(order_status_callback, pattern=r'^status\|'))
+    application.add_handler(CallbackQueryHandler(bulk_status_callback, pattern=r'^status_bulk\|'))
     application.add_handler(CallbackQueryHandler(button_callback))
     
     # معالجة الرسائل النصية العامة
@@ -475,34 +1052,37 @@ def setup_bot_handlers(application):
         elif text == '🔙 القائمة الرئيسية':
             await start_command(update, context)
         elif text == '🔙 لوحة التحكم':
-            if context.user_data.get('logged_in'):
-                await seller_dashboard_command(update, context)
-            else:
-                await update.message.reply_text("❌ يجب تسجيل الدخول أولاً.")
+            await seller_dashboard_command(update, context)
         elif text == '📋 منتجاتي':
-            if context.user_data.get('logged_in'):
-                seller_id = context.user_data['seller_id']
-                products = db.get_products_by_seller(seller_id)
+            seller = await logged_in_seller(update, context)
+            if seller is not None:
+                products = await adb.get_products_by_seller(seller[0])
                 if products:
                     products_text = "📦 **منتجات متجرك:**\n\n"
                     for product in products:
                         _, _, name, price, description, _ = product
                         products_text += f"🛍️ {name}\n💰 {price} ريال\n📝 {description if description else 'لا يوجد وصف'}\n{'─'*30}\n"
-                    await update.message.reply_text(products_text)
+                    outbox.reply(update.message, products_text)
                 else:
-                    await update.message.reply_text("📦 لا توجد منتجات في متجرك بعد.")
+                    outbox.reply(update.message, "📦 لا توجد منتجات في متجرك بعد.")
             else:
-                await update.message.reply_text("❌ يجب تسجيل الدخول أولاً.")
+                outbox.reply(update.message, "❌ يجب تسجيل الدخول أولاً.")
         elif text == '🛒 الطلبات الجديدة':
-            await view_orders_command(update, context)
+            await view_orders_command(update, context, status='pending')
         elif text == '📊 الإحصائيات':
-            if context.user_data.get('logged_in'):
-                await seller_dashboard_command(update, context)
-            else:
-                await update.message.reply_text("❌ يجب تسجيل الدخول أولاً.")
+            await seller_dashboard_command(update, context)
         else:
-            await update.message.reply_text("استخدم الأزرار أو الأوامر المتاحة.")
+            outbox.reply(update.message, "استخدم الأزرار أو الأوامر المتاحة.")
     
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    application.add_handler(MessageHandler(filters.Document.ALL, import_products_document))
+    
+    # قياس زمن كل المعالجات وتصدير إحصائيات المكونات على /metrics
+    instrument_handlers(application)
+    if hasattr(application, 'scheduler'):
+        add_stats_source('scheduler', application.scheduler.stats)
+    add_stats_source('outbox', outbox.stats)
+    add_stats_source('notifier', notifier.stats)
+    add_stats_source('db', adb.db.stats)
     
     logger.info("✅ تم إعداد معالجات البوت بنجاح")
@@ -1,129 +1,1247 @@
 import sqlite3
 import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from cache import MISSING, TTLCache
+from metrics import DB_COMMIT_BATCH, DB_COMMIT_SECONDS, DB_QUERY_SECONDS, timed
+from search import match_query, normalize_text, store_token
+from store_codes import STORE_CODE_ATTEMPTS, is_valid_store_code, new_store_code, normalize_store_code
+
+# أعمدة الطلب كما تُعرض للبائع (ترتيب ثابت لفك الصفوف)
+# items ملخص منتجات السلة و total إجمالي السعر وقت الطلب
+ORDER_COLUMNS = '''
+    o.id, o.product_id, o.customer_name, o.customer_phone, o.customer_address,
+    o.quantity, o.status, o.created_at,
+    (SELECT group_concat(p.name || ' ×' || i.quantity, '، ')
+     FROM order_items i JOIN products p ON p.id = i.product_id
+     WHERE i.order_id = o.id) AS items,
+    o.total
+'''
+
+# دورة حياة الطلب: الحالة -> الحالات المسموح الانتقال إليها
+ORDER_STATUSES = ('pending', 'confirmed', 'shipped', 'delivered', 'cancelled')
+STATUS_TRANSITIONS = {
+    'pending': ('confirmed', 'cancelled'),
+    'confirmed': ('shipped', 'cancelled'),
+    'shipped': ('delivered', 'cancelled'),
+    'delivered': (),
+    'cancelled': (),
+}
+
+# حد متغيرات SQLite في الاستعلام الواحد
+MAX_SQL_VARIABLES = 500
+
+# حدود سلة المشتريات
+MAX_CART_ITEMS = 20
+MAX_ITEM_QUANTITY = 99
+
+# إعدادات الاتصال الافتراضية
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+STATEMENT_CACHE_SIZE = 256
+
+# تجميع إدخالات الطلبات في معاملة واحدة (group commit)
+ORDER_BATCH_SIZE = int(os.getenv('ORDER_BATCH_SIZE', '100'))
+ORDER_BATCH_WAIT = float(os.getenv('ORDER_BATCH_WAIT_MS', '2')) / 1000
+
+# ذاكرة كتالوج المنتجات المؤقتة
+CATALOG_CACHE_SIZE = int(os.getenv('CATALOG_CACHE_SIZE', '1024'))
+CATALOG_CACHE_TTL = float(os.getenv('CATALOG_CACHE_TTL', '300'))
+
+# ذاكرة أكواد المتاجر المؤقتة (والأكواد غير الموجودة لفترة أقصر)
+STORE_CODE_CACHE_SIZE = int(os.getenv('STORE_CODE_CACHE_SIZE', '4096'))
+STORE_CODE_CACHE_TTL = float(os.getenv('STORE_CODE_CACHE_TTL', '300'))
+STORE_CODE_NEGATIVE_TTL = float(os.getenv('STORE_CODE_NEGATIVE_TTL', '30'))
+
+# عدد الصفوف المقروءة في كل دفعة عند تصدير الطلبات
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '500'))
+
+# ذاكرة نتائج الاستعلامات المضمنة (inline) المؤقتة
+INLINE_CACHE_SIZE = int(os.getenv('INLINE_CACHE_SIZE', '4096'))
+INLINE_CACHE_TTL = float(os.getenv('INLINE_CACHE_TTL', '60'))
+
+class ConnectionPool:
+    """مجموعة محدودة من اتصالات SQLite طويلة العمر"""
+
+    def __init__(self, db_path, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+        # إحصائيات الاستخدام
+        self._checkouts = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+
+    def connect(self):
+        """فتح اتصال جديد مع إعدادات الأداء (خارج المجموعة: يغلقه المستدعي)"""
+        if self._closed:
+            raise RuntimeError("مجموعة الاتصالات مغلقة")
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA cache_size=-8000')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute(f'PRAGMA busy_timeout={int(self.timeout * 1000)}')
+        return conn
+
+    def acquire(self):
+        """استعارة اتصال من المجموعة (أو إنشاء اتصال جديد إن لم تمتلئ)"""
+        if self._closed:
+            raise RuntimeError("مجموعة الاتصالات مغلقة")
+
+        started = time.perf_counter()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    create = True
+                else:
+                    create = False
+            if create:
+                try:
+                    conn = self.connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError("انتهت مهلة انتظار اتصال بقاعدة البيانات")
+
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._checkouts += 1
+            self._wait_time += waited
+            self._max_wait = max(self._max_wait, waited)
+        return conn
+
+    def release(self, conn):
+        """إعادة الاتصال إلى المجموعة"""
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """استعارة اتصال داخل كتلة with"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        """إحصائيات المجموعة"""
+        with self._lock:
+            return {
+                'size': self.size,
+                'open': self._created,
+                'idle': self._idle.qsize(),
+                'checkouts': self._checkouts,
+                'wait_time': self._wait_time,
+                'avg_wait': self._wait_time / self._checkouts if self._checkouts else 0.0,
+                'max_wait': self._max_wait,
+            }
+
+    def close(self):
+        """إغلاق جميع الاتصالات الخاملة"""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+# ========== كتابة الطلبات ==========
+class GroupCommitWriter:
+    """خيط كتابة خلفي يجمع العمليات المتزامنة في معاملة واحدة (fsync واحد لكل دفعة)
+
+    كل عملية دالة تستقبل الاتصال وتُرجع نتيجة؛ تُنفذ داخل SAVEPOINT خاص بها حتى
+    لا يُفشل خطأ عملية واحدة بقية الدفعة. المستدعي ينتظر Future لا تكتمل إلا بعد commit.
+    """
+
+    def __init__(self, connect, batch_size=ORDER_BATCH_SIZE, max_wait=ORDER_BATCH_WAIT):
+        self._connect = connect
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+        # إحصائيات
+        self.batches = 0
+        self.operations = 0
+
+    def submit(self, func, *args):
+        """إضافة عملية للطابور؛ تُرجع Future بنتيجتها بعد الحفظ"""
+        future = Future()
+        # نفس القفل الذي يُفرغ به الخيط المنتهي الطابور، فلا تبقى عملية بلا خيط
+        with self._start_lock:
+            if self._closed:
+                raise RuntimeError("كاتب الطلبات مغلق")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='db-group-commit', daemon=True)
+                self._thread.start()
+            self._queue.put((func, args, future))
+        return future
+
+    def close(self):
+        """إنهاء العمليات المعلقة وإيقاف الخيط؛ submit بعدها يرفع خطأ"""
+        with self._start_lock:
+            self._closed = True
+            thread = self._thread
+            if thread is None:
+                return
+            self._queue.put(None)
+        thread.join()
+
+    def _next_batch(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # إعادة إشارة الإيقاف بعد هذه الدفعة
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        error = RuntimeError("توقف خيط كتابة الطلبات")
+        try:
+            conn = self._connect()
+            try:
+                # الطلب لا يُؤكَّد قبل أن يصل للقرص
+                conn.execute('PRAGMA synchronous=FULL')
+                while True:
+                    item = self._queue.get()
+                    if item is None:
+                        break
+                    self._commit(conn, self._next_batch(item))
+            finally:
+                conn.close()
+        except Exception as e:
+            # تعذر الاتصال مثلاً: لا ينتظر أحد Future لن تكتمل
+            error = e
+            raise
+        finally:
+            self._exit(error)
+
+    def _exit(self, error):
+        """عند خروج الخيط: رفض ما بقي في الطابور، و submit التالي يبدأ خيطاً جديداً"""
+        with self._start_lock:
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    item[2].set_exception(error)
+            self._thread = None
+
+    def _commit(self, conn, batch):
+        results = []
+        started = time.perf_counter()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for func, args, _ in batch:
+                conn.execute('SAVEPOINT op')
+                try:
+                    results.append((True, func(conn, *args)))
+                    conn.execute('RELEASE op')
+                except Exception as e:
+                    conn.execute('ROLLBACK TO op')
+                    conn.execute('RELEASE op')
+                    results.append((False, e))
+            conn.commit()
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.operations += len(batch)
+        DB_COMMIT_SECONDS.observe(time.perf_counter() - started)
+        DB_COMMIT_BATCH.observe(len(batch))
+        for (_, _, future), (ok, value) in zip(batch, results):
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'operations': self.operations,
+            'avg_batch': self.operations / self.batches if self.batches else 0.0,
+            'queued': self._queue.qsize(),
+        }
+
+# ========== الترحيلات ==========
+def _current_version(conn):
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+def _migration_base_tables(conn):
+    # جدول البائعين
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS sellers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        telegram_id INTEGER UNIQUE,
+        store_name TEXT NOT NULL,
+        store_code TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    # جدول المنتجات
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        seller_id INTEGER,
+        name TEXT NOT NULL,
+        price REAL NOT NULL,
+        description TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (seller_id) REFERENCES sellers (id)
+    )
+    ''')
+
+    # جدول الطلبيات
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS orders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER,
+        customer_name TEXT NOT NULL,
+        customer_phone TEXT NOT NULL,
+        customer_address TEXT,
+        quantity INTEGER DEFAULT 1,
+        status TEXT DEFAULT 'pending',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (product_id) REFERENCES products (id)
+    )
+    ''')
+
+def _migration_indexes(conn):
+    # منتجات البائع
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_products_seller ON products (seller_id)')
+    # طلبات المنتج مرتبة بالتاريخ (للربط في get_orders_for_seller)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_orders_product_created ON orders (product_id, created_at)')
+    # الفلترة حسب الحالة والتاريخ
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_orders_created ON orders (created_at)')
+
+def _migration_orders_seller(conn):
+    # نسخ seller_id إلى الطلبات حتى تُقرأ صفحة طلبات البائع من فهرس واحد
+    conn.execute('ALTER TABLE orders ADD COLUMN seller_id INTEGER')
+    conn.execute('''
+    UPDATE orders
+    SET seller_id = (SELECT seller_id FROM products WHERE products.id = orders.product_id)
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_orders_seller_created ON orders (seller_id, created_at, id)')
+
+def _migration_persistence(conn):
+    # حالة المحادثات وبيانات المستخدمين (persistence.py) بصيغة JSON مضغوطة
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS persistence_user_data (
+        user_id INTEGER PRIMARY KEY,
+        data TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS persistence_chat_data (
+        chat_id INTEGER PRIMARY KEY,
+        data TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS persistence_bot_data (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        data TEXT NOT NULL
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS persistence_conversations (
+        name TEXT NOT NULL,
+        key TEXT NOT NULL,
+        state TEXT NOT NULL,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (name, key)
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_persistence_user_updated ON persistence_user_data (updated_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_persistence_chat_updated ON persistence_chat_data (updated_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_persistence_conv_updated ON persistence_conversations (updated_at)')
+
+def _migration_status_indexes(conn):
+    # قوائم الطلبات المفلترة بالحالة مرتبة بالتاريخ
+    conn.execute('DROP INDEX IF EXISTS idx_orders_status')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_orders_status_created ON orders (status, created_at)')
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_orders_seller_status_created ON orders (seller_id, status, created_at, id)'
+    )
+
+def _migration_order_items(conn):
+    # منتجات كل طلب (سلة) بسعرها وقت الطلب، و total إجمالي الطلب
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS order_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        price REAL NOT NULL,
+        FOREIGN KEY (order_id) REFERENCES orders (id),
+        FOREIGN KEY (product_id) REFERENCES products (id)
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items (order_id)')
+    conn.execute('ALTER TABLE orders ADD COLUMN total REAL')
+
+    # الطلبات القديمة: منتج واحد لكل طلب
+    conn.execute('''
+    INSERT INTO order_items (order_id, product_id, quantity, price)
+    SELECT o.id, o.product_id, o.quantity, p.price
+    FROM orders o JOIN products p ON o.product_id = p.id
+    ''')
+    conn.execute('''
+    UPDATE orders
+    SET total = quantity * (SELECT price FROM products WHERE products.id = orders.product_id)
+    ''')
+    # مشغل العدّادات يُعاد إنشاؤه (ترحيل stats_counters) ليستخدم total
+    conn.execute('DROP TRIGGER IF EXISTS trg_stats_order_insert')
+
+def _migration_products_fts(conn):
+    # فهرس البحث في المنتجات: النص مُطبّع (search.normalize_text) و store لفلترة المتجر
+    conn.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        store, name, description,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    ''')
+    conn.executemany(
+        'INSERT INTO products_fts (rowid, store, name, description) VALUES (?, ?, ?, ?)',
+        [
+            (product_id, store_token(seller_id), normalize_text(name), normalize_text(description))
+            for product_id, seller_id, name, description in conn.execute(
+                'SELECT id, seller_id, name, description FROM products'
+            )
+        ]
+    )
+
+# جداول التجميع لإحصائيات المشرف: تُحدَّث بالمشغلات داخل نفس معاملة الإدخال،
+# فتُقرأ إحصائيات السوق كاملاً دون المرور على جداول الطلبات (الأوقات بتوقيت UTC)
+ROLLUP_SCHEMA = [
+    # المجاميع العامة: stores, products, orders, revenue, status:<الحالة>
+    '''
+    CREATE TABLE IF NOT EXISTS rollup_totals (
+        key TEXT PRIMARY KEY,
+        value REAL NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS rollup_hourly (
+        hour TEXT PRIMARY KEY,
+        orders INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS rollup_daily (
+        day TEXT PRIMARY KEY,
+        orders INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        cancelled INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS rollup_store_daily (
+        day TEXT NOT NULL,
+        seller_id INTEGER NOT NULL,
+        orders INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, seller_id)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS rollup_product_daily (
+        day TEXT NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, product_id)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS rollup_store_totals (
+        seller_id INTEGER PRIMARY KEY,
+        orders INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS rollup_product_totals (
+        product_id INTEGER PRIMARY KEY,
+        quantity INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0
+    )
+    ''',
+    # أفضل المتاجر والمنتجات من الفهرس مباشرة
+    'CREATE INDEX IF NOT EXISTS idx_rollup_store_totals_revenue ON rollup_store_totals (revenue)',
+    'CREATE INDEX IF NOT EXISTS idx_rollup_product_totals_revenue ON rollup_product_totals (revenue)',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_rollup_seller_insert AFTER INSERT ON sellers
+    BEGIN
+        INSERT INTO rollup_totals (key, value) VALUES ('stores', 1)
+        ON CONFLICT (key) DO UPDATE SET value = value + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_rollup_product_insert AFTER INSERT ON products
+    BEGIN
+        INSERT INTO rollup_totals (key, value) VALUES ('products', 1)
+        ON CONFLICT (key) DO UPDATE SET value = value + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_rollup_order_insert AFTER INSERT ON orders
+    BEGIN
+        INSERT INTO rollup_totals (key, value)
+        VALUES ('orders', 1), ('revenue', COALESCE(NEW.total, 0)), ('status:' || NEW.status, 1)
+        ON CONFLICT (key) DO UPDATE SET value = value + excluded.value;
+        INSERT INTO rollup_hourly (hour, orders, revenue)
+        VALUES (strftime('%Y-%m-%d %H:00', NEW.created_at), 1, COALESCE(NEW.total, 0))
+        ON CONFLICT (hour) DO UPDATE SET orders = orders + 1, revenue = revenue + excluded.revenue;
+        INSERT INTO rollup_daily (day, orders, revenue)
+        VALUES (date(NEW.created_at), 1, COALESCE(NEW.total, 0))
+        ON CONFLICT (day) DO UPDATE SET orders = orders + 1, revenue = revenue + excluded.revenue;
+        INSERT INTO rollup_store_daily (day, seller_id, orders, revenue)
+        VALUES (date(NEW.created_at), NEW.seller_id, 1, COALESCE(NEW.total, 0))
+        ON CONFLICT (day, seller_id) DO UPDATE SET orders = orders + 1, revenue = revenue + excluded.revenue;
+        INSERT INTO rollup_store_totals (seller_id, orders, revenue)
+        VALUES (NEW.seller_id, 1, COALESCE(NEW.total, 0))
+        ON CONFLICT (seller_id) DO UPDATE SET orders = orders + 1, revenue = revenue + excluded.revenue;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_rollup_order_item_insert AFTER INSERT ON order_items
+    BEGIN
+        INSERT INTO rollup_product_daily (day, product_id, quantity, revenue)
+        VALUES (
+            (SELECT date(created_at) FROM orders WHERE id = NEW.order_id),
+            NEW.product_id, NEW.quantity, NEW.quantity * NEW.price
+        )
+        ON CONFLICT (day, product_id) DO UPDATE SET
+            quantity = quantity + excluded.quantity,
+            revenue = revenue + excluded.revenue;
+        INSERT INTO rollup_product_totals (product_id, quantity, revenue)
+        VALUES (NEW.product_id, NEW.quantity, NEW.quantity * NEW.price)
+        ON CONFLICT (product_id) DO UPDATE SET
+            quantity = quantity + excluded.quantity,
+            revenue = revenue + excluded.revenue;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_rollup_order_status AFTER UPDATE OF status ON orders
+    WHEN OLD.status IS NOT NEW.status
+    BEGIN
+        INSERT INTO rollup_totals (key, value)
+        VALUES ('status:' || OLD.status, -1), ('status:' || NEW.status, 1)
+        ON CONFLICT (key) DO UPDATE SET value = value + excluded.value;
+        UPDATE rollup_daily SET cancelled = cancelled + 1
+        WHERE NEW.status = 'cancelled' AND day = date(OLD.created_at);
+    END
+    ''',
+]
+
+def _migration_rollups(conn):
+    for statement in ROLLUP_SCHEMA:
+        conn.execute(statement)
+
+    # ملء جداول التجميع من البيانات الحالية (مرة واحدة)
+    conn.execute('''
+    INSERT INTO rollup_totals (key, value)
+    SELECT 'stores', COUNT(*) FROM sellers
+    UNION ALL SELECT 'products', COUNT(*) FROM products
+    UNION ALL SELECT 'orders', COUNT(*) FROM orders
+    UNION ALL SELECT 'revenue', COALESCE(SUM(total), 0) FROM orders
+    UNION ALL SELECT 'status:' || status, COUNT(*) FROM orders GROUP BY status
+    ''')
+    conn.execute('''
+    INSERT INTO rollup_hourly (hour, orders, revenue)
+    SELECT strftime('%Y-%m-%d %H:00', created_at), COUNT(*), COALESCE(SUM(total), 0)
+    FROM orders GROUP BY 1
+    ''')
+    conn.execute('''
+    INSERT INTO rollup_daily (day, orders, revenue, cancelled)
+    SELECT date(created_at), COUNT(*), COALESCE(SUM(total), 0), SUM(status = 'cancelled')
+    FROM orders GROUP BY 1
+    ''')
+    conn.execute('''
+    INSERT INTO rollup_store_daily (day, seller_id, orders, revenue)
+    SELECT date(created_at), seller_id, COUNT(*), COALESCE(SUM(total), 0)
+    FROM orders WHERE seller_id IS NOT NULL GROUP BY 1, 2
+    ''')
+    conn.execute('''
+    INSERT INTO rollup_store_totals (seller_id, orders, revenue)
+    SELECT seller_id, COUNT(*), COALESCE(SUM(total), 0)
+    FROM orders WHERE seller_id IS NOT NULL GROUP BY 1
+    ''')
+    conn.execute('''
+    INSERT INTO rollup_product_daily (day, product_id, quantity, revenue)
+    SELECT date(o.created_at), i.product_id, SUM(i.quantity), SUM(i.quantity * i.price)
+    FROM order_items i JOIN orders o ON o.id = i.order_id
+    GROUP BY 1, 2
+    ''')
+    conn.execute('''
+    INSERT INTO rollup_product_totals (product_id, quantity, revenue)
+    SELECT product_id, SUM(quantity), SUM(quantity * price)
+    FROM order_items GROUP BY 1
+    ''')
+
+# جداول ومشغلات عدّادات الإحصائيات - تُحدَّث داخل نفس معاملة الإدخال
+STATS_COUNTERS_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS seller_stats (
+        seller_id INTEGER PRIMARY KEY,
+        products INTEGER NOT NULL DEFAULT 0,
+        orders INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        last_order_at TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS seller_status_counts (
+        seller_id INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (seller_id, status)
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_product_insert AFTER INSERT ON products
+    BEGIN
+        INSERT INTO seller_stats (seller_id, products) VALUES (NEW.seller_id, 1)
+        ON CONFLICT (seller_id) DO UPDATE SET products = products + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_order_insert AFTER INSERT ON orders
+    BEGIN
+        INSERT INTO seller_stats (seller_id, orders, revenue, last_order_at)
+        VALUES (NEW.seller_id, 1, NEW.total, NEW.created_at)
+        ON CONFLICT (seller_id) DO UPDATE SET
+            orders = orders + 1,
+            revenue = revenue + excluded.revenue,
+            last_order_at = MAX(COALESCE(last_order_at, ''), excluded.last_order_at);
+        INSERT INTO seller_status_counts (seller_id, status, count) VALUES (NEW.seller_id, NEW.status, 1)
+        ON CONFLICT (seller_id, status) DO UPDATE SET count = count + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_order_status AFTER UPDATE OF status ON orders
+    WHEN OLD.status IS NOT NEW.status
+    BEGIN
+        UPDATE seller_status_counts SET count = count - 1
+        WHERE seller_id = OLD.seller_id AND status = OLD.status;
+        INSERT INTO seller_status_counts (seller_id, status, count) VALUES (NEW.seller_id, NEW.status, 1)
+        ON CONFLICT (seller_id, status) DO UPDATE SET count = count + 1;
+    END
+    ''',
+]
+
+def _migration_stats_counters(conn):
+    for statement in STATS_COUNTERS_SCHEMA:
+        conn.execute(statement)
+
+    # الجداول قد تكون من الإعداد القديم (كانت تُنشأ وتُحذف حسب DB_STATS_COUNTERS)
+    # وبعض الطلبات أُضيفت دون مشغلاتها، فتُعاد تعبئتها من البيانات الحالية
+    conn.execute('DELETE FROM seller_stats')
+    conn.execute('DELETE FROM seller_status_counts')
+    conn.execute('''
+    INSERT INTO seller_stats (seller_id, products)
+    SELECT seller_id, COUNT(*) FROM products GROUP BY seller_id
+    ''')
+    conn.execute('''
+    INSERT INTO seller_stats (seller_id, orders, revenue, last_order_at)
+    SELECT seller_id, COUNT(*), SUM(total), MAX(created_at)
+    FROM orders
+    GROUP BY seller_id
+    ON CONFLICT (seller_id) DO UPDATE SET
+        orders = excluded.orders,
+        revenue = excluded.revenue,
+        last_order_at = excluded.last_order_at
+    ''')
+    conn.execute('''
+    INSERT INTO seller_status_counts (seller_id, status, count)
+    SELECT seller_id, status, COUNT(*) FROM orders GROUP BY seller_id, status
+    ''')
+
+def _migration_drop_stats_counters(conn):
+    # العدّادات كانت تُحدَّث مع كل كتابة ولا تُقرأ افتراضياً؛ إحصائيات البائع تُحسب
+    # بالفهارس وإحصائيات المشرف من جداول التجميع (rollups)
+    for trigger in ('trg_stats_product_insert', 'trg_stats_order_insert', 'trg_stats_order_status'):
+        conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    conn.execute('DROP TABLE IF EXISTS seller_stats')
+    conn.execute('DROP TABLE IF EXISTS seller_status_counts')
+
+# (الرقم، الاسم، الدالة) - لا تغيّر ترحيلاً بعد نشره، أضف ترحيلاً جديداً
+MIGRATIONS = [
+    (1, 'base_tables', _migration_base_tables),
+    (2, 'indexes', _migration_indexes),
+    (3, 'orders_seller', _migration_orders_seller),
+    (4, 'persistence', _migration_persistence),
+    (5, 'status_indexes', _migration_status_indexes),
+    (6, 'order_items', _migration_order_items),
+    (7, 'products_fts', _migration_products_fts),
+    (8, 'rollups', _migration_rollups),
+    (9, 'stats_counters', _migration_stats_counters),
+    (10, 'drop_stats_counters', _migration_drop_stats_counters),
+]
 
 class Database:
-    def __init__(self):
-        # استخدم مساراً مطلقاً لـ Render
-        self.db_path = '/tmp/orders.db' if 'RENDER' in os.environ else 'orders.db'
+    def __init__(self, db_path=None, pool_size=POOL_SIZE):
+        # استخدم مساراً مطلقاً لـ Render (أو DB_PATH إن حُدد)
+        if db_path is None:
+            db_path = os.getenv('DB_PATH') or ('/tmp/orders.db' if 'RENDER' in os.environ else 'orders.db')
+        self.db_path = db_path
+        self.pool = ConnectionPool(self.db_path, size=pool_size)
+        # {seller_id: (المنتجات، {product_id: product})}
+        self.catalog = TTLCache(maxsize=CATALOG_CACHE_SIZE, ttl=CATALOG_CACHE_TTL)
+        # كاتب الطلبات الجماعي باتصال خاص خارج المجموعة
+        self.order_writer = GroupCommitWriter(self.pool.connect)
+        # {store_code: seller} - والأكواد الخاطئة منفصلة حتى لا يطرد سيلها الأكواد الصحيحة
+        self.seller_codes = TTLCache(maxsize=STORE_CODE_CACHE_SIZE, ttl=STORE_CODE_CACHE_TTL)
+        self.missing_codes = TTLCache(maxsize=STORE_CODE_CACHE_SIZE, ttl=STORE_CODE_NEGATIVE_TTL)
+        # {(seller_id, query, offset, limit): (المنتجات، next_offset)}
+        # إضافة منتج تحذف نتائج متجره فقط دون مسح نتائج بقية المتاجر
+        self.inline_results = TTLCache(maxsize=INLINE_CACHE_SIZE, ttl=INLINE_CACHE_TTL)
         self.init_db()
-    
+
+    @contextmanager
+    def connection(self):
+        """اتصال من المجموعة مع commit عند النجاح و rollback عند الخطأ"""
+        with self.pool.connection() as conn:
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def stats(self):
+        """إحصائيات مجموعة الاتصالات والذاكرة المؤقتة"""
+        stats = self.pool.stats()
+        stats['catalog_cache'] = self.catalog.stats()
+        stats['store_code_cache'] = self.seller_codes.stats()
+        stats['missing_code_cache'] = self.missing_codes.stats()
+        stats['inline_cache'] = self.inline_results.stats()
+        stats['order_writer'] = self.order_writer.stats()
+        return stats
+
+    def close(self):
+        """إغلاق الاتصالات بعد حفظ الطلبات المعلقة"""
+        self.order_writer.close()
+        self.pool.close()
+
     def init_db(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # جدول البائعين
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS sellers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            telegram_id INTEGER UNIQUE,
-            store_name TEXT NOT NULL,
-            store_code TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        # جدول المنتجات
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS products (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            seller_id INTEGER,
-            name TEXT NOT NULL,
-            price REAL NOT NULL,
-            description TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (seller_id) REFERENCES sellers (id)
-        )
-        ''')
-        
-        # جدول الطلبيات
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS orders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            product_id INTEGER,
-            customer_name TEXT NOT NULL,
-            customer_phone TEXT NOT NULL,
-            customer_address TEXT,
-            quantity INTEGER DEFAULT 1,
-            status TEXT DEFAULT 'pending',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (product_id) REFERENCES products (id)
-        )
-        ''')
-        
-        conn.commit()
-        conn.close()
-    
+        """تهيئة قاعدة البيانات وتطبيق الترحيلات"""
+        self.migrate()
+
+    def schema_version(self):
+        """رقم آخر ترحيل مطبق"""
+        with self.connection() as conn:
+            return _current_version(conn)
+
+    def migrate(self):
+        """تطبيق الترحيلات غير المطبقة بالترتيب"""
+        with self.connection() as conn:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''')
+
+        for version, name, step in MIGRATIONS:
+            with self.connection() as conn:
+                # BEGIN IMMEDIATE يمنع عمليتين من تطبيق نفس الترحيل
+                conn.execute('BEGIN IMMEDIATE')
+                if _current_version(conn) >= version:
+                    continue
+                step(conn)
+                conn.execute(
+                    'INSERT INTO schema_version (version, name) VALUES (?, ?)',
+                    (version, name)
+                )
+
+    def query_plan(self, sql, params=()):
+        """نتيجة EXPLAIN QUERY PLAN لاستعلام (للتحقق من استخدام الفهارس)"""
+        with self.connection() as conn:
+            cursor = conn.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[3] for row in cursor.fetchall()]
+
     # دوال البائعين
+    @timed(DB_QUERY_SECONDS)
     def add_seller(self, telegram_id, store_name, store_code, password):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
         try:
-            cursor.execute('''
-            INSERT INTO sellers (telegram_id, store_name, store_code, password)
-            VALUES (?, ?, ?, ?)
-            ''', (telegram_id, store_name, store_code, password))
-            conn.commit()
-            return True
+            with self.connection() as conn:
+                conn.execute('''
+                INSERT INTO sellers (telegram_id, store_name, store_code, password)
+                VALUES (?, ?, ?, ?)
+                ''', (telegram_id, store_name, store_code, password))
         except sqlite3.IntegrityError:
             return False
-        finally:
-            conn.close()
-    
+        self.missing_codes.invalidate(store_code)
+        self.seller_codes.invalidate(store_code)
+        return True
+
+    @timed(DB_QUERY_SECONDS)
+    def register_seller(self, telegram_id, store_name, password, allocate=new_store_code,
+                        attempts=STORE_CODE_ATTEMPTS):
+        """تسجيل بائع بكود جديد؛ تُرجع الكود أو None إن كان المستخدم مسجلاً مسبقاً
+
+        تصادم الكود (UNIQUE) يعيد التوليد ولا يُفشل التسجيل.
+        """
+        for _ in range(attempts):
+            store_code = allocate()
+            try:
+                with self.connection() as conn:
+                    conn.execute('''
+                    INSERT INTO sellers (telegram_id, store_name, store_code, password)
+                    VALUES (?, ?, ?, ?)
+                    ''', (telegram_id, store_name, store_code, password))
+            except sqlite3.IntegrityError as e:
+                if 'store_code' in str(e):
+                    continue
+                return None
+            self.missing_codes.invalidate(store_code)
+            return store_code
+        raise RuntimeError("تعذر توليد كود متجر فريد")
+
+    @timed(DB_QUERY_SECONDS)
+    def get_seller(self, seller_id):
+        with self.connection() as conn:
+            cursor = conn.execute('SELECT * FROM sellers WHERE id = ?', (seller_id,))
+            return cursor.fetchone()
+
+    @timed(DB_QUERY_SECONDS)
+    def get_seller_by_telegram_id(self, telegram_id):
+        """متجر حساب Telegram (كل حساب يملك متجراً واحداً على الأكثر)"""
+        with self.connection() as conn:
+            cursor = conn.execute('SELECT * FROM sellers WHERE telegram_id = ?', (telegram_id,))
+            return cursor.fetchone()
+
+    @timed(DB_QUERY_SECONDS)
     def get_seller_by_code(self, store_code):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM sellers WHERE store_code = ?', (store_code,))
-        seller = cursor.fetchone()
-        conn.close()
+        store_code = normalize_store_code(store_code)
+        # الأكواد المشوهة تُرفض قبل الذاكرة المؤقتة وقاعدة البيانات
+        if not is_valid_store_code(store_code):
+            return None
+        seller = self.seller_codes.get(store_code)
+        if seller is not MISSING:
+            return seller
+        if self.missing_codes.get(store_code) is not MISSING:
+            return None
+
+        generation = self.missing_codes.generation
+        with self.connection() as conn:
+            cursor = conn.execute('SELECT * FROM sellers WHERE store_code = ?', (store_code,))
+            seller = cursor.fetchone()
+
+        if seller:
+            self.seller_codes.set(store_code, seller)
+        else:
+            self.missing_codes.set(store_code, None, generation=generation)
         return seller
-    
+
     # دوال المنتجات
+    @timed(DB_QUERY_SECONDS)
     def add_product(self, seller_id, name, price, description=""):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-        INSERT INTO products (seller_id, name, price, description)
-        VALUES (?, ?, ?, ?)
-        ''', (seller_id, name, price, description))
-        conn.commit()
-        product_id = cursor.lastrowid
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.execute('''
+            INSERT INTO products (seller_id, name, price, description)
+            VALUES (?, ?, ?, ?)
+            ''', (seller_id, name, price, description))
+            product_id = cursor.lastrowid
+            self._index_products(conn, [(product_id, seller_id, name, description)])
+        self._catalog_changed(seller_id)
         return product_id
-    
+
+    @timed(DB_QUERY_SECONDS)
+    def add_products(self, seller_id, products):
+        """إضافة منتجات [(name, price, description)] بمعاملة واحدة؛ تُرجع أرقامها"""
+        if not products:
+            return []
+        # 4 متغيرات لكل منتج في INSERT متعدد الصفوف
+        chunk_size = MAX_SQL_VARIABLES // 4
+        rows = []
+        with self.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            for i in range(0, len(products), chunk_size):
+                chunk = products[i:i + chunk_size]
+                cursor = conn.execute(
+                    'INSERT INTO products (seller_id, name, price, description) VALUES '
+                    + ','.join(['(?, ?, ?, ?)'] * len(chunk))
+                    + ' RETURNING id, seller_id, name, description',
+                    [value for name, price, description in chunk for value in (seller_id, name, price, description)]
+                )
+                rows.extend(cursor.fetchall())
+            # ترتيب RETURNING غير مضمون؛ الأرقام تتزايد بترتيب الإدراج
+            rows.sort()
+            self._index_products(conn, rows)
+        # إبطال واحد للدفعة كلها
+        self._catalog_changed(seller_id)
+        return [row[0] for row in rows]
+
+    def _catalog_changed(self, seller_id):
+        """إبطال الكتالوج المخزن ونتائج inline للمتجر بعد تعديل منتجاته"""
+        self.catalog.invalidate(seller_id)
+        self.inline_results.invalidate_matching(lambda key: key[0] == seller_id)
+
+    @staticmethod
+    def _index_products(conn, products):
+        """إضافة المنتجات [(id, seller_id, name, description)] لفهرس البحث في نفس المعاملة"""
+        conn.executemany(
+            'INSERT INTO products_fts (rowid, store, name, description) VALUES (?, ?, ?, ?)',
+            [
+                (product_id, store_token(seller_id), normalize_text(name), normalize_text(description))
+                for product_id, seller_id, name, description in products
+            ]
+        )
+
+    def _load_catalog(self, seller_id):
+        """قراءة كتالوج المتجر عبر الذاكرة المؤقتة"""
+        entry = self.catalog.get(seller_id)
+        if entry is MISSING:
+            generation = self.catalog.generation
+            with self.connection() as conn:
+                cursor = conn.execute('SELECT * FROM products WHERE seller_id = ?', (seller_id,))
+                products = cursor.fetchall()
+            entry = (products, {product[0]: product for product in products})
+            self.catalog.set(seller_id, entry, generation=generation)
+        return entry
+
+    @timed(DB_QUERY_SECONDS)
     def get_products_by_seller(self, seller_id):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM products WHERE seller_id = ?', (seller_id,))
-        products = cursor.fetchall()
-        conn.close()
-        return products
-    
+        products, _ = self._load_catalog(seller_id)
+        return list(products)
+
+    @timed(DB_QUERY_SECONDS)
+    def get_product(self, seller_id, product_id):
+        """منتج واحد من كتالوج المتجر (None إن لم يوجد)"""
+        _, by_id = self._load_catalog(seller_id)
+        return by_id.get(product_id)
+
+    @timed(DB_QUERY_SECONDS)
+    def search_products(self, seller_id, query, limit=10, offset=0):
+        """منتجات المتجر المطابقة لنص البحث مرتبة حسب الصلة؛ تُرجع (المنتجات، يوجد_المزيد)"""
+        terms = match_query(query)
+        if terms is None:
+            return [], False
+        with self.connection() as conn:
+            # الاسم أهم من الوصف، وعمود المتجر للفلترة فقط
+            cursor = conn.execute('''
+            SELECT p.*
+            FROM products_fts f
+            JOIN products p ON p.id = f.rowid
+            WHERE products_fts MATCH ?
+            ORDER BY bm25(products_fts, 0.0, 10.0, 1.0), p.id
+            LIMIT ? OFFSET ?
+            ''', (f'store:{store_token(seller_id)} AND ({terms})', limit + 1, offset))
+            products = cursor.fetchall()
+        return products[:limit], len(products) > limit
+
+    @timed(DB_QUERY_SECONDS)
+    def inline_products(self, store_code, query='', limit=20, offset=0):
+        """نتائج الاستعلام المضمن: (المتجر، المنتجات، next_offset) عبر الذاكرة المؤقتة
+
+        الاستعلام الفارغ يعرض الكتالوج المخزن، وغيره يمر عبر فهرس البحث؛ فلا يُمسح جدول
+        المنتجات في الحالتين.
+        """
+        seller = self.get_seller_by_code(store_code)
+        if seller is None:
+            return None, [], None
+        seller_id = seller[0]
+        # نفس المفتاح لكل صيغ الاستعلام المتكافئة (التشكيل، المسافات، الترقيم...)
+        terms = match_query(query)
+        key = (seller_id, terms, offset, limit)
+        cached = self.inline_results.get(key)
+        if cached is not MISSING:
+            return (seller, *cached)
+
+        # إن تغير كتالوج أي متجر أثناء الاستعلام لا تُخزَّن نتيجته
+        generation = self.inline_results.generation
+
+        if terms:
+            products, has_more = self.search_products(seller_id, query, limit, offset)
+        else:
+            catalog, _ = self._load_catalog(seller_id)
+            products = catalog[offset:offset + limit]
+            has_more = len(catalog) > offset + limit
+        next_offset = offset + limit if has_more else None
+        self.inline_results.set(key, (products, next_offset), generation=generation)
+        return seller, products, next_offset
+
     # دوال الطلبيات
-    def add_order(self, product_id, customer_name, customer_phone, customer_address, quantity=1):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-        INSERT INTO orders (product_id, customer_name, customer_phone, customer_address, quantity)
-        VALUES (?, ?, ?, ?, ?)
-        ''', (product_id, customer_name, customer_phone, customer_address, quantity))
-        conn.commit()
+    @staticmethod
+    def _normalize_cart(items):
+        """دمج المنتجات المكررة والتحقق من الكميات: [(product_id, quantity)]"""
+        cart = {}
+        for product_id, quantity in items:
+            quantity = int(quantity)
+            if quantity < 1:
+                raise ValueError("الكمية يجب أن تكون 1 على الأقل")
+            cart[int(product_id)] = cart.get(int(product_id), 0) + quantity
+        if not cart:
+            raise ValueError("السلة فارغة")
+        if len(cart) > MAX_CART_ITEMS:
+            raise ValueError(f"الحد الأقصى {MAX_CART_ITEMS} منتجاً في الطلب")
+        if any(quantity > MAX_ITEM_QUANTITY for quantity in cart.values()):
+            raise ValueError(f"الحد الأقصى للكمية {MAX_ITEM_QUANTITY}")
+        return list(cart.items())
+
+    @staticmethod
+    def _insert_order(conn, items, customer_name, customer_phone, customer_address):
+        """كتابة الطلب ومنتجاته معاً (داخل معاملة الكاتب الجماعي)"""
+        product_ids = [product_id for product_id, _ in items]
+        rows = conn.execute(
+            f"SELECT id, seller_id, price FROM products WHERE id IN ({','.join('?' * len(product_ids))})",
+            product_ids
+        ).fetchall()
+        products = {product_id: (seller_id, price) for product_id, seller_id, price in rows}
+        if len(products) != len(product_ids):
+            raise ValueError("منتج غير موجود")
+        sellers = {seller_id for seller_id, _ in products.values()}
+        if len(sellers) != 1:
+            raise ValueError("منتجات الطلب يجب أن تكون من متجر واحد")
+
+        total = sum(products[product_id][1] * quantity for product_id, quantity in items)
+        cursor = conn.execute('''
+        INSERT INTO orders (product_id, customer_name, customer_phone, customer_address, quantity, seller_id, total)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            product_ids[0], customer_name, customer_phone, customer_address,
+            sum(quantity for _, quantity in items), sellers.pop(), total
+        ))
         order_id = cursor.lastrowid
-        conn.close()
+        conn.executemany(
+            'INSERT INTO order_items (order_id, product_id, quantity, price) VALUES (?, ?, ?, ?)',
+            [(order_id, product_id, quantity, products[product_id][1]) for product_id, quantity in items]
+        )
         return order_id
-    
+
+    def submit_cart(self, items, customer_name, customer_phone, customer_address):
+        """إضافة طلب بعدة منتجات [(product_id, quantity)] لدفعة الكتابة التالية؛ Future برقم الطلب بعد الحفظ"""
+        return self.order_writer.submit(
+            self._insert_order, self._normalize_cart(items), customer_name, customer_phone, customer_address
+        )
+
+    def submit_order(self, product_id, customer_name, customer_phone, customer_address, quantity=1):
+        """إضافة طلب لدفعة الكتابة التالية؛ Future برقم الطلب بعد الحفظ"""
+        return self.submit_cart([(product_id, quantity)], customer_name, customer_phone, customer_address)
+
+    def add_cart(self, items, customer_name, customer_phone, customer_address):
+        return self.submit_cart(items, customer_name, customer_phone, customer_address).result()
+
+    def add_order(self, product_id, customer_name, customer_phone, customer_address, quantity=1):
+        return self.submit_order(
+            product_id, customer_name, customer_phone, customer_address, quantity
+        ).result()
+
+    @timed(DB_QUERY_SECONDS)
+    def get_order_items(self, order_id):
+        """منتجات الطلب: (product_id, الاسم، الكمية، السعر وقت الطلب)"""
+        with self.connection() as conn:
+            cursor = conn.execute('''
+            SELECT i.product_id, p.name, i.quantity, i.price
+            FROM order_items i
+            JOIN products p ON p.id = i.product_id
+            WHERE i.order_id = ?
+            ORDER BY i.id
+            ''', (order_id,))
+            return cursor.fetchall()
+
+    def update_order_status(self, order_id, new_status, seller_id=None):
+        """نقل طلب لحالة جديدة إن كان الانتقال مسموحاً (وكان الطلب للبائع إن حُدد)"""
+        return bool(self.update_statuses([order_id], new_status, seller_id=seller_id))
+
+    @timed(DB_QUERY_SECONDS)
+    def update_statuses(self, order_ids, new_status, seller_id=None):
+        """نقل عدة طلبات لحالة جديدة في معاملة واحدة؛ تُرجع أرقام الطلبات التي تغيرت"""
+        if new_status not in STATUS_TRANSITIONS:
+            raise ValueError(f"حالة غير معروفة: {new_status}")
+        allowed_from = [status for status, targets in STATUS_TRANSITIONS.items() if new_status in targets]
+        order_ids = list(dict.fromkeys(order_ids))
+
+        updated = []
+        with self.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            for i in range(0, len(order_ids), MAX_SQL_VARIABLES):
+                chunk = order_ids[i:i + MAX_SQL_VARIABLES]
+                conditions = [
+                    f"id IN ({','.join('?' * len(chunk))})",
+                    f"status IN ({','.join('?' * len(allowed_from))})",
+                ]
+                params = chunk + allowed_from
+                if seller_id is not None:
+                    conditions.append('seller_id = ?')
+                    params.append(seller_id)
+                where = ' AND '.join(conditions)
+
+                ids = [row[0] for row in conn.execute(f'SELECT id FROM orders WHERE {where}', params)]
+                if ids:
+                    conn.execute(
+                        f"UPDATE orders SET status = ? WHERE id IN ({','.join('?' * len(ids))})",
+                        [new_status] + ids
+                    )
+                    updated.extend(ids)
+        return updated
+
+    @timed(DB_QUERY_SECONDS)
     def get_orders_for_seller(self, seller_id):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-        SELECT o.*, p.name as product_name, p.price
-        FROM orders o
-        JOIN products p ON o.product_id = p.id
-        WHERE p.seller_id = ?
-        ORDER BY o.created_at DESC
-        ''', (seller_id,))
-        orders = cursor.fetchall()
-        conn.close()
-        return orders
+        with self.connection() as conn:
+            cursor = conn.execute(f'''
+            SELECT {ORDER_COLUMNS}
+            FROM orders o
+            WHERE o.seller_id = ?
+            ORDER BY o.created_at DESC, o.id DESC
+            ''', (seller_id,))
+            return cursor.fetchall()
+
+    def iter_orders_for_seller(self, seller_id, since=None, batch=EXPORT_BATCH_SIZE):
+        """كل طلبات البائع (الأقدم أولاً) كمولّد يقرأ batch صفاً في كل مرة
+
+        الاتصال يبقى محجوزاً حتى ينتهي المولّد أو يُغلق، والقراءة من لقطة واحدة (WAL)
+        فلا تتأثر بالطلبات الجديدة أثناء التصدير.
+        """
+        conditions = ['o.seller_id = ?']
+        params = [seller_id]
+        if since is not None:
+            conditions.append('o.created_at >= ?')
+            params.append(since)
+
+        with self.connection() as conn:
+            cursor = conn.execute(f'''
+            SELECT {ORDER_COLUMNS}
+            FROM orders o
+            WHERE {' AND '.join(conditions)}
+            ORDER BY o.created_at, o.id
+            ''', params)
+            while True:
+                rows = cursor.fetchmany(batch)
+                if not rows:
+                    break
+                yield from rows
+
+    @timed(DB_QUERY_SECONDS)
+    def get_orders_page(self, seller_id, limit=10, before=None, after=None, status=None):
+        """صفحة من طلبات البائع (الأحدث أولاً) باستخدام مؤشر (created_at, id)
+
+        before: مؤشر آخر صف في الصفحة الحالية للانتقال للصفحة التالية (الأقدم)
+        after: مؤشر أول صف في الصفحة الحالية للرجوع للصفحة السابقة (الأحدث)
+        تُرجع (الطلبات، يوجد_المزيد) حيث يوجد_المزيد يخص اتجاه التصفح
+        """
+        conditions = ['o.seller_id = ?']
+        params = [seller_id]
+        if status is not None:
+            conditions.append('o.status = ?')
+            params.append(status)
+        if before is not None:
+            conditions.append('(o.created_at, o.id) < (?, ?)')
+            params.extend(before)
+            order = 'DESC'
+        elif after is not None:
+            conditions.append('(o.created_at, o.id) > (?, ?)')
+            params.extend(after)
+            order = 'ASC'
+        else:
+            order = 'DESC'
+        params.append(limit + 1)
+
+        with self.connection() as conn:
+            cursor = conn.execute(f'''
+            SELECT {ORDER_COLUMNS}
+            FROM orders o
+            WHERE {' AND '.join(conditions)}
+            ORDER BY o.created_at {order}, o.id {order}
+            LIMIT ?
+            ''', params)
+            orders = cursor.fetchall()
+
+        has_more = len(orders) > limit
+        orders = orders[:limit]
+        if order == 'ASC':
+            orders.reverse()
+        return orders, has_more
+
+    # دوال الإحصائيات
+    @timed(DB_QUERY_SECONDS)
+    def get_seller_stats(self, seller_id):
+        """إحصائيات المتجر محسوبة في SQLite"""
+        with self.connection() as conn:
+            products = conn.execute(
+                'SELECT COUNT(*) FROM products WHERE seller_id = ?', (seller_id,)
+            ).fetchone()[0]
+            cursor = conn.execute('''
+            SELECT status, COUNT(*), SUM(total), MAX(created_at)
+            FROM orders
+            WHERE seller_id = ?
+            GROUP BY status
+            ''', (seller_id,))
+            statuses = {}
+            orders, revenue, last_order_at = 0, 0.0, None
+            for status, count, status_revenue, status_last in cursor.fetchall():
+                statuses[status] = count
+                orders += count
+                revenue += status_revenue or 0
+                if status_last and (last_order_at is None or status_last > last_order_at):
+                    last_order_at = status_last
+
+        return {
+            'products': products,
+            'orders': orders,
+            'statuses': statuses,
+            'revenue': revenue,
+            'last_order_at': last_order_at,
+        }
 
 db = Database()
@@ -0,0 +1,49 @@
+"""تصدير طلبات البائع كملف CSV أو JSONL مضغوط (gzip)
+
+الصفوف تُكتب واحداً واحداً من المولّد إلى ملف مؤقت يبقى في الذاكرة حتى
+EXPORT_SPOOL_SIZE ثم ينتقل للقرص، فلا يتجاوز استهلاك الذاكرة حداً ثابتاً مهما كان
+عدد الطلبات. الحد للكتابة فقط: رفع الملف لتلغرام (InputFile) يقرأ الملف المضغوط كاملاً
+للذاكرة.
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+# حجم الملف المضغوط الذي يبقى في الذاكرة قبل نقله للقرص
+EXPORT_SPOOL_SIZE = int(os.getenv('EXPORT_SPOOL_SIZE', str(1024 * 1024)))
+
+# الأعمدة كما تظهر في الملف (بترتيب ORDER_COLUMNS)
+EXPORT_FIELDS = (
+    'id', 'product_id', 'customer_name', 'customer_phone', 'customer_address',
+    'quantity', 'status', 'created_at', 'items', 'total',
+)
+
+def write_orders(orders, fmt='csv'):
+    """كتابة الطلبات إلى ملف gzip مؤقت؛ تُرجع (الملف من بدايته، عدد الطلبات)"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"صيغة تصدير غير معروفة: {fmt}")
+
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+    count = 0
+    # GzipFile لا يغلق spool، فيبقى للقراءة بعد كتابة نهاية الضغط
+    with gzip.GzipFile(fileobj=spool, mode='wb', compresslevel=6) as compressed:
+        # BOM في CSV حتى يعرض Excel النص العربي بشكل صحيح
+        encoding = 'utf-8-sig' if fmt == 'csv' else 'utf-8'
+        with io.TextIOWrapper(compressed, encoding=encoding, newline='') as text:
+            if fmt == 'csv':
+                writer = csv.writer(text)
+                writer.writerow(EXPORT_FIELDS)
+                for order in orders:
+                    writer.writerow(order)
+                    count += 1
+            else:
+                for order in orders:
+                    text.write(json.dumps(dict(zip(EXPORT_FIELDS, order)), ensure_ascii=False))
+                    text.write('\n')
+                    count += 1
+    spool.seek(0)
+    return spool, count
@@ -0,0 +1,169 @@
+"""نقطة تشغيل واحدة للبوت: create_application(config) ثم run(config)
+
+الإعدادات من متغيرات البيئة افتراضياً (Config)، والاستيرادات الثقيلة (telegram،
+قاعدة البيانات ومعالجات البوت) تحدث داخل create_application فقط؛ فاستيراد هذه الوحدة
+لا يفتح قاعدة البيانات ولا يحمّل مكتبات الشبكة.
+"""
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+BOT_MODES = ('polling', 'webhook')
+# sqlite: حالة المحادثات و user_data تبقى عبر إعادة التشغيل، memory: تُفقد
+STORAGE_BACKENDS = ('sqlite', 'memory')
+# orders: معالجات المتاجر والطلبات (bot_functions)، demo: العرض التجريبي بدون قاعدة بيانات
+HANDLER_SETS = ('orders', 'demo')
+
+def _load_dotenv():
+    """قراءة ملف .env إن كانت python-dotenv مثبتة"""
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv()
+
+def _env_flag(name):
+    """True/False من متغير بيئة 1/0، و None إن لم يُحدد"""
+    value = os.getenv(name)
+    if value is None or value == '':
+        return None
+    return value == '1'
+
+class Config:
+    """إعدادات إنشاء التطبيق وتشغيله"""
+
+    def __init__(self, token=None, mode='polling', storage='sqlite', handlers='orders',
+                 db_path=None, api_url=None, metrics=True, drop_pending_updates=None):
+        if mode not in BOT_MODES:
+            raise ValueError(f"وضع تشغيل غير معروف: {mode}")
+        if storage not in STORAGE_BACKENDS:
+            raise ValueError(f"نوع تخزين غير معروف: {storage}")
+        if handlers not in HANDLER_SETS:
+            raise ValueError(f"مجموعة معالجات غير معروفة: {handlers}")
+        if not token:
+            raise ValueError("لم يتم تعيين BOT_TOKEN في متغيرات البيئة")
+        self.token = token
+        self.mode = mode
+        self.storage = storage
+        self.handlers = handlers
+        self.db_path = db_path
+        self.api_url = api_url
+        self.metrics = metrics
+        # None: حسب الوضع (تُحذف في polling وتُحفظ في webhook، انظر run_application)
+        self.drop_pending_updates = drop_pending_updates
+
+    @classmethod
+    def from_env(cls, **overrides):
+        """الإعدادات من متغيرات البيئة (و .env)، مع تجاوز أي قيمة بالمعاملات"""
+        _load_dotenv()
+        values = {
+            'token': os.getenv('BOT_TOKEN'),
+            'mode': os.getenv('BOT_MODE', 'polling'),
+            'storage': os.getenv('BOT_STORAGE', 'sqlite'),
+            'handlers': os.getenv('BOT_HANDLERS', 'orders'),
+            'db_path': os.getenv('DB_PATH'),
+            # عنوان Bot API بديل (مثلاً fake_telegram.py للتشغيل المحلي)
+            'api_url': os.getenv('TELEGRAM_API_URL'),
+            'metrics': os.getenv('METRICS_ENABLED', '1') == '1',
+            # 1 أو 0؛ بدونه حسب الوضع (انظر webhook.run_application)
+            'drop_pending_updates': _env_flag('BOT_DROP_PENDING_UPDATES'),
+        }
+        values.update(overrides)
+        return cls(**values)
+
+    def export_env(self):
+        """ضبط متغيرات البيئة التي تقرأها الوحدات عند استيرادها (قبل استيرادها)"""
+        if self.db_path:
+            os.environ['DB_PATH'] = self.db_path
+        os.environ['METRICS_ENABLED'] = '1' if self.metrics else '0'
+
+def configure_logging():
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+
+async def error_handler(update, context):
+    """تسجيل الخطأ وإبلاغ المستخدم"""
+    logger.error("Update %s caused error", update, exc_info=context.error)
+    if update is not None and getattr(update, 'effective_message', None):
+        from outbox import outbox
+
+        outbox.reply(
+            update.effective_message,
+            "❌ حدث خطأ ما.\n"
+            "جرب /start لإعادة التشغيل."
+        )
+
+async def stop_background(application):
+    """post_stop: إرسال ملخصات الطلبات المنتظرة ثم ما بقي في طابور الإرسال
+
+    بعد Application.stop (لا تحديثات جديدة) وقبل shutdown (البوت ما زال يعمل).
+    """
+    from notifier import notifier
+    from outbox import outbox
+
+    await notifier.stop()
+    await outbox.stop()
+
+def create_application(config=None, **builder_options):
+    """بناء Application بمعالجات البوت حسب الإعدادات
+
+    builder_options تُمرر لـ ApplicationBuilder (مثل request أو application_class في الاختبارات).
+    """
+    config = config or Config.from_env()
+    config.export_env()
+
+    from telegram.ext import Application
+
+    from scheduler import ScheduledApplication
+
+    # معالجة المستخدمين المختلفين بالتوازي مع الحفاظ على ترتيب كل محادثة
+    builder = Application.builder().token(config.token).application_class(ScheduledApplication)
+    if config.api_url:
+        builder = builder.base_url(config.api_url)
+    if config.metrics and 'request' not in builder_options:
+        from metrics import timed_request
+        # قياس زمن استدعاءات Bot API (بنفس حجم مجموعة الاتصالات الافتراضي)
+        builder = builder.request(timed_request(connection_pool_size=256))
+    persistence = None
+    if config.storage == 'sqlite' and config.handlers == 'orders':
+        from persistence import SQLitePersistence
+        persistence = SQLitePersistence()
+        builder = builder.persistence(persistence)
+    if config.handlers == 'orders':
+        builder = builder.post_stop(stop_background)
+    for option, value in builder_options.items():
+        builder = getattr(builder, option)(value)
+    application = builder.build()
+    if persistence is not None:
+        # حذف الجلسات الخاملة من ذاكرة التطبيق أيضاً (SQLitePersistence.evict)
+        persistence.application = application
+
+    if config.handlers == 'demo':
+        from bot import setup_demo_handlers
+        setup_demo_handlers(application)
+    else:
+        from bot_functions import setup_bot_handlers
+        setup_bot_handlers(application)
+    application.add_error_handler(error_handler)
+    return application
+
+def run(config=None):
+    """إنشاء التطبيق وتشغيله (polling أو webhook) حتى الإيقاف"""
+    config = config or Config.from_env()
+    application = create_application(config)
+
+    from webhook import run_application
+
+    logger.info("🚀 بدء تشغيل البوت (%s، %s، %s)...", config.handlers, config.mode, config.storage)
+    run_application(application, mode=config.mode, drop_pending_updates=config.drop_pending_updates)
+
+def main(config=None):
+    """نقطة الدخول من سطر الأوامر (Procfile)"""
+    configure_logging()
+    run(config)
+
+if __name__ == '__main__':
+    main()
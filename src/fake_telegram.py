@@ -0,0 +1,134 @@
+"""تلغرام وهمي للتشغيل المحلي في وضع الـ Webhook
+
+يشغّل خادماً يحاكي Bot API (يسجّل الرسائل المرسلة بدل إرسالها)، ثم يرسل
+تحديثات مسجلة من ملف JSONL إلى الـ Webhook كما يفعل تلغرام.
+
+مثال:
+    # الطرفية 1 (ينتظر حتى يعمل البوت ثم يرسل التحديثات)
+    python src/fake_telegram.py updates.jsonl --secret s3cret
+    # الطرفية 2
+    BOT_TOKEN=123456:TEST BOT_MODE=webhook WEBHOOK_REGISTER=0 WEBHOOK_SECRET=s3cret PORT=8443 \\
+    TELEGRAM_API_URL=http://127.0.0.1:8081/bot python src/factory.py
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'OrderBot', 'username': 'order_bot'}
+
+class FakeBotAPI(BaseHTTPRequestHandler):
+    """يرد على طلبات Bot API بنتائج ثابتة ويطبعها"""
+    calls = []
+    message_id = 0
+
+    def do_POST(self):
+        method = self.path.rsplit('/', 1)[-1]
+        length = int(self.headers.get('Content-Length', 0))
+        raw = self.rfile.read(length)
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('application/json'):
+            params = json.loads(raw) if raw else {}
+        elif content_type.startswith('application/x-www-form-urlencoded'):
+            params = dict(urllib.parse.parse_qsl(raw.decode()))
+            if params.get('chat_id', '').lstrip('-').isdigit():
+                params['chat_id'] = int(params['chat_id'])
+        else:
+            # multipart (ملفات) - لا حاجة لتحليلها
+            params = {}
+        FakeBotAPI.calls.append((method, params))
+
+        if method == 'getMe':
+            result = BOT_USER
+        elif method in ('sendMessage', 'editMessageText', 'sendDocument'):
+            FakeBotAPI.message_id += 1
+            result = {
+                'message_id': FakeBotAPI.message_id,
+                'date': int(time.time()),
+                'chat': {'id': params.get('chat_id', 0), 'type': 'private'},
+                'from': BOT_USER,
+                'text': params.get('text', ''),
+            }
+            print(f"→ {method} chat={params.get('chat_id')}: {params.get('text', '')[:60]!r}")
+        else:
+            result = True
+
+        body = json.dumps({'ok': True, 'result': result}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST
+
+    def log_message(self, format, *args):
+        pass
+
+def wait_for_webhook(url, timeout=60):
+    """انتظار حتى يرد خادم الـ Webhook على فحص الصحة"""
+    parts = urllib.parse.urlsplit(url)
+    health_url = f"{parts.scheme}://{parts.netloc}/"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(health_url):
+                return True
+        except OSError:
+            time.sleep(0.5)
+    return False
+
+def replay(path, url, secret, delay):
+    """إرسال التحديثات المسجلة إلى الـ Webhook"""
+    sent = 0
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            request = urllib.request.Request(url, data=line.encode(), method='POST')
+            request.add_header('Content-Type', 'application/json')
+            if secret:
+                request.add_header('X-Telegram-Bot-Api-Secret-Token', secret)
+            with urllib.request.urlopen(request) as response:
+                if response.status != 200:
+                    print(f"❌ رد غير متوقع: {response.status}", file=sys.stderr)
+            sent += 1
+            if delay:
+                time.sleep(delay)
+    return sent
+
+def main():
+    parser = argparse.ArgumentParser(description="تلغرام وهمي لاختبار وضع الـ Webhook محلياً")
+    parser.add_argument('updates', nargs='?', help="ملف JSONL بتحديث واحد في كل سطر")
+    parser.add_argument('--url', default='http://127.0.0.1:8443/telegram')
+    parser.add_argument('--secret', default='')
+    parser.add_argument('--api-port', type=int, default=8081)
+    parser.add_argument('--delay', type=float, default=0.0)
+    args = parser.parse_args()
+
+    api = ThreadingHTTPServer(('127.0.0.1', args.api_port), FakeBotAPI)
+    threading.Thread(target=api.serve_forever, daemon=True).start()
+    print(f"🤖 Bot API وهمي على http://127.0.0.1:{args.api_port}/bot")
+
+    try:
+        if args.updates:
+            if not wait_for_webhook(args.url):
+                print("❌ خادم الـ Webhook لا يستجيب", file=sys.stderr)
+                return
+            sent = replay(args.updates, args.url, args.secret, args.delay)
+            print(f"✅ تم إرسال {sent} تحديث")
+        # إبقاء الـ API يعمل لاستقبال الردود
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"\n📊 استدعاءات API: {len(FakeBotAPI.calls)}")
+    finally:
+        api.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,303 @@
+"""مقاييس الأداء بصيغة Prometheus
+
+- زمن كل معالج وعدد التحديثات في كل حالة محادثة (instrument_handlers)
+- زمن دوال قاعدة البيانات ودفعات الكتابة (DB_QUERY_SECONDS / DB_COMMIT_SECONDS)
+- زمن استدعاءات Bot API (timed_request)
+- لقطات من stats() للمجدول والـ outbox والإشعارات وقاعدة البيانات وقت القراءة فقط
+
+تُقرأ من GET /metrics على خادم الـ Webhook أو على METRICS_PORT في وضع polling.
+"""
+import bisect
+import functools
+import hmac
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') == '1'
+# منفذ خادم المقاييس في وضع polling (0 = معطل)
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+# إن حُدد يجب إرسال Authorization: Bearer <METRICS_TOKEN>
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# حدود الـ histogram بالثواني (من 1ms إلى 10s)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BATCH_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250)
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """عدّاد متزايد لكل مجموعة قيم وسوم"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labels, label_values), value
+
+class Histogram:
+    """توزيع القيم على حدود ثابتة (buckets تراكمية كما يتوقعها Prometheus)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # {label_values: [counts..., +Inf, sum]}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            series = {key: list(value) for key, value in self._series.items()}
+        for label_values, counts in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield (f'{self.name}_bucket',
+                       _format_labels(self.labels, label_values, f'le="{bound}"'), cumulative)
+            yield f'{self.name}_count', _format_labels(self.labels, label_values), cumulative
+            yield f'{self.name}_sum', _format_labels(self.labels, label_values), counts[-1]
+
+class Registry:
+    """كل المقاييس المسجلة ومجمّعات اللقطات"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []  # دوال تُرجع [(الاسم، الوصف، {وسوم: قيمة})]
+
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect):
+        """دالة تُستدعى عند كل قراءة فقط (لا تكلفة على المسار الساخن)"""
+        self._collectors.append(collect)
+
+    def render(self):
+        """النص بصيغة Prometheus"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {_format_value(value)}')
+
+        for collect in self._collectors:
+            try:
+                gauges = collect()
+            except Exception:
+                logger.exception("فشل جمع المقاييس")
+                continue
+            for name, documentation, values in gauges:
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} gauge')
+                for label_pairs, value in values.items():
+                    labels = '{' + ','.join(f'{k}="{v}"' for k, v in label_pairs) + '}' if label_pairs else ''
+                    lines.append(f'{name}{labels} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+HANDLER_SECONDS = registry.histogram(
+    'bot_handler_seconds', 'زمن تنفيذ معالجات البوت', ('handler',)
+)
+HANDLER_ERRORS = registry.counter(
+    'bot_handler_errors_total', 'استثناءات المعالجات', ('handler',)
+)
+CONVERSATION_STATE = registry.counter(
+    'bot_conversation_state_total', 'التحديثات المعالجة في كل حالة محادثة', ('conversation', 'state')
+)
+DB_QUERY_SECONDS = registry.histogram(
+    'db_query_seconds', 'زمن دوال قاعدة البيانات', ('method',)
+)
+DB_COMMIT_SECONDS = registry.histogram(
+    'db_group_commit_seconds', 'زمن كتابة دفعة طلبات في معاملة واحدة'
+)
+DB_COMMIT_BATCH = registry.histogram(
+    'db_group_commit_batch_size', 'عدد العمليات في كل دفعة', buckets=BATCH_BUCKETS
+)
+API_SECONDS = registry.histogram(
+    'telegram_api_seconds', 'زمن استدعاءات Bot API', ('method', 'result')
+)
+
+def timed(histogram, label=None):
+    """قياس زمن دالة متزامنة (label افتراضياً اسم الدالة)"""
+    def decorator(func):
+        name = label or func.__name__
+        if not METRICS_ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, name)
+        return wrapper
+    return decorator
+
+# ========== المعالجات ==========
+def _wrap_callback(handler, conversation=None, state=None):
+    callback = handler.callback
+    if getattr(callback, '_instrumented', False):
+        return
+    name = callback.__name__
+
+    async def instrumented(update, context):
+        if conversation is not None:
+            CONVERSATION_STATE.inc(conversation, state)
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, name)
+
+    instrumented._instrumented = True
+    instrumented.__name__ = name
+    handler.callback = instrumented
+
+def instrument_handlers(application):
+    """تغليف كل المعالجات المسجلة (ومعالجات المحادثات بحالاتها) بقياس الزمن"""
+    if not METRICS_ENABLED:
+        return
+    # استيراد متأخر حتى تبقى الوحدة خفيفة لـ database.py
+    from telegram.ext import ConversationHandler
+
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            if isinstance(handler, ConversationHandler):
+                conversation = handler.name or 'conversation'
+                for inner in handler.entry_points:
+                    _wrap_callback(inner, conversation, 'entry')
+                for state, inner_handlers in handler.states.items():
+                    for inner in inner_handlers:
+                        _wrap_callback(inner, conversation, str(state))
+                for inner in handler.fallbacks:
+                    _wrap_callback(inner, conversation, 'fallback')
+            else:
+                _wrap_callback(handler)
+
+# ========== Bot API ==========
+def timed_request(**kwargs):
+    """HTTPXRequest يقيس زمن كل استدعاء لـ Bot API حسب الطريقة"""
+    from telegram.request import HTTPXRequest
+
+    class TimedRequest(HTTPXRequest):
+        async def do_request(self, url, method, request_data=None, **kwargs):
+            endpoint = url.rsplit('/', 1)[-1]
+            started = time.perf_counter()
+            result = 'error'
+            try:
+                code, payload = await super().do_request(url, method, request_data, **kwargs)
+                result = 'ok' if code == 200 else str(code)
+                return code, payload
+            finally:
+                API_SECONDS.observe(time.perf_counter() - started, endpoint, result)
+
+    return TimedRequest(**kwargs)
+
+# ========== الخادم ==========
+def authorized(header):
+    """التحقق من ترويسة Authorization إن كان METRICS_TOKEN محدداً"""
+    if not METRICS_TOKEN:
+        return True
+    # مقارنة بزمن ثابت (بايتات: compare_digest يرفض النصوص غير ASCII)
+    return hmac.compare_digest(header.encode(), f'Bearer {METRICS_TOKEN}'.encode())
+
+def start_metrics_server(port=METRICS_PORT, host='0.0.0.0'):
+    """خادم /metrics في خيط خلفي (لوضع polling حيث لا يوجد خادم HTTP)"""
+    # استيراد متأخر: http.server يبطئ بدء التشغيل ولا يلزم في وضع الـ Webhook
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            if not authorized(self.headers.get('Authorization', '')):
+                self.send_error(403)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True)
+    thread.start()
+    logger.info(f"📈 المقاييس على http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+# ========== لقطات stats() ==========
+_stats_sources = {}  # {البادئة: دالة stats}
+
+def _flatten(prefix, stats, out):
+    for key, value in stats.items():
+        name = f'{prefix}_{key}'
+        if isinstance(value, dict):
+            _flatten(name, value, out)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out.append((name, value))
+
+def _collect_stats():
+    gauges = []
+    for prefix, stats in list(_stats_sources.items()):
+        values = []
+        _flatten(prefix, stats(), values)
+        gauges.extend((name, f'{prefix}.stats()', {(): value}) for name, value in values)
+    return gauges
+
+def add_stats_source(prefix, stats):
+    """تصدير القيم الرقمية من stats() كـ gauges عند القراءة (تسجيل مكرر يستبدل السابق)"""
+    if not _stats_sources:
+        registry.add_collector(_collect_stats)
+    _stats_sources[prefix] = stats
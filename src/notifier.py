@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import os
+
+from telegram.error import Forbidden, TelegramError
+
+from async_database import adb
+from outbox import PRIORITY_NORMAL, outbox
+
+logger = logging.getLogger(__name__)
+
+# نافذة تجميع الطلبات لكل بائع في رسالة واحدة (بالثواني)
+NOTIFY_WINDOW = float(os.getenv('NOTIFY_WINDOW', '5'))
+
+MAX_MESSAGE_LENGTH = 4096
+
+def format_digest(events):
+    """نص إشعار واحد لمجموعة طلبات"""
+    if len(events) == 1:
+        event = events[0]
+        return (
+            f"🔔 **طلب جديد #{event['order_id']}**\n\n"
+            f"🛍️ المنتجات:\n{event['items']}\n"
+            f"💰 الإجمالي: {event['total']} ريال\n"
+            f"👤 {event['customer_name']} - 📱 {event['customer_phone']}\n"
+            f"📍 {event['customer_address']}"
+        )
+
+    text = f"🔔 **{len(events)} طلبات جديدة:**\n\n"
+    for i, event in enumerate(events):
+        line = f"🆔 #{event['order_id']} - {event['total']} ريال - {event['customer_name']}\n"
+        if len(text) + len(line) > MAX_MESSAGE_LENGTH - 60:
+            text += f"… و{len(events) - i} طلبات أخرى (/orders)"
+            break
+        text += line
+    return text
+
+async def seller_chat_id(seller_id):
+    """معرف تلغرام للبائع من جدول sellers"""
+    seller = await adb.get_seller(seller_id)
+    return seller[1] if seller else None
+
+class OrderNotifier:
+    """إرسال إشعارات الطلبات الجديدة للبائعين عبر طابور داخلي
+
+    الطلبات لكل بائع تُجمع خلال NOTIFY_WINDOW في رسالة واحدة، والإرسال يمر عبر
+    outbox الذي يطبق حدود تلغرام.
+    """
+
+    def __init__(self, bot=None, resolve_chat=seller_chat_id, window=NOTIFY_WINDOW, sender=outbox):
+        self.bot = bot
+        self.resolve_chat = resolve_chat
+        self.window = window
+        self.sender = sender
+        self._queue = None
+        self._pending = {}  # {seller_id: [events]}
+        self._flush_tasks = set()
+        self._task = None
+
+        # إحصائيات
+        self.published = 0
+        self.sent = 0
+        self.failed = 0
+
+    def start(self, bot=None):
+        if bot is not None:
+            self.bot = bot
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run(), name='order-notifier')
+
+    async def stop(self):
+        """إرسال الإشعارات المعلقة فوراً ثم الإيقاف"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        while not self._queue.empty():
+            self._add(self._queue.get_nowait())
+        for task in list(self._flush_tasks):
+            task.cancel()
+        await asyncio.gather(*[self._deliver(seller_id) for seller_id in list(self._pending)])
+
+    def publish(self, event, bot=None):
+        """نشر حدث طلب جديد (يبدأ العامل عند أول استخدام)"""
+        self.start(bot)
+        self.published += 1
+        self._queue.put_nowait(event)
+
+    async def _run(self):
+        while True:
+            self._add(await self._queue.get())
+
+    def _add(self, event):
+        seller_id = event['seller_id']
+        if seller_id in self._pending:
+            self._pending[seller_id].append(event)
+            return
+        self._pending[seller_id] = [event]
+        task = asyncio.create_task(self._flush_after(seller_id))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush_after(self, seller_id):
+        await asyncio.sleep(self.window)
+        await self._deliver(seller_id)
+
+    async def _deliver(self, seller_id):
+        events = self._pending.pop(seller_id, None)
+        if not events:
+            return
+        try:
+            chat_id = await self.resolve_chat(seller_id)
+        except Exception:
+            logger.exception("تعذر معرفة محادثة البائع")
+            chat_id = None
+        if chat_id is None:
+            self.failed += 1
+            return
+
+        try:
+            await self.sender.send(
+                chat_id, self.bot.send_message,
+                chat_id=chat_id, text=format_digest(events), priority=PRIORITY_NORMAL
+            )
+            self.sent += 1
+        except Forbidden:
+            # البائع أوقف البوت
+            self.failed += 1
+        except TelegramError:
+            logger.exception("فشل إرسال إشعار الطلب")
+            self.failed += 1
+
+    def stats(self):
+        return {
+            'published': self.published,
+            'sent': self.sent,
+            'failed': self.failed,
+            'pending_sellers': len(self._pending),
+            'queued': self._queue.qsize() if self._queue else 0,
+        }
+
+notifier = OrderNotifier()
@@ -0,0 +1,238 @@
+import asyncio
+import itertools
+import logging
+import os
+import time
+from collections import deque
+
+from telegram.error import RetryAfter
+
+from rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# أولويات الإرسال (الأصغر أولاً)
+PRIORITY_HIGH = 0    # تأكيد الطلبات
+PRIORITY_NORMAL = 1  # ردود المحادثة
+PRIORITY_LOW = 2     # الإشعارات والبث
+PRIORITY_NAMES = {PRIORITY_HIGH: 'high', PRIORITY_NORMAL: 'normal', PRIORITY_LOW: 'low'}
+
+# حدود تلغرام: حوالي 30 رسالة/ثانية إجمالاً ورسالة/ثانية لكل محادثة (مع دفعة قصيرة)
+OUTBOX_GLOBAL_RATE = float(os.getenv('OUTBOX_GLOBAL_RATE', '25'))
+OUTBOX_CHAT_RATE = float(os.getenv('OUTBOX_CHAT_RATE', '1'))
+OUTBOX_CHAT_BURST = float(os.getenv('OUTBOX_CHAT_BURST', '3'))
+OUTBOX_CONCURRENCY = int(os.getenv('OUTBOX_CONCURRENCY', '16'))
+OUTBOX_MAX_RETRIES = 3
+# أقصى انتظار لإرسال الرسائل المعلقة عند الإيقاف
+OUTBOX_DRAIN_TIMEOUT = float(os.getenv('OUTBOX_DRAIN_TIMEOUT', '10'))
+MAX_CHAT_BUCKETS = 10000
+
+class _Job:
+    __slots__ = ('func', 'args', 'kwargs', 'priority', 'future', 'enqueued_at', 'retries')
+
+    def __init__(self, func, args, kwargs, priority, future):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+        self.retries = 0
+
+def _log_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("تعذر إرسال رسالة", exc_info=future.exception())
+
+class Outbox:
+    """جدولة كل الرسائل الصادرة: حدود المعدل، أولويات، وإعادة المحاولة بعد RetryAfter
+
+    لكل محادثة طابور FIFO ولا يُرسل لها إلا رسالة واحدة في كل مرة (يحفظ الترتيب)؛
+    رأس طابور كل محادثة يدخل طابور أولويات مشترك حسب أولويته.
+    """
+
+    def __init__(self, global_rate=OUTBOX_GLOBAL_RATE, chat_rate=OUTBOX_CHAT_RATE,
+                 chat_burst=OUTBOX_CHAT_BURST, concurrency=OUTBOX_CONCURRENCY,
+                 max_retries=OUTBOX_MAX_RETRIES):
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self._chat_buckets = {}
+        self._chats = {}  # {chat_id: deque[_Job]}
+        self._ready = None
+        self._inflight = None
+        self._seq = itertools.count()
+        self._task = None
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+        # إحصائيات
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.queued = dict.fromkeys(PRIORITY_NAMES.values(), 0)
+        self.latency_total = dict.fromkeys(PRIORITY_NAMES.values(), 0.0)
+        self.latency_max = dict.fromkeys(PRIORITY_NAMES.values(), 0.0)
+        self.started = dict.fromkeys(PRIORITY_NAMES.values(), 0)
+
+    def _start(self):
+        if self._task is None:
+            self._ready = asyncio.PriorityQueue()
+            self._inflight = asyncio.Semaphore(self.concurrency)
+            self._task = asyncio.create_task(self._dispatch(), name='outbox')
+
+    async def stop(self, timeout=OUTBOX_DRAIN_TIMEOUT):
+        """إرسال الرسائل المعلقة (حتى timeout ثانية) ثم الإيقاف"""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            pending = sum(len(queue) for queue in self._chats.values())
+            logger.warning(f"انتهت مهلة الإيقاف وبقيت {pending} رسالة دون إرسال")
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        for queue in self._chats.values():
+            for job in queue:
+                job.future.cancel()
+        self._chats.clear()
+        self._idle.set()
+
+    def _enqueue(self, chat_id, func, args, kwargs, priority):
+        self._start()
+        job = _Job(func, args, kwargs, priority, asyncio.get_running_loop().create_future())
+        self.queued[PRIORITY_NAMES[priority]] += 1
+
+        self._idle.clear()
+        queue = self._chats.get(chat_id)
+        if queue is None:
+            self._chats[chat_id] = deque([job])
+            self._push(chat_id, job)
+        else:
+            queue.append(job)
+        return job.future
+
+    async def send(self, chat_id, func, /, *args, priority=PRIORITY_NORMAL, **kwargs):
+        """جدولة func(*args, **kwargs) لهذه المحادثة وانتظار نتيجتها (بعد إعادة المحاولات)"""
+        return await self._enqueue(chat_id, func, args, kwargs, priority)
+
+    def post(self, chat_id, func, /, *args, priority=PRIORITY_NORMAL, **kwargs):
+        """جدولة func دون انتظار الإرسال؛ تُرجع Future تُنتظر فقط إن لزمت نتيجتها
+
+        المعالج لا يبقى محجوزاً أثناء RetryAfter، والفشل يُسجَّل هنا بدل أن يصل للمعالج.
+        """
+        future = self._enqueue(chat_id, func, args, kwargs, priority)
+        future.add_done_callback(_log_failure)
+        return future
+
+    def reply(self, message, text, priority=PRIORITY_NORMAL, **kwargs):
+        """بديل message.reply_text عبر الطابور (دون انتظار، انظر post)"""
+        return self.post(message.chat_id, message.reply_text, text, priority=priority, **kwargs)
+
+    def edit(self, query, text, priority=PRIORITY_NORMAL, **kwargs):
+        """بديل query.edit_message_text عبر الطابور (دون انتظار، انظر post)"""
+        return self.post(query.message.chat_id, query.edit_message_text, text, priority=priority, **kwargs)
+
+    async def flush(self, chat_id):
+        """انتظار ما في طابور هذه المحادثة الآن (نجح أو فشل)"""
+        queue = self._chats.get(chat_id)
+        if queue:
+            await asyncio.wait([job.future for job in queue])
+
+    def _push(self, chat_id, job):
+        self._ready.put_nowait((job.priority, next(self._seq), chat_id))
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= MAX_CHAT_BUCKETS:
+                # حذف دلاء المحادثات الخاملة (الممتلئة)
+                for key in [k for k, b in self._chat_buckets.items() if b.delay() == 0 and b.tokens >= b.capacity]:
+                    del self._chat_buckets[key]
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            entry = await self._ready.get()
+            chat_id = entry[2]
+            bucket = self._chat_bucket(chat_id)
+            delay = bucket.delay()
+            if delay > 0:
+                # المحادثة تجاوزت حدها؛ لا نوقف المحادثات الأخرى
+                loop.call_later(delay, self._ready.put_nowait, entry)
+                continue
+
+            await self.global_bucket.acquire()
+            bucket.try_acquire()
+            await self._inflight.acquire()
+            asyncio.create_task(self._execute(chat_id, entry))
+
+    async def _execute(self, chat_id, entry):
+        queue = self._chats[chat_id]
+        job = queue[0]
+        lane = PRIORITY_NAMES[job.priority]
+        if job.retries == 0:
+            waited = time.perf_counter() - job.enqueued_at
+            self.started[lane] += 1
+            self.latency_total[lane] += waited
+            self.latency_max[lane] = max(self.latency_max[lane], waited)
+
+        try:
+            result = await job.func(*job.args, **job.kwargs)
+        except RetryAfter as e:
+            self.retries += 1
+            job.retries += 1
+            if job.retries <= self.max_retries:
+                # تلغرام يطبق الحد على البوت كله
+                self.global_bucket.pause(e.retry_after)
+                self._ready.put_nowait(entry)
+                return
+            self.failed += 1
+            self._settle(job, exception=e)
+        except Exception as e:
+            self.failed += 1
+            self._settle(job, exception=e)
+        else:
+            self.sent += 1
+            self._settle(job, result=result)
+        finally:
+            self._inflight.release()
+
+        self.queued[lane] -= 1
+        queue.popleft()
+        if queue:
+            self._push(chat_id, queue[0])
+        else:
+            del self._chats[chat_id]
+            if not self._chats:
+                self._idle.set()
+
+    @staticmethod
+    def _settle(job, result=None, exception=None):
+        # المستدعي قد يكون أُلغي أثناء الانتظار
+        if job.future.done():
+            return
+        if exception is not None:
+            job.future.set_exception(exception)
+        else:
+            job.future.set_result(result)
+
+    def stats(self):
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'retries': self.retries,
+            'queued': dict(self.queued),
+            'chats_waiting': len(self._chats),
+            'avg_latency': {
+                lane: self.latency_total[lane] / self.started[lane] if self.started[lane] else 0.0
+                for lane in self.latency_total
+            },
+            'max_latency': dict(self.latency_max),
+        }
+
+outbox = Outbox()
@@ -0,0 +1,290 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+
+import telegram
+from telegram.ext import BasePersistence, ConversationHandler, PersistenceInput
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+# كل كم ثانية يسلّم التطبيق البيانات المتغيرة للحفظ
+PERSISTENCE_INTERVAL = float(os.getenv('PERSISTENCE_INTERVAL', '10'))
+# تأخير الكتابة لتجميع التغييرات في معاملة واحدة
+FLUSH_DELAY = float(os.getenv('PERSISTENCE_FLUSH_DELAY', '1'))
+# حذف الجلسات الخاملة بعد هذه المدة (بالثواني)
+SESSION_TTL = float(os.getenv('SESSION_TTL', str(7 * 24 * 3600)))
+# كل كم ثانية تُحذف الجلسات الخاملة أثناء التشغيل (مع أول flush بعدها)
+EVICT_INTERVAL = float(os.getenv('SESSION_EVICT_INTERVAL', '3600'))
+
+# ConversationHandler لا يوفر طريقة عامة لإنهاء محادثة؛ قاموسه الخاص (_conversations)
+# يُستخدم فقط مع الإصدار المثبت في requirements.txt
+_CONVERSATIONS_API = telegram.__version_info__[:2] == (20, 3)
+
+def _loads_many(documents):
+    """فك نصوص JSON كثيرة باستدعاء واحد (أسرع من json.loads لكل صف عند بدء التشغيل)"""
+    return json.loads('[' + ','.join(documents) + ']')
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+class SQLitePersistence(BasePersistence):
+    """حفظ حالة المحادثات و user_data/chat_data/bot_data في SQLite
+
+    التحديثات تُجمع في الذاكرة وتُكتب دفعة واحدة (write-behind) بعد FLUSH_DELAY،
+    والقيم تُخزن JSON (الصفوف tuple تعود كقوائم وهذا يكفي للفهرسة).
+    """
+
+    def __init__(self, database=db, update_interval=PERSISTENCE_INTERVAL, session_ttl=SESSION_TTL):
+        super().__init__(
+            store_data=PersistenceInput(callback_data=False),
+            update_interval=update_interval
+        )
+        self.database = database
+        self.session_ttl = session_ttl
+
+        # التغييرات المعلقة؛ القيمة None تعني حذف
+        self._users = {}
+        self._chats = {}
+        self._conversations = {}  # {(name, key): state}
+        self._bot_data = None
+        self._flush_handle = None
+        self._flush_task = None
+        self._flush_lock = asyncio.Lock()
+        # التطبيق (factory.create_application) لحذف الجلسات الخاملة من ذاكرته أيضاً
+        self.application = None
+        # آخر نشاط لكل جلسة في ذاكرة التطبيق
+        self._seen_users = {}
+        self._seen_chats = {}
+        self._seen_conversations = {}  # {(name, key): time}
+        self._evicted_at = time.monotonic()
+        # دفعات لم تُكتب بعد (تُعاد عند الفشل بالترتيب)
+        self._failed = []
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    # ---------- القراءة عند بدء التشغيل ----------
+    def _load_rows(self, table, key_column, seen):
+        cutoff = time.time() - self.session_ttl
+        with self.database.connection() as conn:
+            conn.execute(f'DELETE FROM {table} WHERE updated_at < ?', (cutoff,))
+            rows = conn.execute(f'SELECT {key_column}, data, updated_at FROM {table}').fetchall()
+        seen.update((key, updated_at) for key, _, updated_at in rows)
+        return dict(zip((key for key, _, _ in rows), _loads_many(data for _, data, _ in rows)))
+
+    def _load_conversations(self, name):
+        cutoff = time.time() - self.session_ttl
+        with self.database.connection() as conn:
+            conn.execute('DELETE FROM persistence_conversations WHERE updated_at < ?', (cutoff,))
+            rows = conn.execute(
+                'SELECT key, state, updated_at FROM persistence_conversations WHERE name = ?', (name,)
+            ).fetchall()
+        keys = list(map(tuple, _loads_many(key for key, _, _ in rows)))
+        self._seen_conversations.update(
+            ((name, key), updated_at) for key, (_, _, updated_at) in zip(keys, rows)
+        )
+        return dict(zip(keys, _loads_many(state for _, state, _ in rows)))
+
+    def _load_bot_data(self):
+        with self.database.connection() as conn:
+            row = conn.execute('SELECT data FROM persistence_bot_data WHERE id = 1').fetchone()
+            return json.loads(row[0]) if row else {}
+
+    async def get_user_data(self):
+        return await self._run(self._load_rows, 'persistence_user_data', 'user_id', self._seen_users)
+
+    async def get_chat_data(self):
+        return await self._run(self._load_rows, 'persistence_chat_data', 'chat_id', self._seen_chats)
+
+    async def get_bot_data(self):
+        return await self._run(self._load_bot_data)
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        return await self._run(self._load_conversations, name)
+
+    # ---------- تسجيل التغييرات ----------
+    async def update_user_data(self, user_id, data):
+        self._users[user_id] = data
+        self._seen_users[user_id] = time.time()
+        self._schedule_flush()
+
+    async def update_chat_data(self, chat_id, data):
+        self._chats[chat_id] = data
+        self._seen_chats[chat_id] = time.time()
+        self._schedule_flush()
+
+    async def update_bot_data(self, data):
+        self._bot_data = data
+        self._schedule_flush()
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def update_conversation(self, name, key, new_state):
+        self._conversations[(name, key)] = new_state
+        if new_state is None:
+            self._seen_conversations.pop((name, key), None)
+        else:
+            self._seen_conversations[(name, key)] = time.time()
+        self._schedule_flush()
+
+    async def drop_user_data(self, user_id):
+        self._users[user_id] = None
+        self._seen_users.pop(user_id, None)
+        self._schedule_flush()
+
+    async def drop_chat_data(self, chat_id):
+        self._chats[chat_id] = None
+        self._seen_chats.pop(chat_id, None)
+        self._schedule_flush()
+
+    async def refresh_user_data(self, user_id, user_data):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    # ---------- الكتابة ----------
+    def _schedule_flush(self):
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(FLUSH_DELAY, self._start_flush)
+
+    def _start_flush(self):
+        # المرجع يمنع جمع المهمة قبل انتهائها، و flush عند الإيقاف ينتظرها
+        self._flush_handle = None
+        self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+        self._flush_task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task):
+        if self._flush_task is task:
+            self._flush_task = None
+
+    def _collect(self):
+        """تحويل التغييرات المعلقة إلى صفوف (في خيط الحلقة حتى لا تتغير القواميس أثناء التسلسل)"""
+        now = time.time()
+        batch = {
+            'users': [(k, None if v is None else _dumps(v), now) for k, v in self._users.items()],
+            'chats': [(k, None if v is None else _dumps(v), now) for k, v in self._chats.items()],
+            'conversations': [
+                (name, _dumps(list(key)), None if state is None else _dumps(state), now)
+                for (name, key), state in self._conversations.items()
+            ],
+            'bot_data': None if self._bot_data is None else _dumps(self._bot_data),
+        }
+        self._users, self._chats, self._conversations, self._bot_data = {}, {}, {}, None
+        return batch
+
+    def _write(self, batch):
+        with self.database.connection() as conn:
+            for table, key_column, rows in (
+                ('persistence_user_data', 'user_id', batch['users']),
+                ('persistence_chat_data', 'chat_id', batch['chats']),
+            ):
+                conn.executemany(
+                    f'INSERT OR REPLACE INTO {table} ({key_column}, data, updated_at) VALUES (?, ?, ?)',
+                    [row for row in rows if row[1] is not None]
+                )
+                conn.executemany(
+                    f'DELETE FROM {table} WHERE {key_column} = ?',
+                    [(row[0],) for row in rows if row[1] is None]
+                )
+
+            # الحالة None تعني انتهاء المحادثة
+            conn.executemany(
+                'INSERT OR REPLACE INTO persistence_conversations (name, key, state, updated_at) VALUES (?, ?, ?, ?)',
+                [row for row in batch['conversations'] if row[2] is not None]
+            )
+            conn.executemany(
+                'DELETE FROM persistence_conversations WHERE name = ? AND key = ?',
+                [row[:2] for row in batch['conversations'] if row[2] is None]
+            )
+
+            if batch['bot_data'] is not None:
+                conn.execute(
+                    'INSERT OR REPLACE INTO persistence_bot_data (id, data) VALUES (1, ?)',
+                    (batch['bot_data'],)
+                )
+
+    async def flush(self):
+        """كتابة كل التغييرات المعلقة في معاملة واحدة"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        task = self._flush_task
+        if task is not None and task is not asyncio.current_task():
+            # flush مجدول بدأ قبل الإيقاف: ينتهي أولاً ثم تُكتب بقية التغييرات
+            await asyncio.shield(task)
+
+        async with self._flush_lock:
+            batch = self._collect()
+            if any(batch.values()):
+                self._failed.append(batch)
+            while self._failed:
+                try:
+                    await self._run(self._write, self._failed[0])
+                except Exception:
+                    logger.exception("فشل حفظ حالة المحادثات، ستُعاد المحاولة")
+                    self._schedule_flush()
+                    return
+                self._failed.pop(0)
+
+        if time.monotonic() - self._evicted_at >= EVICT_INTERVAL:
+            self.evict()
+
+    def evict(self):
+        """حذف الجلسات التي لم تتغير منذ session_ttl من ذاكرة التطبيق
+
+        الحذف يمر بـ drop_user_data/drop_chat_data وتحديث المحادثة إلى None، فيُحذف
+        من SQLite مع الدفعة التالية (والمحادثة من ذاكرة معالجها مع الإصدار المثبت فقط).
+        يُرجع عدد الجلسات المحذوفة.
+        """
+        self._evicted_at = time.monotonic()
+        if self.application is None:
+            return 0
+        cutoff = time.time() - self.session_ttl
+        users = [key for key, seen in self._seen_users.items() if seen < cutoff]
+        chats = [key for key, seen in self._seen_chats.items() if seen < cutoff]
+        conversations = [key for key, seen in self._seen_conversations.items() if seen < cutoff]
+
+        for user_id in users:
+            self.application.drop_user_data(user_id)
+            self._seen_users.pop(user_id, None)
+        for chat_id in chats:
+            self.application.drop_chat_data(chat_id)
+            self._seen_chats.pop(chat_id, None)
+        if conversations:
+            handlers = {
+                handler.name: handler
+                for handler in itertools.chain.from_iterable(self.application.handlers.values())
+                if isinstance(handler, ConversationHandler) and handler.persistent
+            }
+            for name, key in conversations:
+                self._seen_conversations.pop((name, key), None)
+                # الحالة None تحذفها من SQLite مع الدفعة التالية
+                self._conversations[(name, key)] = None
+                handler = handlers.get(name)
+                if handler is not None and _CONVERSATIONS_API:
+                    handler._conversations.pop(key, None)
+            if not _CONVERSATIONS_API:
+                logger.warning(
+                    f"python-telegram-bot {telegram.__version__}: المحادثات الخاملة حُذفت من SQLite "
+                    f"فقط وتبقى في الذاكرة حتى إعادة التشغيل"
+                )
+            self._schedule_flush()
+
+        evicted = len(users) + len(chats) + len(conversations)
+        if evicted:
+            logger.info(f"🧹 حذف {evicted} جلسة خاملة")
+        return evicted
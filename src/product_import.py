@@ -0,0 +1,169 @@
+"""استيراد منتجات المتجر من ملف CSV أو JSON
+
+الملف يُقرأ على دفعات (CSV سطراً سطراً، و JSON عنصراً عنصراً من مصفوفة أو أسطر
+JSONL) فلا يُحمَّل كاملاً في الذاكرة، وكل صف يُتحقق منه بنفس قواعد الإضافة اليدوية.
+"""
+import csv
+import io
+import json
+import math
+import os
+import re
+
+IMPORT_FORMATS = ('csv', 'json', 'jsonl')
+# أقصى حجم للملف المرفوع وعدد المنتجات في الاستيراد الواحد
+MAX_IMPORT_FILE_SIZE = int(os.getenv('MAX_IMPORT_FILE_SIZE', str(5 * 1024 * 1024)))
+MAX_IMPORT_ROWS = int(os.getenv('MAX_IMPORT_ROWS', '5000'))
+# عدد أخطاء الصفوف المعروضة للبائع
+MAX_REPORTED_ERRORS = 10
+MAX_NAME_LENGTH = 200
+
+_CHUNK_SIZE = 64 * 1024
+# المسافات بين رموز JSON (الفواصل والأقواس يتحقق منها iter_json_rows)
+_JSON_WHITESPACE = re.compile(r'\s*')
+
+# أسماء الأعمدة المقبولة (عربي أو إنجليزي)
+FIELD_ALIASES = {
+    'name': 'name', 'الاسم': 'name', 'اسم': 'name', 'المنتج': 'name',
+    'price': 'price', 'السعر': 'price', 'سعر': 'price',
+    'description': 'description', 'الوصف': 'description', 'وصف': 'description',
+}
+FIELDS = ('name', 'price', 'description')
+
+def parse_price(text):
+    """سعر المنتج من نص البائع (ValueError إن لم يكن رقماً غير سالب)"""
+    price = float(str(text).strip())
+    if not math.isfinite(price) or price < 0:
+        raise ValueError(text)
+    return price
+
+def validate_product(row):
+    """(name, price, description) من صف {field: value}، أو ValueError بسبب الرفض"""
+    if not isinstance(row, dict):
+        raise ValueError("الصف ليس كائناً")
+    name = str(row.get('name') or '').strip()
+    if not name:
+        raise ValueError("الاسم مفقود")
+    if len(name) > MAX_NAME_LENGTH:
+        raise ValueError("الاسم طويل جداً")
+    try:
+        price = parse_price(row.get('price'))
+    except (TypeError, ValueError):
+        raise ValueError("السعر يجب أن يكون رقماً")
+    description = str(row.get('description') or '').strip()
+    return name, price, description
+
+def _field_names(header):
+    """أسماء الحقول من صف العناوين، أو None إن لم يكن صف عناوين"""
+    fields = [FIELD_ALIASES.get(cell.strip().lower()) for cell in header]
+    return fields if 'name' in fields and 'price' in fields else None
+
+def iter_csv_rows(text):
+    """(رقم السطر، {field: value}) لكل صف؛ بدون عناوين تُفهم الأعمدة: الاسم، السعر، الوصف"""
+    reader = csv.reader(text)
+    fields = None
+    for cells in reader:
+        if not any(cell.strip() for cell in cells):
+            continue
+        if fields is None:
+            fields = _field_names(cells)
+            if fields is not None:
+                continue
+            fields = FIELDS
+        yield reader.line_num, {
+            field: cell for field, cell in zip(fields, cells) if field is not None
+        }
+
+def iter_json_rows(text, chunk_size=_CHUNK_SIZE):
+    """(رقم العنصر، العنصر) من مصفوفة JSON أو أسطر JSONL دون قراءة الملف كاملاً
+
+    عناصر المصفوفة مفصولة بفاصلة ولا بد من ] في آخرها: الملف المقطوع مثل `[{...},`
+    يُرفض (ValueError) حتى لو كانت عناصره الأولى سليمة.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    index = 0
+    array = None  # يُعرف من أول رمز في الملف
+    expect = 'first'  # في المصفوفة: first (عنصر أو ])، item، separator (, أو ])، closed
+    while True:
+        pos = _JSON_WHITESPACE.match(buffer, pos).end()
+        need_more = pos == len(buffer)
+        if not need_more:
+            char = buffer[pos]
+            if array is None:
+                array = char == '['
+                if array:
+                    pos += 1
+                    continue
+            if array:
+                if expect == 'closed':
+                    raise ValueError("بيانات بعد نهاية مصفوفة JSON")
+                if char == ']' and expect in ('first', 'separator'):
+                    pos += 1
+                    expect = 'closed'
+                    continue
+                if expect == 'separator':
+                    if char != ',':
+                        raise ValueError(f"JSON غير صالح بعد العنصر {index}")
+                    pos += 1
+                    expect = 'item'
+                    continue
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # عنصر مقطوع عند نهاية الدفعة: نقرأ المزيد
+                if eof:
+                    raise ValueError(f"JSON غير صالح بعد العنصر {index}")
+                need_more = True
+            else:
+                index += 1
+                expect = 'separator'
+                yield index, item
+                continue
+        if eof:
+            break
+        chunk = text.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+    if array and expect != 'closed':
+        raise ValueError(f"مصفوفة JSON غير مكتملة بعد العنصر {index} (لا يوجد ])")
+
+def parse_products(fileobj, fmt):
+    """قراءة ملف المنتجات (bytes) والتحقق منه
+
+    تُرجع (المنتجات [(name, price, description)]، تقرير) حيث التقرير:
+    rejected عدد الصفوف المرفوضة، errors أولها [(الرقم، السبب)]، truncated إن تجاوز الملف
+    MAX_IMPORT_ROWS. ValueError إن كان الملف نفسه غير صالح.
+    """
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"صيغة غير معروفة: {fmt}")
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    rows = iter_csv_rows(text) if fmt == 'csv' else iter_json_rows(text)
+
+    products = []
+    report = {'rejected': 0, 'errors': [], 'truncated': False}
+    try:
+        for number, row in rows:
+            if isinstance(row, dict) and fmt != 'csv':
+                row = {FIELD_ALIASES.get(str(key).strip().lower()): value for key, value in row.items()}
+            if len(products) >= MAX_IMPORT_ROWS:
+                report['truncated'] = True
+                # بقية الملف تُقرأ دون حفظ حتى يُرفض إن كان مقطوعاً
+                for _ in rows:
+                    pass
+                break
+            try:
+                products.append(validate_product(row))
+            except ValueError as e:
+                report['rejected'] += 1
+                if len(report['errors']) < MAX_REPORTED_ERRORS:
+                    report['errors'].append((number, str(e)))
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ValueError(f"تعذرت قراءة الملف: {e}")
+    finally:
+        # لا نغلق الملف الأصلي مع الغلاف النصي
+        text.detach()
+    return products, report
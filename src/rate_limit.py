@@ -0,0 +1,40 @@
+import asyncio
+import time
+
+class TokenBucket:
+    """دلو رموز لتحديد المعدل: rate رمز في الثانية وبحد أقصى capacity"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self):
+        """الثواني المتبقية حتى يتوفر رمز"""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def try_acquire(self):
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    async def acquire(self):
+        while not self.try_acquire():
+            await asyncio.sleep(self.delay())
+
+    def pause(self, seconds):
+        """إيقاف الدلو مؤقتاً (مثلاً بعد RetryAfter من تلغرام)"""
+        self._refill()
+        # دين من الرموز يُسدد خلال seconds
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+import telegram
+from telegram import Update
+from telegram.ext import Application
+# إشارة الإيقاف التي يضعها Application.stop() في طابور التحديثات
+from telegram.ext._application import _STOP_SIGNAL
+
+logger = logging.getLogger(__name__)
+
+# أقصى عدد من التحديثات تُعالج في نفس الوقت (لمستخدمين مختلفين)
+UPDATE_CONCURRENCY = int(os.getenv('UPDATE_CONCURRENCY', '16'))
+
+# ScheduledApplication يستبدل Application._update_fetcher ويعتمد على _STOP_SIGNAL، وكلاهما
+# خاص وقد يتغير دون إعلان؛ مُختبر على هذا الإصدار فقط (requirements.txt)
+TESTED_PTB_VERSION = (20, 3)
+
+def check_telegram_version():
+    """RuntimeError إن لم يكن python-telegram-bot هو الإصدار المُختبر"""
+    if telegram.__version_info__[:2] != TESTED_PTB_VERSION or not hasattr(Application, '_update_fetcher'):
+        raise RuntimeError(
+            f"ScheduledApplication يعتمد على واجهات خاصة في python-telegram-bot "
+            f"{'.'.join(map(str, TESTED_PTB_VERSION))} والمثبت {telegram.__version__}؛ "
+            f"راجع scheduler.py قبل الترقية"
+        )
+
+def chat_key(update):
+    """مفتاح الترتيب: المحادثة ثم المستخدم؛ التحديثات بدون مفتاح لا تُرتَّب"""
+    if isinstance(update, Update):
+        if update.effective_chat:
+            return update.effective_chat.id
+        if update.effective_user:
+            return update.effective_user.id
+    return None
+
+class UpdateScheduler:
+    """تنفيذ تحديثات المستخدمين المختلفين بالتوازي مع الحفاظ على ترتيب تحديثات كل محادثة
+
+    لكل مفتاح طابور خاص، والمفتاح يكون إما في طابور الجاهزين أو قيد التنفيذ،
+    فلا يعالَج تحديثان لنفس المحادثة في نفس الوقت.
+    """
+
+    def __init__(self, process, max_concurrent=UPDATE_CONCURRENCY, key_func=chat_key, on_done=None):
+        self.process = process
+        self.max_concurrent = max_concurrent
+        self.key_func = key_func
+        self.on_done = on_done
+        self._pending = {}  # {key: deque[(update, enqueued_at)]}
+        self._ready = asyncio.Queue()
+        self._scheduled = set()  # مفاتيح في طابور الجاهزين أو قيد التنفيذ
+        self._workers = []
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+        # إحصائيات
+        self.depth = 0
+        self.active = 0
+        self.processed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def start(self):
+        for i in range(self.max_concurrent):
+            self._workers.append(asyncio.create_task(self._worker(), name=f'update-worker-{i}'))
+
+    async def stop(self):
+        """انتظار إنهاء كل التحديثات المعلقة ثم إيقاف العمال"""
+        await self._idle.wait()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, update):
+        key = self.key_func(update)
+        if key is None:
+            # بدون مفتاح: طابور خاص بهذا التحديث فقط
+            key = ('update', id(update))
+        self._pending.setdefault(key, deque()).append((update, time.perf_counter()))
+        self.depth += 1
+        self._idle.clear()
+        if key not in self._scheduled:
+            self._scheduled.add(key)
+            self._ready.put_nowait(key)
+
+    async def _worker(self):
+        while True:
+            key = await self._ready.get()
+            queue = self._pending[key]
+            update, enqueued_at = queue.popleft()
+            self.depth -= 1
+
+            waited = time.perf_counter() - enqueued_at
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+            self.active += 1
+            try:
+                await self.process(update)
+            except Exception:
+                logger.exception("خطأ أثناء معالجة التحديث")
+            finally:
+                self.active -= 1
+                self.processed += 1
+                if self.on_done:
+                    self.on_done()
+
+            if queue:
+                self._ready.put_nowait(key)
+            else:
+                del self._pending[key]
+                self._scheduled.discard(key)
+                if not self._scheduled:
+                    self._idle.set()
+
+    def stats(self):
+        return {
+            'max_concurrent': self.max_concurrent,
+            'queue_depth': self.depth,
+            'active': self.active,
+            'waiting_chats': len(self._pending),
+            'processed': self.processed,
+            'avg_wait': self.wait_total / self.processed if self.processed else 0.0,
+            'max_wait': self.wait_max,
+        }
+
+class ScheduledApplication(Application):
+    """Application يوزّع التحديثات على UpdateScheduler بدل معالجتها واحداً تلو الآخر
+
+    الاستخدام:
+        Application.builder().token(TOKEN).application_class(
+            ScheduledApplication, kwargs={'max_concurrent': 16}
+        ).build()
+    """
+
+    def __init__(self, max_concurrent=UPDATE_CONCURRENCY, **kwargs):
+        check_telegram_version()
+        super().__init__(**kwargs)
+        self.scheduler = UpdateScheduler(
+            self.process_update,
+            max_concurrent=max_concurrent,
+            on_done=self.update_queue.task_done
+        )
+
+    async def _update_fetcher(self):
+        self.scheduler.start()
+        while True:
+            try:
+                update = await self.update_queue.get()
+            except asyncio.CancelledError:
+                logger.warning("تم إلغاء جلب التحديثات؛ يُتجاهل لأن الإيقاف يتم عبر Application.stop")
+                continue
+
+            if update is _STOP_SIGNAL:
+                # إنهاء ما تم استلامه (الـ Webhook أكّد استلامه لتلغرام)
+                await self.scheduler.stop()
+                self.update_queue.task_done()
+                return
+
+            self.scheduler.submit(update)
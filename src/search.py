@@ -0,0 +1,36 @@
+"""تجهيز النص العربي للبحث الكامل (FTS5)
+
+مُجزّئ unicode61 في SQLite لا يزيل التشكيل العربي ولا يوحّد أشكال الألف والتاء
+المربوطة، فيُطبّع النص هنا بنفس الطريقة عند الفهرسة وعند البحث.
+"""
+import re
+
+# التشكيل وعلامات القرآن والتطويل
+_DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+_LETTERS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي', 'ؤ': 'و', 'ة': 'ه',
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # الأرقام العربية
+})
+# "ال" التعريف وما يسبقها من حروف (تُحذف إن بقي بعدها حرفان على الأقل)
+_ARTICLE = re.compile(r'\b(?:[وفبك]?ال|لل)(?=\w{2,})')
+_TOKEN = re.compile(r'\w+')
+
+# أقصى عدد كلمات في استعلام البحث
+MAX_QUERY_TERMS = 8
+
+def normalize_text(text):
+    """النص كما يُخزن في الفهرس"""
+    text = _DIACRITICS.sub('', text or '').translate(_LETTERS).lower()
+    return _ARTICLE.sub('', text)
+
+def match_query(text):
+    """استعلام MATCH آمن من نص الزبون (كل كلمة كبادئة)، أو None إن لم توجد كلمات"""
+    terms = _TOKEN.findall(normalize_text(text))[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    return ' AND '.join(f'"{term}"*' for term in terms)
+
+def store_token(seller_id):
+    """رمز المتجر في عمود store حتى يُفلتر البحث من الفهرس نفسه"""
+    return f's{seller_id}'
@@ -0,0 +1,50 @@
+"""أكواد المتاجر: عشوائية من secrets مع حرف تحقق أخير
+
+الكود 8 أحرف من أبجدية بدون الأحرف المتشابهة (0/O و 1/I)، آخرها حرف تحقق
+(Luhn mod 32) يكشف أي خطأ في حرف واحد ومعظم تبديلات الأحرف المتجاورة، فتُرفض الأكواد
+المكتوبة خطأً قبل الوصول لقاعدة البيانات. 32^7 (حوالي 34 مليار) احتمال يجعل
+التصادم نادراً حتى مع ملايين المتاجر، وعند حدوثه يُعاد التوليد.
+"""
+import secrets
+
+ALPHABET = '23456789ABCDEFGHJKLMNPQRSTUVWXYZ'
+BASE = len(ALPHABET)
+CODE_LENGTH = 8  # 7 عشوائية + حرف تحقق
+
+# الأكواد القديمة: 6 أحرف من A-Z و 0-9 بدون تحقق
+LEGACY_LENGTH = 6
+LEGACY_CHARS = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789')
+
+# محاولات توليد كود جديد عند التصادم
+STORE_CODE_ATTEMPTS = 5
+
+_VALUES = {char: i for i, char in enumerate(ALPHABET)}
+
+def check_char(payload):
+    """حرف التحقق (Luhn mod N) لأحرف الكود"""
+    factor = 2
+    total = 0
+    for char in reversed(payload):
+        addend = factor * _VALUES[char]
+        total += addend // BASE + addend % BASE
+        factor = 1 if factor == 2 else 2
+    return ALPHABET[(BASE - total % BASE) % BASE]
+
+def new_store_code():
+    """كود جديد عشوائي (الفريد يُضمن عبر UNIQUE وإعادة المحاولة)"""
+    payload = ''.join(secrets.choice(ALPHABET) for _ in range(CODE_LENGTH - 1))
+    return payload + check_char(payload)
+
+def normalize_store_code(text):
+    """الكود كما يُخزن: بدون مسافات وبأحرف كبيرة"""
+    return text.strip().replace(' ', '').replace('-', '').upper()
+
+def is_valid_store_code(code):
+    """فحص الصيغة وحرف التحقق دون قاعدة البيانات (الأكواد القديمة مقبولة بصيغتها)"""
+    if len(code) == CODE_LENGTH:
+        if any(char not in _VALUES for char in code):
+            return False
+        return check_char(code[:-1]) == code[-1]
+    if len(code) == LEGACY_LENGTH:
+        return all(char in LEGACY_CHARS for char in code)
+    return False
@@ -0,0 +1,251 @@
+import asyncio
+import hmac
+import json
+import logging
+import os
+import secrets
+import signal
+
+from telegram import Update
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# إعدادات الـ Webhook - تؤخذ من متغيرات البيئة
+BOT_MODE = os.getenv('BOT_MODE', 'polling')  # polling أو webhook
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # العنوان العام مثل https://example.onrender.com
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('PORT', '8443'))
+# تعطيل تسجيل الـ Webhook لدى تلغرام (للتشغيل المحلي مع fake_telegram.py)
+WEBHOOK_REGISTER = os.getenv('WEBHOOK_REGISTER', '1') == '1'
+
+MAX_BODY_SIZE = int(os.getenv('WEBHOOK_MAX_BODY', str(1024 * 1024)))
+MAX_HEADERS = 100
+KEEPALIVE_TIMEOUT = 75
+
+REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    403: 'Forbidden',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    411: 'Length Required',
+    413: 'Payload Too Large',
+}
+
+class WebhookServer:
+    """خادم HTTP بسيط فوق asyncio يستقبل تحديثات تلغرام ويضعها في طابور التطبيق"""
+
+    def __init__(self, application, host=WEBHOOK_HOST, port=WEBHOOK_PORT, path=WEBHOOK_PATH,
+                 secret_token=WEBHOOK_SECRET, max_body_size=MAX_BODY_SIZE):
+        self.application = application
+        self.host = host
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self.max_body_size = max_body_size
+        self._server = None
+        self._connections = set()  # مهام الاتصالات المفتوحة
+
+        # إحصائيات
+        self.received = 0
+        self.rejected = 0
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        # المنفذ الفعلي (مفيد عند port=0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"🌐 خادم الـ Webhook يستمع على {self.host}:{self.port}{self.path}")
+
+    def stats(self):
+        return {'received': self.received, 'rejected': self.rejected, 'connections': len(self._connections)}
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            # إنهاء اتصالات keep-alive المفتوحة
+            tasks = list(self._connections)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _respond(self, writer, status, keep_alive=True):
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            f"Content-Length: 0\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1')
+        )
+        await writer.drain()
+
+    async def _respond_metrics(self, writer, headers):
+        if not metrics.METRICS_ENABLED:
+            await self._respond(writer, 404)
+            return
+        if not metrics.authorized(headers.get('authorization', '')):
+            await self._respond(writer, 403)
+            return
+        body = metrics.registry.render().encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            + f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1')
+            + body
+        )
+        await writer.drain()
+
+    def _check_request(self, method, target, headers):
+        """التحقق من الطلب قبل قراءة جسمه"""
+        if target.split('?', 1)[0] != self.path:
+            return 404
+        if method != 'POST':
+            return 405
+        if self.secret_token:
+            token = headers.get('x-telegram-bot-api-secret-token', '')
+            if not hmac.compare_digest(token.encode(), self.secret_token.encode()):
+                return 403
+        length = headers.get('content-length')
+        if length is None or not length.isdigit():
+            return 411
+        if int(length) > self.max_body_size:
+            return 413
+        return 200
+
+    async def _handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                request_line = await asyncio.wait_for(reader.readline(), timeout=KEEPALIVE_TIMEOUT)
+                if not request_line:
+                    break
+                try:
+                    method, target, _ = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, keep_alive=False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    if len(headers) >= MAX_HEADERS:
+                        raise ValueError("عدد كبير من الترويسات")
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                # فحص صحة الخادم (Render)
+                if method == 'GET' and target == '/':
+                    await self._respond(writer, 200)
+                    continue
+
+                if method == 'GET' and target.split('?', 1)[0] == '/metrics':
+                    await self._respond_metrics(writer, headers)
+                    continue
+
+                status = self._check_request(method, target, headers)
+                if status != 200:
+                    # الجسم لم يُقرأ، لذلك يُغلق الاتصال
+                    self.rejected += 1
+                    await self._respond(writer, status, keep_alive=False)
+                    break
+
+                body = await reader.readexactly(int(headers['content-length']))
+                try:
+                    data = json.loads(body)
+                    # التحديث كائن JSON دائماً (null أو [] أو رقم ليست تحديثات)
+                    if not isinstance(data, dict):
+                        raise ValueError("التحديث ليس كائناً")
+                    update = Update.de_json(data, self.application.bot)
+                except (ValueError, TypeError, KeyError, AttributeError):
+                    self.rejected += 1
+                    await self._respond(writer, 400)
+                    continue
+
+                # الرد فوراً؛ المعالجة تتم من طابور التطبيق
+                self.application.update_queue.put_nowait(update)
+                self.received += 1
+                await self._respond(writer, 200)
+
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError, ValueError, asyncio.CancelledError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+def webhook_secret(secret=WEBHOOK_SECRET, register=WEBHOOK_REGISTER):
+    """السر الذي يتحقق منه الخادم في كل طلب
+
+    بدونه يستطيع أي أحد يعرف العنوان العام إرسال تحديثات مزورة باسم أي بائع. إن لم
+    يُحدد WEBHOOK_SECRET يُولَّد سر عشوائي ويُسجَّل مع الـ Webhook، وبدون التسجيل (تلغرام
+    وهمي محلياً) لا يمكن إبلاغ المرسل به فيُرفض التشغيل.
+    """
+    if secret:
+        return secret
+    if not register:
+        raise ValueError("لم يتم تعيين WEBHOOK_SECRET (مطلوب مع WEBHOOK_REGISTER=0)")
+    logger.warning("لم يتم تعيين WEBHOOK_SECRET، سيُستخدم سر عشوائي لهذا التشغيل")
+    return secrets.token_urlsafe(32)
+
+async def serve_webhook(application, url=WEBHOOK_URL, register=WEBHOOK_REGISTER,
+                        drop_pending_updates=False, **server_kwargs):
+    """تشغيل التطبيق في وضع الـ Webhook حتى استلام إشارة الإيقاف
+
+    drop_pending_updates=False يُبقي التحديثات التي وصلت تلغرام أثناء إعادة التشغيل.
+    """
+    server_kwargs.setdefault('secret_token', webhook_secret(register=register))
+    server = WebhookServer(application, **server_kwargs)
+    metrics.add_stats_source('webhook', server.stats)
+
+    # مثل run_polling: post_init بعد التهيئة، post_stop بعد الإيقاف و post_shutdown في النهاية
+    async with application:
+        if application.post_init:
+            await application.post_init(application)
+        if register:
+            await application.bot.set_webhook(
+                url=url.rstrip('/') + server.path,
+                secret_token=server.secret_token,
+                allowed_updates=Update.ALL_TYPES,
+                drop_pending_updates=drop_pending_updates
+            )
+        await application.start()
+        await server.start()
+
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+
+        try:
+            await stop_event.wait()
+        finally:
+            await server.stop()
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+    if application.post_shutdown:
+        await application.post_shutdown(application)
+
+def run_application(application, mode=BOT_MODE, drop_pending_updates=None, **polling_kwargs):
+    """تشغيل البوت حسب mode (افتراضياً BOT_MODE: polling أو webhook)
+
+    drop_pending_updates=None: تُحذف التحديثات المعلقة في polling فقط.
+    """
+    if mode == 'webhook':
+        if WEBHOOK_REGISTER and not WEBHOOK_URL:
+            raise ValueError("لم يتم تعيين WEBHOOK_URL في متغيرات البيئة")
+        asyncio.run(serve_webhook(application, drop_pending_updates=bool(drop_pending_updates)))
+    else:
+        if metrics.METRICS_ENABLED and metrics.METRICS_PORT:
+            metrics.start_metrics_server()
+        if drop_pending_updates is None:
+            drop_pending_updates = True
+        application.run_polling(drop_pending_updates=drop_pending_updates, **polling_kwargs)
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# database.py يفتح DB_PATH عند الاستيراد، فيُضبط على مجلد مؤقت قبل أي استيراد
+os.environ['DB_PATH'] = os.path.join(tempfile.mkdtemp(prefix='orderbot-tests-'), 'orders.db')
+os.environ['METRICS_ENABLED'] = '0'
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
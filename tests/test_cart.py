@@ -0,0 +1,61 @@
+"""طلبات السلة: منتجات متجر واحد، السعر من داخل المعاملة، والتراجع عند الخطأ"""
+import pytest
+
+from database import Database
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(str(tmp_path / 'orders.db'), pool_size=2)
+    yield database
+    database.close()
+
+def open_store(database, telegram_id):
+    return database.get_seller_by_code(database.register_seller(telegram_id, 'متجر', 'x'))[0]
+
+def count(database, table):
+    with database.connection() as conn:
+        return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+def test_cart_merges_items_into_one_order(database):
+    seller_id = open_store(database, 1)
+    shirt = database.add_product(seller_id, 'قميص', 5, '')
+    hat = database.add_product(seller_id, 'قبعة', 2.5, '')
+
+    order_id = database.add_cart([(shirt, 1), (hat, 2), (shirt, 2)], 'أحمد', '0500', 'الرياض')
+    assert database.get_order_items(order_id) == [(shirt, 'قميص', 3, 5), (hat, 'قبعة', 2, 2.5)]
+    with database.connection() as conn:
+        total, quantity, owner = conn.execute(
+            'SELECT total, quantity, seller_id FROM orders WHERE id = ?', (order_id,)
+        ).fetchone()
+    assert (total, quantity, owner) == (20, 5, seller_id)
+
+def test_cart_rejects_products_from_other_store(database):
+    mine = database.add_product(open_store(database, 1), 'قميص', 5, '')
+    theirs = database.add_product(open_store(database, 2), 'قبعة', 3, '')
+
+    with pytest.raises(ValueError):
+        database.add_cart([(mine, 1), (theirs, 1)], 'أحمد', '0500', 'الرياض')
+    with pytest.raises(ValueError):
+        database.add_cart([(mine, 1), (theirs + 1000, 1)], 'أحمد', '0500', 'الرياض')
+    # SAVEPOINT الطلب يتراجع كاملاً: لا طلب بلا منتجات
+    assert count(database, 'orders') == 0
+    assert count(database, 'order_items') == 0
+
+def test_cart_uses_price_at_commit_time(database):
+    seller_id = open_store(database, 1)
+    product_id = database.add_product(seller_id, 'قميص', 5, '')
+    # الكتالوج المخزن مؤقتاً ما زال بالسعر القديم
+    assert database.get_product(seller_id, product_id)[3] == 5
+    with database.connection() as conn:
+        conn.execute('UPDATE products SET price = 7 WHERE id = ?', (product_id,))
+
+    order_id = database.add_order(product_id, 'أحمد', '0500', 'الرياض', quantity=2)
+    assert database.get_order_items(order_id)[0][3] == 7
+    with database.connection() as conn:
+        assert conn.execute('SELECT total FROM orders WHERE id = ?', (order_id,)).fetchone()[0] == 14
+
+@pytest.mark.parametrize('items', [[], [(1, 0)], [(1, -2)]])
+def test_cart_rejects_bad_quantities_before_queueing(database, items):
+    with pytest.raises(ValueError):
+        database.submit_cart(items, 'أحمد', '0500', 'الرياض')
+    assert database.order_writer.stats()['queued'] == 0
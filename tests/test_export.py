@@ -0,0 +1,40 @@
+"""تصدير الطلبات: محتوى الملف وإعادة الرفع بعد RetryAfter"""
+import asyncio
+import gzip
+from types import SimpleNamespace
+
+from telegram.error import RetryAfter
+
+import bot_functions
+from database import db
+from outbox import Outbox
+
+def test_export_retry_uploads_same_file(monkeypatch):
+    owner = 8_000_001
+    seller = db.get_seller_by_code(db.register_seller(owner, 'متجر التصدير', 'x'))
+    product_id = db.add_product(seller[0], 'قميص', 5, '')
+    db.add_order(product_id, 'أحمد', '0500', 'الرياض')
+
+    outbox = Outbox(global_rate=1000, chat_rate=1000)
+    monkeypatch.setattr(bot_functions, 'outbox', outbox)
+    uploads = []
+
+    async def reply_document(document, **kwargs):
+        uploads.append(document.input_file_content)
+        if len(uploads) == 1:
+            raise RetryAfter(0)
+
+    async def run():
+        update = SimpleNamespace(
+            effective_user=SimpleNamespace(id=owner),
+            message=SimpleNamespace(chat_id=owner, reply_document=reply_document),
+        )
+        await bot_functions.export_orders_command(update, SimpleNamespace(user_data={'logged_in': True}, args=[]))
+        await outbox.stop()
+
+    asyncio.run(run())
+    assert len(uploads) == 2
+    assert uploads[0] == uploads[1]
+    lines = gzip.decompress(uploads[1]).decode('utf-8-sig').splitlines()
+    assert lines[0].startswith('id,product_id,customer_name')
+    assert len(lines) == 2 and 'أحمد' in lines[1]
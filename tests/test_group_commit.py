@@ -0,0 +1,62 @@
+"""كاتب الطلبات الجماعي: عزل أخطاء العمليات داخل الدفعة، والإغلاق"""
+import sqlite3
+
+import pytest
+
+from database import Database, GroupCommitWriter
+
+@pytest.fixture
+def writer(tmp_path):
+    path = str(tmp_path / 'writer.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, value TEXT NOT NULL)')
+    conn.close()
+    # دفعة واحدة تجمع العمليات الثلاث
+    writer = GroupCommitWriter(lambda: sqlite3.connect(path, check_same_thread=False), batch_size=3, max_wait=5)
+    yield writer, path
+    writer.close()
+
+def insert(conn, value):
+    return conn.execute('INSERT INTO items (value) VALUES (?)', (value,)).lastrowid
+
+def saved(path):
+    conn = sqlite3.connect(path)
+    try:
+        return [row[0] for row in conn.execute('SELECT value FROM items ORDER BY id')]
+    finally:
+        conn.close()
+
+def test_bad_operation_fails_only_its_future(writer):
+    writer, path = writer
+    first = writer.submit(insert, 'a')
+    bad = writer.submit(insert, None)
+    last = writer.submit(insert, 'c')
+
+    assert first.result(timeout=5) and last.result(timeout=5)
+    with pytest.raises(sqlite3.IntegrityError):
+        bad.result(timeout=5)
+    assert writer.stats()['batches'] == 1
+    assert saved(path) == ['a', 'c']
+
+def test_close_drains_queue_then_rejects(writer):
+    writer, path = writer
+    writer.batch_size = 2
+    futures = [writer.submit(insert, str(i)) for i in range(5)]
+    writer.close()
+
+    assert all(future.done() for future in futures)
+    assert saved(path) == [str(i) for i in range(5)]
+    with pytest.raises(RuntimeError):
+        writer.submit(insert, 'late')
+
+def test_closed_database_rejects_orders(tmp_path):
+    database = Database(str(tmp_path / 'orders.db'), pool_size=1)
+    seller = database.get_seller_by_code(database.register_seller(1, 'متجر', 'x'))
+    product_id = database.add_product(seller[0], 'قميص', 5, '')
+    assert database.add_order(product_id, 'أحمد', '0500', 'الرياض')
+    database.close()
+
+    with pytest.raises(RuntimeError):
+        database.submit_order(product_id, 'أحمد', '0500', 'الرياض')
+    with pytest.raises(RuntimeError):
+        database.pool.connect()
@@ -0,0 +1,49 @@
+"""نتائج الوضع المضمن: تعديل كتالوج متجر يحذف نتائجه فقط"""
+from database import Database
+
+def test_catalog_change_drops_only_that_store(tmp_path):
+    database = Database(str(tmp_path / 'orders.db'), pool_size=1)
+    stores = []
+    for telegram_id in (1, 2):
+        code = database.register_seller(telegram_id, 'متجر', 'x')
+        seller_id = database.get_seller_by_code(code)[0]
+        database.add_product(seller_id, 'قميص', 5, '')
+        stores.append((code, seller_id))
+    (mine, my_id), (other, _) = stores
+
+    for code in (mine, other):
+        for query in ('', 'قميص'):
+            database.inline_products(code, query)
+    assert database.inline_results.stats()['size'] == 4
+
+    database.add_products(my_id, [('قميص صوف', 9, '')])
+    assert database.inline_results.stats()['size'] == 2
+    _, products, _ = database.inline_products(mine, 'قميص')
+    assert [product[2] for product in products] == ['قميص', 'قميص صوف']
+
+    hits = database.inline_results.hits
+    database.inline_products(other, 'قميص')
+    assert database.inline_results.hits == hits + 1
+    database.close()
+
+def test_result_read_before_change_is_not_cached(tmp_path, monkeypatch):
+    database = Database(str(tmp_path / 'orders.db'), pool_size=1)
+    code = database.register_seller(1, 'متجر', 'x')
+    seller_id = database.get_seller_by_code(code)[0]
+    database.add_product(seller_id, 'قميص', 5, '')
+
+    search = database.search_products
+
+    def racing_search(*args, **kwargs):
+        # منتج يُضاف أثناء استعلام inline
+        result = search(*args, **kwargs)
+        database.add_product(seller_id, 'قميص صوف', 9, '')
+        return result
+
+    monkeypatch.setattr(database, 'search_products', racing_search)
+    _, products, _ = database.inline_products(code, 'قميص')
+    assert len(products) == 1
+    monkeypatch.setattr(database, 'search_products', search)
+    _, products, _ = database.inline_products(code, 'قميص')
+    assert len(products) == 2
+    database.close()
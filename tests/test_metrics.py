@@ -0,0 +1,11 @@
+"""حماية /metrics بـ METRICS_TOKEN"""
+import metrics
+
+def test_authorized(monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_TOKEN', '')
+    assert metrics.authorized('')
+
+    monkeypatch.setattr(metrics, 'METRICS_TOKEN', 's3cret')
+    assert metrics.authorized('Bearer s3cret')
+    for header in ('', 's3cret', 'Bearer s3cre', 'Bearer s3cret ', 'bearer s3cret', 'Bearer سر'):
+        assert not metrics.authorized(header)
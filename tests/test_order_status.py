@@ -0,0 +1,59 @@
+"""حالات الطلب: الانتقالات المسموحة فقط، وكل بائع يغير طلباته فقط"""
+import pytest
+
+from database import STATUS_TRANSITIONS, Database
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(str(tmp_path / 'orders.db'), pool_size=2)
+    yield database
+    database.close()
+
+def place_orders(database, telegram_id, n=1):
+    """(seller_id، أرقام n طلبات جديدة)"""
+    seller_id = database.get_seller_by_code(database.register_seller(telegram_id, 'متجر', 'x'))[0]
+    product_id = database.add_product(seller_id, 'قميص', 5, '')
+    return seller_id, [database.add_order(product_id, 'أحمد', '0500', 'الرياض') for _ in range(n)]
+
+def status_of(database, order_id):
+    with database.connection() as conn:
+        return conn.execute('SELECT status FROM orders WHERE id = ?', (order_id,)).fetchone()[0]
+
+def test_lifecycle_follows_transitions(database):
+    seller_id, (order_id,) = place_orders(database, 1)
+    assert status_of(database, order_id) == 'pending'
+
+    # لا قفز فوق الحالات
+    assert not database.update_order_status(order_id, 'delivered', seller_id=seller_id)
+    for status in ('confirmed', 'shipped', 'delivered'):
+        assert database.update_order_status(order_id, status, seller_id=seller_id)
+        assert status_of(database, order_id) == status
+
+    # delivered و cancelled نهائيتان
+    assert STATUS_TRANSITIONS['delivered'] == ()
+    for status in STATUS_TRANSITIONS:
+        assert not database.update_order_status(order_id, status, seller_id=seller_id)
+    assert status_of(database, order_id) == 'delivered'
+
+def test_unknown_status_raises(database):
+    seller_id, (order_id,) = place_orders(database, 1)
+    with pytest.raises(ValueError):
+        database.update_order_status(order_id, 'lost', seller_id=seller_id)
+
+def test_seller_cannot_change_other_sellers_orders(database):
+    mine, my_orders = place_orders(database, 1, n=2)
+    _, their_orders = place_orders(database, 2, n=2)
+
+    assert not database.update_order_status(their_orders[0], 'cancelled', seller_id=mine)
+    updated = database.update_statuses(my_orders + their_orders, 'confirmed', seller_id=mine)
+    assert sorted(updated) == sorted(my_orders)
+    assert [status_of(database, order_id) for order_id in their_orders] == ['pending', 'pending']
+
+def test_bulk_update_skips_orders_in_wrong_state(database):
+    seller_id, orders = place_orders(database, 1, n=3)
+    database.update_order_status(orders[0], 'cancelled', seller_id=seller_id)
+
+    # المكرر يُحسب مرة واحدة، والملغي لا يُشحن
+    assert database.update_statuses(orders + orders[1:], 'confirmed', seller_id=seller_id) == orders[1:]
+    assert database.update_statuses(orders, 'shipped', seller_id=seller_id) == orders[1:]
+    assert status_of(database, orders[0]) == 'cancelled'
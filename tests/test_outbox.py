@@ -0,0 +1,89 @@
+"""طابور الرسائل: الترتيب لكل محادثة، RetryAfter، والردود دون انتظار"""
+import asyncio
+import logging
+
+import pytest
+from telegram.error import RetryAfter
+
+from outbox import PRIORITY_HIGH, PRIORITY_LOW, Outbox
+
+def make_outbox(**kwargs):
+    return Outbox(global_rate=1000, chat_rate=1000, chat_burst=1000, **kwargs)
+
+def test_chat_order_is_fifo_despite_priority():
+    sent = []
+
+    async def send(text):
+        await asyncio.sleep(0)
+        sent.append(text)
+
+    async def run():
+        outbox = make_outbox()
+        futures = [outbox.post(1, send, 'low', priority=PRIORITY_LOW)]
+        futures += [outbox.post(1, send, str(i)) for i in range(5)]
+        futures.append(outbox.post(1, send, 'high', priority=PRIORITY_HIGH))
+        await asyncio.gather(*futures)
+        await outbox.stop()
+
+    asyncio.run(run())
+    # الأولوية بين المحادثات فقط؛ داخل المحادثة الواحدة يبقى ترتيب الإرسال
+    assert sent == ['low', '0', '1', '2', '3', '4', 'high']
+
+def test_retry_after_resends_in_place():
+    sent = []
+    calls = {'first': 0}
+
+    async def send(text):
+        if text == 'first':
+            calls['first'] += 1
+            if calls['first'] == 1:
+                raise RetryAfter(0)
+        sent.append(text)
+        return text
+
+    async def run():
+        outbox = make_outbox()
+        first = outbox.post(1, send, 'first')
+        second = outbox.post(1, send, 'second')
+        assert await first == 'first'
+        await second
+        await outbox.stop()
+        return outbox.stats()
+
+    stats = asyncio.run(run())
+    assert sent == ['first', 'second']
+    assert stats['retries'] == 1 and stats['sent'] == 2 and stats['failed'] == 0
+
+def test_retry_after_gives_up_after_max_retries():
+    async def send():
+        raise RetryAfter(0)
+
+    async def run():
+        outbox = make_outbox(max_retries=2)
+        with pytest.raises(RetryAfter):
+            await outbox.send(1, send)
+        await outbox.stop()
+        return outbox.stats()
+
+    stats = asyncio.run(run())
+    assert stats['retries'] == 3 and stats['failed'] == 1
+
+def test_post_logs_failure_and_keeps_chat_going(caplog):
+    sent = []
+
+    async def send(text):
+        if text == 'bad':
+            raise ValueError(text)
+        sent.append(text)
+
+    async def run():
+        outbox = make_outbox()
+        outbox.post(1, send, 'bad')
+        outbox.post(1, send, 'good')
+        await outbox.flush(1)
+        await outbox.stop()
+
+    with caplog.at_level(logging.ERROR, logger='outbox'):
+        asyncio.run(run())
+    assert sent == ['good']
+    assert any(isinstance(record.exc_info[1], ValueError) for record in caplog.records if record.exc_info)
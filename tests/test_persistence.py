@@ -0,0 +1,46 @@
+"""حذف الجلسات الخاملة من ذاكرة التطبيق ومن SQLite"""
+import asyncio
+import time
+
+from telegram.ext import Application, ConversationHandler
+
+from bot_functions import setup_bot_handlers
+from database import Database
+from persistence import SQLitePersistence
+
+def test_evict_ends_idle_conversations(tmp_path):
+    database = Database(str(tmp_path / 'orders.db'), pool_size=1)
+    persistence = SQLitePersistence(database, session_ttl=60)
+    application = Application.builder().token('123456:TEST').persistence(persistence).build()
+    setup_bot_handlers(application)
+    persistence.application = application
+    handler = next(
+        h for h in application.handlers[0] if isinstance(h, ConversationHandler) and h.name == 'buyer_conv'
+    )
+    idle, active = (1, 1), (2, 2)
+
+    async def run():
+        for key in (idle, active):
+            # ما يفعله ConversationHandler عند تغيير الحالة
+            handler._conversations[key] = 10
+            await persistence.update_conversation('buyer_conv', key, 10)
+        application.user_data[1]['cart'] = {}
+        await persistence.update_user_data(1, application.user_data[1])
+        await persistence.flush()
+
+        stale = time.time() - 120
+        persistence._seen_conversations[('buyer_conv', idle)] = stale
+        persistence._seen_users[1] = stale
+        assert persistence.evict() == 2
+        # التطبيق يسلّم الحذف لـ persistence في دورته التالية
+        await application.update_persistence()
+        await persistence.flush()
+
+    asyncio.run(run())
+    assert idle not in handler._conversations and active in handler._conversations
+    assert 1 not in application.user_data
+    with database.connection() as conn:
+        keys = [row[0] for row in conn.execute('SELECT key FROM persistence_conversations')]
+        assert keys == ['[2,2]']
+        assert conn.execute('SELECT COUNT(*) FROM persistence_user_data').fetchone()[0] == 0
+    database.close()
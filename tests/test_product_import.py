@@ -0,0 +1,67 @@
+"""استيراد المنتجات: قراءة CSV/JSON والحفظ بمعاملة واحدة"""
+import io
+
+import pytest
+
+import product_import
+from database import Database
+from product_import import iter_json_rows, parse_products
+
+def parse(text, fmt):
+    return parse_products(io.BytesIO(text.encode('utf-8')), fmt)
+
+def test_csv_with_bom_and_arabic_headers():
+    products, report = parse('\ufeffالسعر,الاسم,الوصف\n5,قميص,قطن\n\n,بلا سعر,\n7.5,قبعة,\n', 'csv')
+    assert products == [('قميص', 5.0, 'قطن'), ('قبعة', 7.5, '')]
+    assert report['rejected'] == 1 and report['errors'][0][0] == 4
+
+def test_csv_without_headers_uses_default_columns():
+    products, _ = parse('قميص,5,قطن\nقبعة,-1\n', 'csv')
+    assert products == [('قميص', 5.0, 'قطن')]
+
+@pytest.mark.parametrize('text', [
+    '[{"name": "قميص", "price": 5},',
+    '[{"name": "قميص", "price": 5}',
+    '[{"name": "قميص", "price": 5} {"name": "قبعة", "price": 3}]',
+    '[{"name": "قميص", "price": 5}] []',
+])
+def test_malformed_json_array_is_rejected(text):
+    with pytest.raises(ValueError):
+        parse(text, 'json')
+
+def test_json_items_split_across_chunks():
+    text = '\ufeff[ {"name": "قميص", "price": 5},\n {"الاسم": "قبعة", "السعر": "3", "الوصف": "صوف"} ]'
+    assert [item for _, item in iter_json_rows(io.StringIO(text.lstrip('\ufeff')), chunk_size=4)] == [
+        {'name': 'قميص', 'price': 5}, {'الاسم': 'قبعة', 'السعر': '3', 'الوصف': 'صوف'},
+    ]
+    products, _ = parse(text, 'json')
+    assert products == [('قميص', 5.0, ''), ('قبعة', 3.0, 'صوف')]
+
+def test_jsonl_rows():
+    products, report = parse('{"name": "قميص", "price": 5}\n"نص"\n{"name": "قبعة", "price": 3}\n', 'jsonl')
+    assert products == [('قميص', 5.0, ''), ('قبعة', 3.0, '')]
+    assert report['errors'] == [(2, 'الصف ليس كائناً')]
+
+def test_row_limit_truncates_but_still_validates_rest(monkeypatch):
+    monkeypatch.setattr(product_import, 'MAX_IMPORT_ROWS', 2)
+    rows = ','.join(f'{{"name": "منتج {i}", "price": {i}}}' for i in range(5))
+
+    products, report = parse(f'[{rows}]', 'json')
+    assert len(products) == 2 and report['truncated']
+    with pytest.raises(ValueError):
+        parse(f'[{rows},', 'json')
+
+def test_add_products_returns_ids_in_order(tmp_path):
+    database = Database(str(tmp_path / 'orders.db'), pool_size=1)
+    seller_id = database.get_seller_by_code(database.register_seller(1, 'متجر', 'x'))[0]
+    database.add_product(seller_id, 'قديم', 1, '')
+    # أكثر من دفعة INSERT واحدة
+    products = [(f'منتج {i}', i, '') for i in range(300)]
+
+    ids = database.add_products(seller_id, products)
+    assert len(set(ids)) == 300 and ids == sorted(ids)
+    by_id = {product[0]: product for product in database.get_products_by_seller(seller_id)}
+    assert [by_id[product_id][2] for product_id in ids] == [name for name, _, _ in products]
+    found, _ = database.search_products(seller_id, 'منتج 299')
+    assert [product[0] for product in found] == [ids[-1]]
+    database.close()
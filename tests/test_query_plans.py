@@ -0,0 +1,66 @@
+"""الاستعلامات الساخنة تستخدم الفهارس (EXPLAIN QUERY PLAN على الاستعلامات المنفذة فعلاً)"""
+import pytest
+
+from database import Database
+
+@pytest.fixture
+def database(tmp_path):
+    """قاعدة جديدة باتصال واحد تُسجَّل عليه الاستعلامات المنفذة (مع قيم المعاملات)"""
+    database = Database(str(tmp_path / 'orders.db'), pool_size=1)
+    database.executed = []
+    with database.pool.connection() as conn:
+        conn.set_trace_callback(database.executed.append)
+    yield database
+    database.close()
+
+def plans(database, call):
+    """خطط استعلامات SELECT التي نفذها call()"""
+    database.executed.clear()
+    call()
+    statements = [sql for sql in database.executed if sql.lstrip().upper().startswith('SELECT')]
+    assert statements, "لم يُنفذ أي استعلام"
+    return [(sql, database.query_plan(sql)) for sql in statements]
+
+def assert_indexed(database, call, *expected):
+    """كل استعلام يبحث بفهرس (لا SCAN ولا ترتيب مؤقت)، والفهارس expected مستخدمة"""
+    details = []
+    for sql, plan in plans(database, call):
+        for step in plan:
+            assert not step.startswith('SCAN'), f"{step}\n{sql}"
+            assert 'TEMP B-TREE' not in step, f"{step}\n{sql}"
+        assert any(step.startswith('SEARCH') for step in plan), f"{plan}\n{sql}"
+        details.extend(plan)
+    for index in expected:
+        assert any(index in step for step in details), f"{index} غير مستخدم: {details}"
+
+def test_seller_products(database):
+    database.catalog.clear()
+    assert_indexed(database, lambda: database.get_products_by_seller(1), 'USING INDEX idx_products_seller')
+
+@pytest.mark.parametrize('cursor', [{}, {'before': ('2026-01-01 00:00:00', 5)}, {'after': ('2026-01-01 00:00:00', 5)}])
+def test_orders_page(database, cursor):
+    assert_indexed(
+        database, lambda: database.get_orders_page(1, **cursor),
+        'USING INDEX idx_orders_seller_created (seller_id=?',
+        'USING INDEX idx_order_items_order (order_id=?)'
+    )
+
+@pytest.mark.parametrize('cursor', [{}, {'before': ('2026-01-01 00:00:00', 5)}])
+def test_orders_page_by_status(database, cursor):
+    assert_indexed(
+        database, lambda: database.get_orders_page(1, status='pending', **cursor),
+        'USING INDEX idx_orders_seller_status_created (seller_id=? AND status=?'
+    )
+
+def test_seller_orders(database):
+    assert_indexed(
+        database, lambda: database.get_orders_for_seller(1),
+        'USING INDEX idx_orders_seller_created (seller_id=?)'
+    )
+
+def test_seller_stats(database):
+    assert_indexed(
+        database, lambda: database.get_seller_stats(1),
+        'USING COVERING INDEX idx_products_seller (seller_id=?)',
+        'USING INDEX idx_orders_seller_status_created (seller_id=?)'
+    )
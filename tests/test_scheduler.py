@@ -0,0 +1,71 @@
+"""ScheduledApplication: ترتيب تحديثات كل محادثة، والإيقاف عبر واجهات python-telegram-bot الخاصة"""
+import asyncio
+import json
+
+import pytest
+import telegram
+from telegram import Update
+from telegram.ext import Application
+from telegram.request import BaseRequest
+
+import scheduler
+from scheduler import ScheduledApplication
+
+class BotAPI(BaseRequest):
+    """يرد على getMe فقط (ما يحتاجه initialize)"""
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        result = {'id': 1, 'is_bot': True, 'first_name': 'bot', 'username': 'bot'}
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+class RecordingApplication(ScheduledApplication):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.processed = []
+
+    async def process_update(self, update):
+        # الرسالة الأولى لكل محادثة أبطأ: لا يجب أن تسبقها التالية
+        await asyncio.sleep(0.01 if update.update_id < 3 else 0)
+        self.processed.append((update.effective_chat.id, update.update_id))
+
+def message(update_id, chat_id):
+    return Update.de_json({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id, 'date': 0, 'text': 'x',
+            'chat': {'id': chat_id, 'type': 'private'},
+        },
+    }, None)
+
+def test_updates_drain_in_chat_order_on_stop():
+    application = (
+        Application.builder().token('123456:TEST').request(BotAPI()).get_updates_request(BotAPI())
+        .application_class(RecordingApplication, kwargs={'max_concurrent': 4}).build()
+    )
+
+    async def run():
+        await application.initialize()
+        await application.start()
+        for update_id in range(9):
+            await application.update_queue.put(message(update_id, update_id % 3))
+        # stop() يضع _STOP_SIGNAL وينتظر _update_fetcher حتى تنتهي كل التحديثات
+        await application.stop()
+        await application.shutdown()
+
+    asyncio.run(run())
+    assert len(application.processed) == 9
+    for chat_id in range(3):
+        assert [u for c, u in application.processed if c == chat_id] == [chat_id, chat_id + 3, chat_id + 6]
+    assert application.scheduler.stats()['processed'] == 9
+
+def test_untested_telegram_version_fails_loudly(monkeypatch):
+    monkeypatch.setattr(telegram, '__version_info__', (21, 0, 0, 'final', 0))
+    with pytest.raises(RuntimeError):
+        scheduler.check_telegram_version()
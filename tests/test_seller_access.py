@@ -0,0 +1,91 @@
+"""أوامر البائع لصاحب المتجر فقط: كود المتجر يعرفه كل زبون"""
+import asyncio
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+import bot_functions
+from database import db
+from outbox import outbox
+
+_telegram_ids = itertools.count(7_000_000)
+
+@pytest.fixture
+def replies(monkeypatch):
+    """الردود بدل إرسالها"""
+    sent = []
+
+    def reply(message, text, **kwargs):
+        sent.append(text)
+
+    def edit(query, text, **kwargs):
+        sent.append(text)
+
+    monkeypatch.setattr(outbox, 'reply', reply)
+    monkeypatch.setattr(outbox, 'edit', edit)
+    return sent
+
+@pytest.fixture
+def store():
+    """(telegram_id المالك، صف المتجر)"""
+    owner = next(_telegram_ids)
+    code = db.register_seller(owner, 'متجر الاختبار', 'secret')
+    return owner, db.get_seller_by_code(code)
+
+def make_update(user_id, text='', data=None):
+    answers = []
+
+    async def answer(*args, **kwargs):
+        answers.append(args)
+
+    query = SimpleNamespace(data=data, answer=answer, answers=answers) if data else None
+    return SimpleNamespace(
+        effective_user=SimpleNamespace(id=user_id, first_name='x'),
+        message=SimpleNamespace(text=text, chat_id=user_id),
+        callback_query=query,
+    )
+
+def make_context(**user_data):
+    return SimpleNamespace(user_data=dict(user_data), args=[])
+
+def test_login_requires_owner_account(store, replies):
+    owner, seller = store
+    buyer = make_context()
+    state = asyncio.run(bot_functions.seller_login_process(make_update(next(_telegram_ids), seller[3]), buyer))
+    assert state == bot_functions.ConversationHandler.END
+    assert not buyer.user_data.get('logged_in')
+
+    context = make_context()
+    state = asyncio.run(bot_functions.seller_login_process(make_update(owner, seller[3]), context))
+    # لوحة البائع خارج المحادثة: لا حالة معلقة بلا معالجات
+    assert state == bot_functions.ConversationHandler.END
+    assert context.user_data['logged_in']
+    assert asyncio.run(bot_functions.logged_in_seller(make_update(owner), context)) == seller
+
+def test_forged_session_cannot_use_seller_commands(store, replies, monkeypatch):
+    _, seller = store
+    # جلسة زبون فتح المتجر (seller_id) ومعها logged_in من جلسة قديمة
+    context = make_context(logged_in=True, seller_id=seller[0])
+    buyer = next(_telegram_ids)
+
+    async def forbidden(*args, **kwargs):
+        raise AssertionError("نُفذ أمر البائع لغير المالك")
+
+    for name in ('export_orders', 'update_order_status', 'update_statuses', 'add_products', 'get_seller_stats'):
+        monkeypatch.setattr(bot_functions.adb, name, forbidden)
+
+    asyncio.run(bot_functions.export_orders_command(make_update(buyer), context))
+    asyncio.run(bot_functions.seller_dashboard_command(make_update(buyer), context))
+    asyncio.run(bot_functions.import_products_document(make_update(buyer), context))
+    asyncio.run(bot_functions.order_status_callback(make_update(buyer, data='status|1|cancelled'), context))
+    asyncio.run(bot_functions.bulk_status_callback(make_update(buyer, data='status_bulk|shipped'), context))
+    assert len(replies) == 5
+    assert all(text.startswith('❌') for text in replies)
+
+def test_owner_session_survives_shopping_elsewhere(store, replies):
+    owner, seller = store
+    other = db.get_seller_by_code(db.register_seller(next(_telegram_ids), 'متجر آخر', 'x'))
+    # فتح متجر آخر كزبون يغير seller_id في الجلسة
+    context = make_context(logged_in=True, seller_id=other[0])
+    assert asyncio.run(bot_functions.logged_in_seller(make_update(owner), context)) == seller
@@ -0,0 +1,61 @@
+"""أكواد المتاجر: حرف التحقق، الأكواد القديمة، وإعادة التوليد عند التصادم"""
+import pytest
+
+from database import Database
+from store_codes import ALPHABET, CODE_LENGTH, is_valid_store_code, new_store_code, normalize_store_code
+
+def test_new_codes_are_valid():
+    codes = {new_store_code() for _ in range(200)}
+    assert len(codes) == 200
+    for code in codes:
+        assert len(code) == CODE_LENGTH and set(code) <= set(ALPHABET)
+        assert is_valid_store_code(code)
+
+def test_single_char_typo_is_rejected():
+    code = new_store_code()
+    for i in range(CODE_LENGTH):
+        for char in ALPHABET:
+            if char != code[i]:
+                assert not is_valid_store_code(code[:i] + char + code[i + 1:])
+
+def test_adjacent_swaps_mostly_rejected():
+    caught = total = 0
+    for _ in range(200):
+        code = new_store_code()
+        for i in range(CODE_LENGTH - 1):
+            if code[i] != code[i + 1]:
+                total += 1
+                caught += not is_valid_store_code(code[:i] + code[i + 1] + code[i] + code[i + 2:])
+    assert caught / total > 0.9
+
+@pytest.mark.parametrize('code, valid', [
+    ('AB12CD', True),    # قديم: 6 أحرف من A-Z و 0-9 بلا تحقق
+    ('0O1I00', True),
+    ('AB12C', False),
+    ('AB12C!', False),
+    ('ab12cd', False),   # قبل normalize_store_code
+    ('A0B2C3D4', False),  # 8 أحرف فيها 0
+])
+def test_code_formats(code, valid):
+    assert is_valid_store_code(code) == valid
+
+def test_normalize_accepts_user_formatting():
+    code = new_store_code()
+    typed = f' {code[:4].lower()}-{code[4:].lower()} '
+    assert normalize_store_code(typed) == code
+
+def test_legacy_codes_and_collisions(tmp_path):
+    database = Database(str(tmp_path / 'orders.db'), pool_size=1)
+    assert database.add_seller(1, 'متجر قديم', 'AB12CD', 'x')
+    assert database.get_seller_by_code('ab12cd')[1] == 1
+
+    codes = iter(['AB12CD', new_store_code()])
+    # الكود الأول مأخوذ، فيُعاد التوليد
+    code = database.register_seller(2, 'متجر جديد', 'x', allocate=lambda: next(codes))
+    assert code != 'AB12CD' and database.get_seller_by_code(code)[1] == 2
+    assert database.register_seller(2, 'مكرر', 'x') is None
+    with pytest.raises(RuntimeError):
+        database.register_seller(3, 'متجر', 'x', allocate=lambda: 'AB12CD', attempts=2)
+    # الكود بحرف تحقق خاطئ لا يطابق أي متجر
+    assert database.get_seller_by_code(code[:-1] + ('2' if code[-1] != '2' else '3')) is None
+    database.close()